@@ -0,0 +1,194 @@
+"""
+Anime Downloader - Ajuste automático de la concurrencia de los lotes
+Observa la velocidad total, los errores y las respuestas 429 y ajusta el
+número de descargas simultáneas con un controlador AIMD con escalada
+"""
+
+import time
+import logging
+import threading
+
+from config import Config
+from transport import throttled_responses
+from utils import format_bytes
+
+logger = logging.getLogger(__name__)
+
+def parse_bounds(spec):
+    """
+    Parsea los límites de trabajadores del modo automático
+    
+    Args:
+        spec (str): Rango "MIN-MAX" (ej. "1-8") o un máximo ("8", desde 1)
+    
+    Returns:
+        tuple: (mínimo, máximo)
+    
+    Raises:
+        ValueError: Si el formato no es válido
+    """
+    low, sep, high = str(spec).partition('-')
+    try:
+        low, high = (int(low), int(high)) if sep else (1, int(low))
+    except ValueError:
+        raise ValueError(f"Rango de trabajadores inválido (se espera MIN-MAX): {spec}")
+    
+    if low < 1 or high < low:
+        raise ValueError(f"Rango de trabajadores inválido: {spec}")
+    return low, high
+
+class AutoTuner:
+    """
+    Controlador de la concurrencia de un lote
+    
+    Cada Config.AUTOTUNE_INTERVAL segundos compara la velocidad del último
+    intervalo con la del anterior:
+    
+    - Con respuestas 429/503 o demasiados fallos reduce la concurrencia a la
+      mitad (disminución multiplicativa).
+    - Si el último aumento no mejoró la velocidad al menos un
+      Config.AUTOTUNE_MIN_GAIN, vuelve al valor anterior y se queda ahí unos
+      intervalos antes de volver a probar (escalada).
+    - Si no, prueba con un trabajador más (aumento aditivo).
+    
+    Todas las decisiones se registran en el log con sus motivos.
+    """
+    
+    def __init__(self, scheduler, minimum, maximum, start=None):
+        """
+        Args:
+            scheduler (HostScheduler): Planificador cuya capacidad se ajusta
+            minimum (int): Descargas simultáneas mínimas
+            maximum (int): Descargas simultáneas máximas
+            start (int): Valor inicial (default: minimum)
+        """
+        self.scheduler = scheduler
+        self.minimum = minimum
+        self.maximum = maximum
+        # Máximo configurado (las franjas horarias pueden bajar maximum, no subirlo)
+        self.ceiling = maximum
+        self.limit = min(max(start or minimum, minimum), maximum)
+        self.scheduler.set_capacity(self.limit)
+        
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._completed = 0
+        self._failed = 0
+        self._throttled_errors = 0
+        self._throttled_base = throttled_responses()
+        self._last_sample = time.time()
+        self._last_rate = None
+        self._last_action = None
+        self._hold = 0
+    
+    def set_maximum(self, maximum):
+        """
+        Cambia el máximo de descargas simultáneas (lo usan las franjas horarias)
+        
+        Queda entre el mínimo y el máximo configurados; si la concurrencia
+        actual lo supera, baja en el acto.
+        
+        Args:
+            maximum (int): Nuevo máximo
+        """
+        with self._lock:
+            self.maximum = max(self.minimum, min(maximum, self.ceiling))
+            if self.limit > self.maximum:
+                logger.info(f"🎛️  Autoajuste: {self.limit} → {self.maximum} trabajadores (máximo de la franja horaria)")
+                self.limit = self.maximum
+                self.scheduler.set_capacity(self.limit)
+    
+    def record_bytes(self, count):
+        """Suma bytes descargados por cualquier trabajador"""
+        with self._lock:
+            self._bytes += count
+    
+    def record_result(self, record):
+        """
+        Cuenta un episodio terminado
+        
+        Args:
+            record (JobRecord): Resultado del episodio
+        """
+        with self._lock:
+            self._completed += 1
+            if not record.success:
+                self._failed += 1
+                if record.error and '429' in record.error:
+                    self._throttled_errors += 1
+    
+    def run(self, finished):
+        """
+        Ajusta la concurrencia periódicamente hasta que termine el lote
+        
+        Args:
+            finished (threading.Event): Se activa al terminar la ejecución
+        """
+        logger.info(f"🎛️  Autoajuste de concurrencia entre {self.minimum} y {self.maximum} (inicio: {self.limit})")
+        while not finished.wait(Config.AUTOTUNE_INTERVAL):
+            try:
+                self.step()
+            except Exception as e:
+                logger.warning(f"Error en el autoajuste de concurrencia: {e}")
+    
+    def step(self):
+        """
+        Toma una decisión con lo observado desde la anterior
+        
+        Returns:
+            int: Nueva concurrencia
+        """
+        now = time.time()
+        with self._lock:
+            elapsed = max(now - self._last_sample, 1e-6)
+            transferred, completed, failed = self._bytes, self._completed, self._failed
+            throttled = self._throttled_errors + throttled_responses() - self._throttled_base
+            self._bytes = self._completed = self._failed = self._throttled_errors = 0
+            self._throttled_base = throttled_responses()
+            self._last_sample = now
+        
+        rate = transferred / elapsed
+        error_rate = failed / completed if completed else 0.0
+        observed = (f"{format_bytes(rate)}/s, {completed} terminados, errores {error_rate:.0%}, "
+                    f"429/503: {throttled}")
+        
+        if not transferred and not completed:
+            logger.debug(f"🎛️  Autoajuste: sin actividad, se mantienen {self.limit} trabajadores")
+            return self.limit
+        
+        previous = self.limit
+        if throttled or (completed >= 2 and error_rate > Config.AUTOTUNE_MAX_ERROR_RATE):
+            reason = "el servidor pide bajar el ritmo" if throttled else "demasiados fallos"
+            self.limit = max(self.minimum, int(self.limit * Config.AUTOTUNE_BACKOFF))
+            self._last_action = 'decrease'
+            self._hold = Config.AUTOTUNE_HOLD_INTERVALS
+        elif not transferred:
+            # Episodios terminados sin datos de bytes: no hay velocidad con la que decidir
+            reason = "sin datos de velocidad, se mantiene"
+            self._last_action = None
+        elif (self._last_action == 'increase' and self._last_rate is not None
+              and rate < self._last_rate * (1 + Config.AUTOTUNE_MIN_GAIN)):
+            reason = "el último aumento no mejoró la velocidad, se vuelve atrás"
+            self.limit = max(self.minimum, self.limit - 1)
+            self._last_action = 'revert'
+            self._hold = Config.AUTOTUNE_HOLD_INTERVALS
+        elif self._hold > 0:
+            reason = f"estable, se espera {self._hold} intervalo(s) antes de probar más"
+            self._hold -= 1
+            self._last_action = None
+        elif self.limit < self.maximum:
+            reason = "sin congestión, se prueba con uno más"
+            self.limit += 1
+            self._last_action = 'increase'
+        else:
+            reason = "en el máximo permitido"
+            self._last_action = None
+        
+        if transferred:
+            self._last_rate = rate
+        if self.limit != previous:
+            self.scheduler.set_capacity(self.limit)
+            logger.info(f"🎛️  Autoajuste: {previous} → {self.limit} trabajadores ({observed}): {reason}")
+        else:
+            logger.info(f"🎛️  Autoajuste: {self.limit} trabajadores ({observed}): {reason}")
+        return self.limit
@@ -0,0 +1,350 @@
+"""
+Anime Downloader - Reparto del ancho de banda entre descargas
+Mantiene un límite de velocidad total para el lote y lo reparte en vivo entre
+las descargas activas de todos los procesos; el límite y el número de
+descargas pueden cambiar por franjas horarias
+"""
+
+import re
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+from config import Config
+
+RATE_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*([KMG]?)(?:i?B)?(?:/s)?', re.IGNORECASE)
+RATE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+WINDOW_PATTERN = re.compile(r'(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})')
+UNLIMITED_RATES = ('', '0', 'max', 'ilimitado')
+
+logger = logging.getLogger(__name__)
+
+def parse_rate(value):
+    """
+    Convierte una velocidad a bytes por segundo
+    
+    Args:
+        value: Velocidad como número o texto ('500K', '2M', '1.5MB/s')
+    
+    Returns:
+        float: Bytes por segundo, o None si no hay límite
+    
+    Raises:
+        ValueError: Si el formato no es válido
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) if value > 0 else None
+    
+    match = RATE_PATTERN.fullmatch(str(value).strip())
+    if not match:
+        raise ValueError(f"Velocidad inválida: {value} (ej. 500K, 2M)")
+    
+    rate = float(match.group(1)) * RATE_UNITS[match.group(2).upper()]
+    return rate if rate > 0 else None
+
+class BandwidthGovernor:
+    """
+    Límite de velocidad total repartido entre las descargas activas
+    
+    Cada descarga registra el diccionario de parámetros de su YoutubeDL;
+    yt-dlp consulta params['ratelimit'] en cada bloque, así que al cambiar el
+    reparto la nueva velocidad se aplica sin reiniciar la descarga. Con un
+    contador compartido (multiprocessing.Value) el reparto cuenta también las
+    descargas de los demás procesos del lote.
+    """
+    
+    def __init__(self, rate=None, active=None):
+        """
+        Args:
+            rate: Velocidad total (ver parse_rate); None sin límite
+            active (multiprocessing.Value): Contador de descargas activas compartido entre procesos
+        """
+        self.rate = parse_rate(rate)
+        self.active = active
+        # Registrar las descargas aunque no haya límite, porque puede llegar uno
+        # en vivo (franjas horarias); sin límite se quita también Config.MAX_DOWNLOAD_RATE
+        self.managed = False
+        self._params = []
+        self._lock = threading.Lock()
+        self._thread = None
+    
+    @contextmanager
+    def limit(self, params):
+        """
+        Aplica el reparto a una descarga mientras dura el bloque with
+        
+        Args:
+            params (dict): Parámetros del YoutubeDL de la descarga (ydl.params)
+        """
+        if not self.rate and not self.managed:
+            yield
+            return
+        
+        self._register(params)
+        try:
+            yield
+        finally:
+            self._unregister(params)
+    
+    def set_rate(self, rate):
+        """
+        Cambia la velocidad total, también para las descargas en curso
+        
+        Args:
+            rate: Nueva velocidad (ver parse_rate); None sin límite
+        """
+        with self._lock:
+            self.rate = parse_rate(rate)
+            self._rebalance()
+    
+    def share(self):
+        """
+        Velocidad que corresponde ahora a cada descarga
+        
+        Returns:
+            float: Bytes por segundo, o None sin límite
+        """
+        if not self.rate:
+            return None
+        
+        if self.active is not None:
+            downloads = self.active.value
+        else:
+            downloads = len(self._params)
+        return self.rate / max(1, downloads)
+    
+    def _register(self, params):
+        with self._lock:
+            self._params.append(params)
+            if self.active is not None:
+                with self.active.get_lock():
+                    self.active.value += 1
+            self._rebalance()
+            
+            # Las altas y bajas de otros procesos se recogen periódicamente
+            if self.active is not None and self._thread is None:
+                self._thread = threading.Thread(target=self._watch, name='bandwidth-governor', daemon=True)
+                self._thread.start()
+    
+    def _unregister(self, params):
+        with self._lock:
+            # Por identidad: dos descargas pueden tener parámetros iguales
+            self._params = [p for p in self._params if p is not params]
+            if self.active is not None:
+                with self.active.get_lock():
+                    self.active.value -= 1
+            self._rebalance()
+    
+    def _rebalance(self):
+        """Actualiza el ratelimit de las descargas de este proceso (con el lock tomado)"""
+        share = self.share()
+        for params in self._params:
+            if share:
+                params['ratelimit'] = share
+            else:
+                params.pop('ratelimit', None)
+    
+    def _watch(self):
+        while True:
+            time.sleep(Config.BANDWIDTH_REBALANCE_SECONDS)
+            with self._lock:
+                if not self._params:
+                    self._thread = None
+                    return
+                self._rebalance()
+
+# Instancia compartida por los downloaders del proceso
+_governor = None
+
+def get_governor():
+    """
+    Retorna el reparto de ancho de banda del proceso
+    
+    Returns:
+        BandwidthGovernor: Instancia compartida (límite de Config.BANDWIDTH_LIMIT)
+    """
+    global _governor
+    if _governor is None:
+        _governor = BandwidthGovernor(Config.BANDWIDTH_LIMIT)
+    return _governor
+
+def configure_bandwidth(rate=None, active=None):
+    """
+    Reemplaza el reparto de ancho de banda del proceso
+    
+    Args:
+        rate: Velocidad total del lote (ver parse_rate); None sin límite
+        active (multiprocessing.Value): Contador compartido con otros procesos (opcional)
+    
+    Returns:
+        BandwidthGovernor: Nueva instancia
+    """
+    global _governor
+    _governor = BandwidthGovernor(rate, active)
+    if _governor.rate:
+        logger.info(f"Ancho de banda del lote limitado a {parse_rate(rate) / 1024 ** 2:.1f} MiB/s")
+    return _governor
+
+def parse_schedule(spec):
+    """
+    Parsea franjas horarias de velocidad y descargas simultáneas
+    
+    Args:
+        spec (str): Franjas separadas por comas, "HH:MM-HH:MM=VELOCIDAD[/DESCARGAS]",
+                    ej. "08:00-20:00=1M/1,20:00-08:00=max/6" ('max' o 0 sin límite;
+                    sin /DESCARGAS se mantiene -w). Si se solapan, gana la primera.
+    
+    Returns:
+        BandwidthSchedule: Franjas a aplicar
+    
+    Raises:
+        ValueError: Si el formato no es válido
+    """
+    windows = []
+    for part in str(spec).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        
+        span, sep, profile = part.partition('=')
+        match = WINDOW_PATTERN.fullmatch(span.strip())
+        if not sep or not match:
+            raise ValueError(f"Franja inválida (se espera HH:MM-HH:MM=VELOCIDAD[/DESCARGAS]): {part}")
+        
+        start_hour, start_minute, end_hour, end_minute = map(int, match.groups())
+        if start_hour > 23 or end_hour > 24 or start_minute > 59 or end_minute > 59:
+            raise ValueError(f"Hora inválida en la franja: {span}")
+        
+        rate, _, workers = profile.partition('/')
+        rate = None if rate.strip().lower() in UNLIMITED_RATES else parse_rate(rate)
+        try:
+            workers = int(workers) if workers.strip() else None
+        except ValueError:
+            raise ValueError(f"Descargas simultáneas inválidas en la franja {span}: {workers}")
+        if workers is not None and workers < 1:
+            raise ValueError(f"La franja {span} debe permitir al menos 1 descarga")
+        
+        windows.append(BandwidthWindow(
+            span.strip(), start_hour * 60 + start_minute, end_hour * 60 + end_minute, rate, workers
+        ))
+    
+    if not windows:
+        raise ValueError("No se indicó ninguna franja")
+    return BandwidthSchedule(windows)
+
+class BandwidthWindow:
+    """Franja horaria con su velocidad total y sus descargas simultáneas"""
+    
+    __slots__ = ('label', 'start', 'end', 'rate', 'workers')
+    
+    def __init__(self, label, start, end, rate=None, workers=None):
+        """
+        Args:
+            label (str): Franja como se escribió ("08:00-20:00")
+            start (int): Inicio en minutos desde medianoche
+            end (int): Fin en minutos desde medianoche (puede ser menor que start: cruza la medianoche)
+            rate (float): Bytes por segundo (None sin límite)
+            workers (int): Descargas simultáneas (None para mantener las del lote)
+        """
+        self.label = label
+        self.start = start
+        self.end = end
+        self.rate = rate
+        self.workers = workers
+    
+    def contains(self, minute):
+        """True si el minuto del día (0-1439) cae en la franja"""
+        if self.start < self.end:
+            return self.start <= minute < self.end
+        if self.start > self.end:
+            return minute >= self.start or minute < self.end
+        return True
+
+class BandwidthSchedule:
+    """
+    Velocidad y concurrencia por franjas horarias
+    
+    Un hilo comprueba la hora cada Config.SCHEDULE_CHECK_SECONDS y, al cambiar
+    de franja, cambia en vivo el límite del reparto de ancho de banda y la
+    capacidad del planificador: las descargas en curso no se reinician, solo
+    se frenan o esperan a que terminen las sobrantes. Fuera de cualquier
+    franja se usan la velocidad y las descargas del lote.
+    """
+    
+    def __init__(self, windows):
+        """
+        Args:
+            windows (list): BandwidthWindow en orden de preferencia
+        """
+        self.windows = windows
+        # Velocidad del lote fuera de las franjas (se toma al aplicarlas la primera vez)
+        self.default_rate = None
+        self._captured = False
+    
+    @property
+    def max_workers(self):
+        """Descargas simultáneas de la franja más permisiva (0 si ninguna las fija)"""
+        return max((window.workers or 0 for window in self.windows), default=0)
+    
+    def current(self, now=None):
+        """
+        Franja vigente
+        
+        Args:
+            now (float): Momento a consultar (default: ahora)
+        
+        Returns:
+            BandwidthWindow: Franja vigente, o None si no hay ninguna
+        """
+        moment = time.localtime(now)
+        minute = moment.tm_hour * 60 + moment.tm_min
+        return next((window for window in self.windows if window.contains(minute)), None)
+    
+    def follow(self, scheduler, finished, default_workers, tuner=None):
+        """
+        Aplica la franja vigente y la va cambiando hasta que termine la ejecución
+        
+        Args:
+            scheduler (HostScheduler): Planificador cuya capacidad se ajusta
+            finished (threading.Event): Se activa al terminar la ejecución
+            default_workers (int): Descargas simultáneas fuera de las franjas
+            tuner (AutoTuner): Autoajuste activo; la franja limita su máximo (opcional)
+        """
+        governor = get_governor()
+        if not self._captured:
+            self.default_rate = governor.rate
+            self._captured = True
+        governor.managed = True
+        
+        state = {'window': self}  # Ninguna franja aplicada aún
+        
+        def apply():
+            window = self.current()
+            if state['window'] is window:
+                return
+            state['window'] = window
+            
+            rate = window.rate if window else self.default_rate
+            workers = (window.workers if window else None) or default_workers
+            governor.set_rate(rate)
+            if tuner:
+                tuner.set_maximum(workers)
+            else:
+                scheduler.set_capacity(workers)
+            
+            speed = f"{rate / 1024 ** 2:.1f} MiB/s" if rate else "sin límite de velocidad"
+            where = f"Franja {window.label}" if window else "Fuera de las franjas"
+            logger.info(f"🕗 {where}: {speed}, {workers} descarga(s) simultánea(s)")
+        
+        def loop():
+            while not finished.wait(Config.SCHEDULE_CHECK_SECONDS):
+                try:
+                    apply()
+                except Exception as e:
+                    logger.warning(f"Error aplicando la franja horaria: {e}")
+        
+        apply()
+        threading.Thread(target=loop, name='bandwidth-schedule', daemon=True).start()
@@ -10,16 +10,123 @@ import os
 from pathlib import Path
 import logging
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+import uuid
+import itertools
+import threading
+import multiprocessing
+from queue import Empty
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+
+# Con el downloader extendido los episodios de JKAnime pasan por su extractor
+try:
+    from downloader_extended import ExtendedAnimeDownloader as AnimeDownloader
+except ImportError:
+    from downloader import AnimeDownloader
 
-from downloader import AnimeDownloader
 from config import Config
-from utils import setup_logging, validate_url, clean_filename
+from transport import configure_transport
+from bandwidth import configure_bandwidth, get_governor, parse_rate, parse_schedule
+from queue_server import open_queue
+from job_queue import JobQueue, make_owner_id, PENDING, EXTRACTING, DOWNLOADING, POSTPROCESSING, DONE, FAILED
+from journal import ResultJournal, record_entry
+from library import LibraryIndex, resolve_output_path
+from autotune import AutoTuner, parse_bounds
+from scheduler import HostScheduler, JobSource, ReadyQueue, ORDER_POLICIES, host_key, parse_host_limits
+from utils import (
+    setup_logging, validate_url, clean_filename, parse_episode_ranges, check_disk_space, format_bytes, argparse_type
+)
+
+# Espacio libre que debe quedar en disco tras las descargas en curso
+MIN_FREE_SPACE = 1024 ** 3
+
+class JobRecord:
+    """Resultado de un episodio del lote (con __slots__: los lotes pueden tener 100k episodios)"""
+    
+    __slots__ = ('url', 'episode', 'success', 'error', 'error_class', 'duration', 'completed_after',
+                 'path', 'bytes', 'mirror', 'attempts')
+    
+    def __init__(self, url, episode=None):
+        self.url = url
+        self.episode = episode
+        self.success = False
+        self.error = None
+        self.error_class = None
+        self.duration = 0.0
+        self.completed_after = None
+        self.path = None
+        self.bytes = None
+        self.mirror = None
+        self.attempts = None
+
+class BatchAggregate:
+    """
+    Estadísticas de un lote acumuladas episodio a episodio
+    
+    De los episodios exitosos solo se guardan sumas y mínimos; se conservan
+    únicamente los registros de los fallidos, así la memoria no crece con el
+    tamaño del lote.
+    """
+    
+    __slots__ = ('completed', 'successful', 'failed', 'download_time', 'playable_time', 'first_playable', 'failures')
+    
+    def __init__(self):
+        self.completed = 0
+        self.successful = 0
+        self.failed = 0
+        self.download_time = 0.0
+        self.playable_time = 0.0
+        self.first_playable = None
+        self.failures = []
+    
+    def add(self, record):
+        """
+        Acumula el resultado de un episodio
+        
+        Args:
+            record (JobRecord): Resultado con completed_after ya fijado
+        """
+        self.completed += 1
+        if not record.success:
+            self.failed += 1
+            self.failures.append(record)
+            return
+        
+        self.successful += 1
+        self.download_time += record.duration
+        self.playable_time += record.completed_after
+        if self.first_playable is None or record.completed_after < self.first_playable:
+            self.first_playable = record.completed_after
+    
+    def merge(self, other, offset=0.0):
+        """
+        Suma los resultados de otro agregado (de un proceso hijo)
+        
+        Args:
+            other (BatchAggregate): Agregado a sumar
+            offset (float): Segundos entre el inicio de este lote y el del otro
+        """
+        self.completed += other.completed
+        self.successful += other.successful
+        self.failed += other.failed
+        self.download_time += other.download_time
+        self.playable_time += other.playable_time + offset * other.successful
+        if other.first_playable is not None:
+            first_playable = other.first_playable + offset
+            if self.first_playable is None or first_playable < self.first_playable:
+                self.first_playable = first_playable
+        
+        for record in other.failures:
+            record.completed_after += offset
+            self.failures.append(record)
 
 class BatchDownloader:
     """Clase para manejar descargas por lotes"""
     
-    def __init__(self, output_path=None, quality='720p', max_workers=2):
+    def __init__(self, output_path=None, quality='720p', max_workers=2, queue_path=None, resolve_workers=0,
+                 host_limits=None, order=None, processes=None, journal_path=None, autotune=None, schedule=None,
+                 force=False):
         """
         Inicializa el batch downloader
         
@@ -27,15 +134,80 @@ class BatchDownloader:
             output_path (str): Directorio de descarga
             quality (str): Calidad de video
             max_workers (int): Número de descargas simultáneas
+            queue_path (str): Base de datos de la cola de trabajos o URL de un servidor
+                              de cola (default: Config.JOB_QUEUE_PATH)
+            resolve_workers (int): Resolutores del modo pipeline (0 para resolver y
+                                   descargar en el mismo trabajador)
+            host_limits (dict): Trabajos simultáneos por sitio (se combina con Config.HOST_CONCURRENCY)
+            order (str): Orden de los episodios (ver scheduler.ORDER_POLICIES, default: Config.BATCH_ORDER)
+            processes (int): Procesos entre los que repartir los trabajos, cada uno
+                             con max_workers trabajadores (default: Config.BATCH_PROCESSES)
+            journal_path (str): Archivo JSONL donde anotar el resultado de cada episodio (opcional)
+            autotune (tuple): (mínimo, máximo) de descargas simultáneas para ajustarlas
+                              automáticamente, empezando en max_workers (opcional)
+            schedule (BandwidthSchedule): Velocidad y descargas simultáneas por franjas
+                                          horarias (opcional, ver bandwidth.parse_schedule)
+            force (bool): Volver a descargar los episodios ya completados en ejecuciones anteriores
         """
         self.output_path = Path(output_path or Config.DOWNLOAD_PATH).expanduser().resolve()
         self.quality = quality
         self.max_workers = max_workers
+        self.resolve_workers = resolve_workers
+        self.host_limits = host_limits or {}
+        self.order = order or Config.BATCH_ORDER
+        self.processes = max(1, processes or Config.BATCH_PROCESSES)
+        self.autotune = autotune
+        self.tuner = None
+        self.schedule = schedule
+        self.force = force
+        # Parte de los límites por host que corresponde a este proceso
+        self.host_share = 1
         self.logger = logging.getLogger(__name__)
         
         # Crear directorio de salida
         self.output_path.mkdir(parents=True, exist_ok=True)
         
+        # Pools de conexiones dimensionados para los trabajadores del lote
+        configure_transport(self._download_slots() + resolve_workers)
+        
+        # Downloader compartido por todos los trabajadores (no guarda estado por descarga)
+        self.downloader = AnimeDownloader(
+            output_path=str(self.output_path),
+            quality=self.quality,
+            max_retries=Config.MAX_RETRIES
+        )
+        
+        # Cola persistente: el estado de cada episodio sobrevive a cierres y Ctrl-C
+        self.queue = open_queue(queue_path)
+        self.owner = make_owner_id()
+        self._stop = threading.Event()
+        self._progress_lock = threading.Lock()
+        
+        # Episodios resueltos al medir tamaños, pendientes de descargar
+        self._resolved = {}
+        # Los hijos del modo multiproceso no miden tamaños: lo hace una vez el proceso principal
+        self.measure_sizes = True
+        # Trabajos ya medidos (aunque no se obtuviera su tamaño), para no resolverlos otra vez
+        self._measured = set()
+        
+        # Se activa cuando termina de encolarse una entrada en streaming (None si no hay)
+        self._ingest_done = None
+        self.aggregate = BatchAggregate()
+        
+        # Diario con una línea por episodio terminado (se puede seguir con tail -f)
+        self.journal = ResultJournal(journal_path) if journal_path else None
+        
+        # Aviso opcional con el progreso de cada trabajo: (job_id, datos) (lo usa el servicio)
+        self.on_job_progress = None
+        
+        # Índice de la biblioteca: cada episodio terminado se añade al momento
+        self.library = None
+        if Config.LIBRARY_INDEX_DOWNLOADS:
+            try:
+                self.library = LibraryIndex()
+            except Exception as e:
+                self.logger.warning(f"No se pudo abrir el índice de la biblioteca: {e}")
+        
         # Estadísticas
         self.stats = {
             'total': 0,
@@ -56,170 +228,1168 @@ class BatchDownloader:
         Returns:
             list: Lista de URLs válidas
         """
-        urls = []
-        file_path = Path(file_path)
+        urls = list(self.iter_urls_from_file(file_path))
+        self.logger.info(f"Cargadas {len(urls)} URLs válidas desde {file_path}")
+        return urls
+        
+    def iter_urls_from_file(self, file_path):
+        """
+        Lee URLs de un archivo de texto línea a línea, sin cargarlo entero
         
-        if not file_path.exists():
-            self.logger.error(f"Archivo no encontrado: {file_path}")
-            return urls
+        Args:
+            file_path (str): Ruta del archivo con URLs ('-' para la entrada estándar)
             
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                for line_num, line in enumerate(f, 1):
-                    line = line.strip()
-                    
-                    # Ignorar líneas vacías y comentarios
-                    if not line or line.startswith('#'):
-                        continue
-                        
-                    # Validar URL
-                    if validate_url(line):
-                        urls.append(line)
-                    else:
-                        self.logger.warning(f"URL inválida en línea {line_num}: {line}")
-                        
-        except Exception as e:
-            self.logger.error(f"Error leyendo archivo {file_path}: {e}")
+        Yields:
+            str: Cada URL válida
+        """
+        return iter_urls_from_file(file_path)
+        
+    def expand_series(self, series_url, episodes=None):
+        """
+        Enumera los episodios de una serie para descargarlos por lotes
+        
+        Args:
+            series_url (str): URL de la serie (ej. https://jkanime.net/<slug>/)
+            episodes (set): Números de episodio a incluir (None para todos)
             
-        self.logger.info(f"Cargadas {len(urls)} URLs válidas desde {file_path}")
-        return urls
+        Returns:
+            list: Tuplas (número de episodio, URL del episodio)
+        """
+        from extractors import find_extractor, get_extractor
+        
+        extractor_name = find_extractor(series_url)
+        extractor = get_extractor(extractor_name) if extractor_name else None
+        
+        if not extractor or not hasattr(extractor, 'get_episode_list') or not extractor.is_series_url(series_url):
+            self.logger.error(f"No es una URL de serie soportada: {series_url}")
+            return []
         
-    def download_single(self, url, episode_num=None):
+        series_episodes = extractor.get_episode_list(series_url)
+        if episodes is not None:
+            series_episodes = [(number, url) for number, url in series_episodes if number in episodes]
+            
+            missing = episodes - {number for number, _ in series_episodes}
+            if missing:
+                self.logger.warning(f"Episodios no disponibles en la serie: {sorted(missing)}")
+        
+        self.logger.info(f"Planificados {len(series_episodes)} episodios desde {series_url}")
+        return series_episodes
+        
+    def _job_progress(self, job_id, record):
+        """
+        Crea un callback de progreso que refleja la fase del trabajo en la cola
+        y anota en su resultado el archivo, los bytes y el mirror usados
+        
+        Args:
+            job_id (int): ID del trabajo (None si no viene de la cola)
+            record (JobRecord): Resultado del episodio
+            
+        Returns:
+            callable: Callback para download_episode
+        """
+        phase = {'state': EXTRACTING, 'downloaded': 0}
+        
+        def callback(data):
+            if self.on_job_progress and job_id is not None:
+                try:
+                    self.on_job_progress(job_id, data)
+                except Exception as e:
+                    self.logger.debug(f"Error en aviso de progreso (ignorado): {e}")
+            
+            status = data.get('status')
+            if status == 'mirror':
+                record.mirror = data.get('mirror')
+                return
+            if status == 'downloading':
+                record.bytes = data.get('total_bytes') or data.get('downloaded_bytes') or record.bytes
+                
+                # Bytes nuevos desde el aviso anterior (para la velocidad del autoajuste)
+                downloaded = data.get('downloaded_bytes') or 0
+                if self.tuner and downloaded > phase['downloaded']:
+                    self.tuner.record_bytes(downloaded - phase['downloaded'])
+                phase['downloaded'] = downloaded
+            elif status == 'finished':
+                record.path = data.get('filename') or record.path
+            else:
+                return
+            
+            state = POSTPROCESSING if status == 'finished' else DOWNLOADING
+            if job_id is not None and state != phase['state']:
+                self.queue.set_state(job_id, state, self.owner)
+                phase['state'] = state
+        
+        return callback
+        
+    def download_single(self, url, episode_num=None, job_id=None, resolved=None, size=None):
         """
         Descarga un episodio individual
         
         Args:
             url (str): URL del episodio
             episode_num (int): Número del episodio (opcional)
+            job_id (int): Trabajo de la cola a actualizar (opcional)
+            resolved (dict): Episodio ya resuelto (modo pipeline o al medir tamaños, opcional)
+            size (int): Tamaño conocido del episodio en bytes (opcional)
             
         Returns:
-            dict: Resultado de la descarga
+            JobRecord: Resultado de la descarga
         """
-        result = {
-            'url': url,
-            'episode': episode_num,
-            'success': False,
-            'error': None,
-            'duration': 0
-        }
+        result = JobRecord(url, episode_num)
         
         start_time = time.time()
         
         try:
-            # Crear downloader individual
-            downloader = AnimeDownloader(
-                output_path=str(self.output_path),
-                quality=self.quality,
-                max_retries=Config.MAX_RETRIES
-            )
-            
             self.logger.info(f"Descargando episodio {episode_num or '?'}: {url}")
             
             # Realizar descarga
-            success = downloader.download_episode(url)
+            progress = self._job_progress(job_id, result)
+            if size and not self._has_space_for(size, job_id):
+                result.error = 'Espacio insuficiente en disco'
+                result.error_class = 'InsufficientSpace'
+                success = False
+            elif self.resolve_workers or resolved:
+                success = self.downloader.download_resolved(url, resolved, progress)
+            else:
+                success = self.downloader.download_episode(url, progress)
             
-            result['success'] = success
-            result['duration'] = time.time() - start_time
+            result.success = bool(success)
+            result.duration = time.time() - start_time
             
             if success:
-                self.stats['successful'] += 1
+                # El tamaño final es el del archivo en disco (tras unir pistas, etc.)
+                result.path = resolve_output_path(result.path)
+                if result.path and os.path.exists(result.path):
+                    result.bytes = os.path.getsize(result.path)
                 self.logger.info(f"✅ Episodio {episode_num or '?'} descargado exitosamente")
             else:
-                self.stats['failed'] += 1
+                result.error_class = result.error_class or 'DownloadFailed'
                 self.logger.error(f"❌ Error descargando episodio {episode_num or '?'}")
                 
         except Exception as e:
-            result['error'] = str(e)
-            result['duration'] = time.time() - start_time
-            self.stats['failed'] += 1
+            result.error = str(e)
+            result.error_class = type(e).__name__
+            result.duration = time.time() - start_time
             self.logger.error(f"❌ Excepción en episodio {episode_num or '?'}: {e}")
+        
+        if job_id is not None:
+            if result.success:
+                self.queue.complete(job_id, self.owner, result.bytes, result.duration, result.path)
+            else:
+                self.queue.fail(job_id, self.owner, result.error or 'La descarga falló')
             
         return result
         
-    def download_batch(self, urls, progress_callback=None):
+    def _has_space_for(self, size, job_id=None):
+        """
+        Comprueba si cabe un episodio contando lo que ocuparán las descargas
+        en curso de todos los procesos que comparten la cola
+        
+        Args:
+            size (int): Tamaño del episodio en bytes
+            job_id (int): Trabajo del episodio (no se cuenta como en curso)
+            
+        Returns:
+            bool: True si hay espacio suficiente
+        """
+        try:
+            available = check_disk_space(self.output_path)
+        except Exception as e:
+            self.logger.warning(f"No se pudo verificar el espacio en disco: {e}")
+            return True
+        
+        if available == float('inf'):
+            return True
+        
+        reserved = self.queue.active_bytes(exclude=job_id)
+        if available - reserved < size + MIN_FREE_SPACE:
+            self.logger.error(f"Espacio insuficiente en disco para el episodio ({format_bytes(size)})")
+            return False
+        return True
+        
+    def download_batch(self, urls, progress_callback=None, episode_numbers=None, priority=0):
+        """
+        Encola múltiples URLs y las descarga en paralelo
+        
+        Los episodios ya completados en ejecuciones anteriores se saltan y los
+        que quedaron a medias se retoman.
+        
+        Args:
+            urls (iterable): URLs (lista o generador, se leen bajo demanda)
+            progress_callback (callable): Función para reportar progreso
+            episode_numbers (iterable): Número de episodio de cada URL (por defecto su posición)
+            priority (int): Prioridad de los trabajos (mayor se descarga antes)
+            
+        Returns:
+            dict: Resultados de la descarga por lotes
+        """
+        if episode_numbers is None:
+            episode_numbers = itertools.count(1)
+        return self.download_stream(zip(urls, episode_numbers), progress_callback, priority)
+        
+    def download_stream(self, entries, progress_callback=None, priority=0):
+        """
+        Descarga los episodios de un iterable de (url, número de episodio)
+        
+        La entrada se consume a medida que avanza el lote: en la cola nunca hay
+        más de Config.INGEST_WINDOW trabajos pendientes, así una lista de
+        cientos de miles de URLs (o un generador sin fin) no llena la memoria.
+        
+        Args:
+            entries (iterable): Pares (url, número de episodio), o tríos con el
+                                episodio ya resuelto como tercer elemento
+            progress_callback (callable): Función para reportar progreso
+            priority (int): Prioridad de los trabajos (mayor se descarga antes)
+            
+        Returns:
+            dict: Resultados de la descarga por lotes
         """
-        Descarga múltiples URLs en paralelo
+        return self.run_jobs(uuid.uuid4().hex, progress_callback, ingest=(entries, priority))
+        
+    def download_plan(self, plan_path, progress_callback=None, priority=0):
+        """
+        Descarga los episodios de un plan generado con plan(), sin resolverlos de nuevo
+        
+        Las resoluciones demasiado antiguas (URLs firmadas caducadas) se
+        repiten al descargar, igual que en el modo pipeline.
         
         Args:
-            urls (list): Lista de URLs
+            plan_path (str): Archivo JSONL del plan
             progress_callback (callable): Función para reportar progreso
+            priority (int): Prioridad de los trabajos (mayor se descarga antes)
             
         Returns:
             dict: Resultados de la descarga por lotes
         """
-        self.stats['total'] = len(urls)
-        self.stats['start_time'] = time.time()
+        if self.processes > 1:
+            self.logger.warning("Con varios procesos cada uno vuelve a resolver sus episodios (el plan solo aporta el orden)")
         
-        self.logger.info(f"Iniciando descarga por lotes de {len(urls)} episodios")
-        self.logger.info(f"Calidad: {self.quality}, Trabajadores: {self.max_workers}")
+        entries = ((entry['url'], entry['episode'], entry.get('resolved')) for entry in self.iter_plan(plan_path))
+        return self.download_stream(entries, progress_callback, priority)
         
-        results = []
+    def iter_plan(self, plan_path):
+        """
+        Lee las entradas de un plan línea a línea
         
-        # Usar ThreadPoolExecutor para descargas paralelas
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Enviar todas las tareas
-            future_to_url = {
-                executor.submit(self.download_single, url, i+1): (url, i+1)
-                for i, url in enumerate(urls)
-            }
+        Args:
+            plan_path (str): Archivo JSONL del plan
             
-            # Procesar resultados conforme se completen
-            for future in as_completed(future_to_url):
-                url, episode_num = future_to_url[future]
+        Yields:
+            dict: Entrada de cada episodio (ver plan)
+        """
+        with open(Path(plan_path).expanduser(), 'r', encoding='utf-8') as f:
+            for line_num, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    self.logger.warning(f"Línea {line_num} del plan inválida, se ignora")
+        
+    def plan(self, entries, plan_path=None):
+        """
+        Resuelve todos los episodios sin descargarlos y estima disco y tiempo (--plan)
+        
+        Los episodios se resuelven en paralelo respetando los límites por host
+        y reutilizando las cachés de páginas y de streams. Cada episodio
+        resuelto se guarda en plan_path para que download_plan no tenga que
+        resolverlo de nuevo.
+        
+        Args:
+            entries (iterable): Pares (url, número de episodio)
+            plan_path (str): Archivo JSONL donde guardar el plan (opcional)
+            
+        Returns:
+            dict: Resumen con 'episodes' (sin las resoluciones), 'unreachable',
+                  'total_size', 'estimated_size', 'unknown_size', 'free_space',
+                  'enough_space', 'estimated_seconds' y 'hosts_without_history'
+        """
+        jobs = [
+            {'id': index, 'url': url, 'episode': episode_num, 'host': host_key(url)}
+            for index, (url, episode_num) in enumerate(entries)
+        ]
+        self.logger.info(f"🗺️  Resolviendo {len(jobs)} episodio(s) para planificar el lote")
+        
+        # Mismo reparto por host que las descargas, con todos los episodios ya en la cola
+        ready = ReadyQueue(len(jobs) + 1)
+        scheduler = HostScheduler(ready, self.host_limits)
+        for job in jobs:
+            ready.put(job['host'], (job, None))
+        ready.close()
+        
+        if plan_path:
+            try:
+                Path(plan_path).expanduser().unlink()
+            except FileNotFoundError:
+                pass
+        writer = ResultJournal(plan_path) if plan_path else None
+        planned = [None] * len(jobs)
+        
+        def resolver():
+            while True:
+                leased = scheduler.acquire(self._stop)
+                if leased is None:
+                    return
                 
+                host, (job, _) = leased
                 try:
-                    result = future.result()
-                    results.append(result)
-                    
-                    # Callback de progreso
-                    if progress_callback:
-                        progress_data = {
-                            'completed': len(results),
-                            'total': len(urls),
-                            'current_episode': episode_num,
-                            'current_url': url,
-                            'success': result['success']
-                        }
-                        progress_callback(progress_data)
-                        
-                except Exception as e:
-                    self.logger.error(f"Error obteniendo resultado para {url}: {e}")
-                    results.append({
-                        'url': url,
-                        'episode': episode_num,
-                        'success': False,
-                        'error': str(e),
-                        'duration': 0
+                    entry = self._plan_episode(job)
+                finally:
+                    scheduler.release(host)
+                
+                if writer:
+                    writer.write(entry)
+                entry.pop('resolved')
+                planned[job['id']] = entry
+        
+        try:
+            with ThreadPoolExecutor(max_workers=Config.PLAN_WORKERS) as executor:
+                for future in [executor.submit(resolver) for _ in range(Config.PLAN_WORKERS)]:
+                    future.result()
+        finally:
+            if writer:
+                writer.close()
+        
+        return self._estimate_plan([entry for entry in planned if entry], scheduler)
+        
+    def _plan_episode(self, job):
+        """
+        Resuelve un episodio del plan
+        
+        Args:
+            job (dict): Episodio con 'url', 'episode' y 'host'
+            
+        Returns:
+            dict: Entrada del plan ('url', 'episode', 'host', 'reachable', 'stream',
+                  'quality', 'size', 'error' y 'resolved')
+        """
+        entry = {
+            'url': job['url'],
+            'episode': job['episode'],
+            'host': job['host'],
+            'reachable': False,
+            'stream': None,
+            'quality': None,
+            'size': None,
+            'error': None,
+            'resolved': None,
+        }
+        
+        try:
+            resolved = self.downloader.resolve_episode(job['url'])
+            if resolved:
+                entry.update(self.downloader.describe_resolved(resolved))
+                entry['resolved'] = self.downloader.export_resolved(resolved)
+                entry['reachable'] = True
+            else:
+                entry['error'] = 'No se pudo resolver el episodio'
+        except Exception as e:
+            entry['error'] = str(e)
+        
+        if entry['reachable']:
+            self.logger.info(f"🔍 Episodio {job['episode'] or '?'} resuelto")
+        else:
+            self.logger.warning(f"Episodio {job['episode'] or '?'} inalcanzable: {entry['error']}")
+        return entry
+        
+    def _estimate_plan(self, entries, scheduler):
+        """
+        Estima el disco y el tiempo que necesitará un plan
+        
+        El tiempo sale de la velocidad histórica por descarga de cada host,
+        repartida entre las descargas simultáneas que permite cada uno. Los
+        episodios sin tamaño conocido se estiman con el tamaño medio del host
+        (o del resto del plan).
+        
+        Args:
+            entries (list): Entradas del plan (sin las resoluciones)
+            scheduler (HostScheduler): Planificador con los límites por host
+            
+        Returns:
+            dict: Resumen del plan (ver plan)
+        """
+        history = self.queue.host_throughput(time.time() - Config.PLAN_HISTORY_DAYS * 86400)
+        reachable = [entry for entry in entries if entry['reachable']]
+        known_sizes = [entry['size'] for entry in reachable if entry['size']]
+        plan_average = sum(known_sizes) / len(known_sizes) if known_sizes else None
+        workers = self._download_slots() * self.processes
+        
+        estimated_size = 0
+        job_seconds = 0.0
+        host_seconds = defaultdict(float)
+        without_history = set()
+        
+        for entry in reachable:
+            host_history = history.get(entry['host'])
+            size = entry['size'] or (host_history and host_history['avg_size']) or plan_average
+            estimated_size += size or 0
+            
+            if not host_history or not size:
+                without_history.add(entry['host'])
+                continue
+            
+            seconds = size / host_history['rate']
+            job_seconds += seconds
+            host_seconds[entry['host']] += seconds
+        
+        # Cada host avanza a la vez con sus propias descargas; el total no baja del tope de trabajadores
+        estimated_seconds = None
+        if host_seconds:
+            estimated_seconds = max(
+                [job_seconds / workers] +
+                [seconds / min(scheduler.limit_for(host), workers) for host, seconds in host_seconds.items()]
+            )
+        
+        try:
+            free_space = check_disk_space(self.output_path)
+        except Exception as e:
+            self.logger.warning(f"No se pudo verificar el espacio en disco: {e}")
+            free_space = None
+        
+        return {
+            'episodes': entries,
+            'unreachable': [entry for entry in entries if not entry['reachable']],
+            'total_size': sum(known_sizes),
+            'estimated_size': int(estimated_size),
+            'unknown_size': len(reachable) - len(known_sizes),
+            'free_space': free_space,
+            'enough_space': free_space is None or free_space - MIN_FREE_SPACE >= estimated_size,
+            'estimated_seconds': estimated_seconds,
+            'hosts_without_history': sorted(without_history),
+        }
+        
+    def enqueue(self, urls, episode_numbers=None, priority=0):
+        """
+        Encola URLs como una nueva ejecución sin descargarlas
+        
+        Los trabajadores de cualquier máquina que compartan la cola (--worker)
+        pueden procesarlas; las ya completadas no se vuelven a descargar.
+        
+        Args:
+            urls (iterable): URLs (lista o generador)
+            episode_numbers (iterable): Número de episodio de cada URL (por defecto su posición)
+            priority (int): Prioridad de los trabajos (mayor se descarga antes)
+            
+        Returns:
+            tuple: (run_id de la ejecución, episodios encolados, episodios ya completados antes)
+        """
+        if episode_numbers is None:
+            episode_numbers = itertools.count(1)
+        return self.enqueue_stream(zip(urls, episode_numbers), priority)
+        
+    def enqueue_stream(self, entries, priority=0, run_id=None):
+        """
+        Encola un iterable de (url, número de episodio) como una nueva ejecución
+        
+        Args:
+            entries (iterable): Pares (url, número de episodio), se leen uno a uno
+            priority (int): Prioridad de los trabajos (mayor se descarga antes)
+            run_id (str): Ejecución a la que añadirlos (default: una nueva)
+            
+        Returns:
+            tuple: (run_id de la ejecución, episodios encolados, episodios ya completados antes)
+        """
+        run_id = run_id or uuid.uuid4().hex
+        queued = skipped = 0
+        
+        for url, episode_num, *resolved in entries:
+            if self._enqueue_entry(run_id, url, episode_num, priority, *resolved):
+                queued += 1
+            else:
+                skipped += 1
+        
+        if skipped:
+            self.logger.info(f"⏭️  {skipped} episodio(s) ya descargados en ejecuciones anteriores")
+        
+        return run_id, queued, skipped
+        
+    def _enqueue_entry(self, run_id, url, episode_num, priority, resolved=None):
+        """
+        Encola un episodio en una ejecución
+        
+        Args:
+            resolved (dict): Episodio ya resuelto (de un plan), para no resolverlo de nuevo
+        
+        Returns:
+            bool: False si ya estaba descargado en una ejecución anterior
+        """
+        job = self.queue.enqueue(url, episode_num, priority, run_id, host_key(url))
+        if job['state'] == DONE:
+            if not self.force and self._still_downloaded(job):
+                return False
+            self.queue.requeue([url], run_id)
+            job = self.queue.enqueue(url, episode_num, priority, run_id, host_key(url))
+        
+        if resolved:
+            self._resolved[job['id']] = resolved
+            if resolved.get('size') and not job.get('size'):
+                self.queue.set_size(job['id'], resolved['size'])
+        return True
+        
+    def _still_downloaded(self, job):
+        """
+        Indica si un trabajo completado sigue descargado en el destino de este lote
+        
+        Con una cola local se comprueba que el archivo exista y esté bajo el
+        directorio de salida (otro -o vuelve a descargar). Con una cola remota
+        los archivos están en las máquinas de los trabajadores y se confía en
+        la cola, igual que con trabajos completados antes de guardar la ruta.
+        
+        Args:
+            job (dict): Trabajo completado
+        
+        Returns:
+            bool: False si hay que volver a descargarlo
+        """
+        if not job.get('path') or not isinstance(self.queue, JobQueue):
+            return True
+        
+        path = Path(job['path'])
+        return path.exists() and self.output_path in path.resolve().parents
+        
+    def _start_ingest(self, run_id, entries, priority, done):
+        """
+        Empieza a encolar una entrada en streaming
+        
+        La primera ventana se encola en el acto, así el total inicial y la
+        medición de tamaños la incluyen; el resto lo encola un hilo a medida
+        que los trabajadores vacían la cola.
+        
+        Args:
+            run_id (str): Ejecución donde encolar
+            entries (iterable): Pares (url, número de episodio)
+            priority (int): Prioridad de los trabajos
+            done: Evento (threading o multiprocessing) que se activa al agotar la entrada
+        """
+        self._ingest_done = done
+        entries = iter(entries)
+        
+        if self._ingest(run_id, entries, priority, wait=False):
+            done.set()
+            return
+        
+        def feed():
+            try:
+                self._ingest(run_id, entries, priority)
+            except Exception as e:
+                self.logger.error(f"Error leyendo las URLs del lote: {e}")
+            finally:
+                done.set()
+        
+        threading.Thread(target=feed, name='batch-ingest', daemon=True).start()
+        
+    def _ingest(self, run_id, entries, priority, wait=True):
+        """
+        Encola entradas sin superar Config.INGEST_WINDOW trabajos pendientes
+        
+        Con orden por tamaño, el hilo de streaming mide cada tanda encolada
+        antes de esperar hueco, así los episodios de fuera de la primera
+        ventana también se ordenan por tamaño.
+        
+        Args:
+            run_id (str): Ejecución donde encolar
+            entries (iterator): Pares (url, número de episodio)
+            priority (int): Prioridad de los trabajos
+            wait (bool): Esperar hueco en la ventana en lugar de volver
+            
+        Returns:
+            bool: True si se agotó la entrada
+        """
+        measure = wait and self.measure_sizes and self.order in ('shortest', 'longest')
+        added = 0
+        room = 0
+        while not self._stop.is_set():
+            # El número de pendientes solo se consulta al agotar el hueco conocido
+            if room <= 0:
+                if measure and added:
+                    self._measure_sizes(run_id)
+                    added = 0
+                room = Config.INGEST_WINDOW - sum(self.queue.pending_hosts(run_id).values())
+                if room <= 0:
+                    if not wait:
+                        return False
+                    self._stop.wait(0.5)
+                    continue
+            
+            entry = next(entries, None)
+            if entry is None:
+                if measure and added:
+                    self._measure_sizes(run_id)
+                return True
+            
+            url, episode_num, *resolved = entry
+            if self._enqueue_entry(run_id, url, episode_num, priority, *resolved):
+                self.stats['total'] += 1
+                room -= 1
+                added += 1
+            else:
+                self.stats['skipped'] += 1
+        return False
+        
+    def retry_failed(self, progress_callback=None):
+        """
+        Vuelve a descargar todos los trabajos fallidos de la cola
+        
+        Args:
+            progress_callback (callable): Función para reportar progreso
+            
+        Returns:
+            dict: Resultados de la descarga por lotes, o None si no había fallidos
+        """
+        run_id = uuid.uuid4().hex
+        retried = self.queue.retry_failed(run_id)
+        if not retried:
+            return None
+        
+        self.logger.info(f"🔁 Reintentando {retried} trabajo(s) fallido(s)")
+        return self.run_jobs(run_id, progress_callback)
+        
+    def run_jobs(self, run_id, progress_callback=None, skipped=0, ingest=None):
+        """
+        Procesa los trabajos pendientes de una ejecución con max_workers trabajadores
+        
+        Args:
+            run_id (str): Ejecución cuyos trabajos se procesan (None para los de
+                          cualquier ejecución de la cola, modo --worker)
+            progress_callback (callable): Función para reportar progreso
+            skipped (int): Episodios saltados por estar ya completados
+            ingest (tuple): (pares (url, episodio), prioridad) a encolar en
+                            streaming mientras se descarga (opcional)
+            
+        Returns:
+            dict: Resultados de la descarga por lotes
+        """
+        if self.processes > 1:
+            return self._run_processes(run_id, progress_callback, skipped, ingest)
+        
+        self._start_run(run_id, skipped)
+        if ingest is not None:
+            self._start_ingest(run_id, *ingest, threading.Event())
+        
+        self.logger.info(f"Iniciando descarga por lotes de {self.stats['total']} episodios"
+                         f"{' (leyendo el resto en streaming)' if self._streaming() else ''}")
+        self.logger.info(f"Calidad: {self.quality}, Trabajadores: {self.max_workers}, Orden: {self.order}")
+        
+        executors = []
+        tasks = []
+        
+        # Ordenar por tamaño requiere resolver antes los episodios que aún no lo tienen
+        if self.order in ('shortest', 'longest') and self.measure_sizes:
+            self._measure_sizes(run_id)
+        
+        # Los trabajos se reparten por host: límite de concurrencia por sitio y turnos justos
+        source = JobSource(self.queue, self.owner, run_id, self.order, self._ingest_done)
+        scheduler = HostScheduler(source, self.host_limits, share=self.host_share)
+        
+        # Mantener vivos los leases de este trabajador mientras dure la ejecución
+        finished = threading.Event()
+        threading.Thread(target=self._renew_leases, args=(finished,), name='lease-renewal', daemon=True).start()
+        
+        try:
+            if self.resolve_workers:
+                self._run_pipeline(scheduler, progress_callback, executors, tasks, finished)
+            else:
+                # Cada trabajador toma trabajos de la cola hasta vaciarla
+                self._start_autotune(scheduler, finished)
+                self._start_schedule(scheduler, finished)
+                executor = ThreadPoolExecutor(max_workers=self._download_slots())
+                executors.append(executor)
+                tasks.extend(
+                    executor.submit(self._worker, scheduler, progress_callback)
+                    for _ in range(self._download_slots())
+                )
+                for task in tasks:
+                    task.result()
+        except KeyboardInterrupt:
+            # No tomar más trabajos; las descargas en curso no se pueden cortar,
+            # así que se espera a que terminen para anotarlas como completadas
+            self._stop.set()
+            self.logger.info("🛑 Deteniendo: esperando a que terminen los episodios en curso")
+            # Otro Ctrl-C no puede cortar las descargas: se sigue esperando. Se espera
+            # a las tareas y no a los hilos, porque un join interrumpido da el hilo por terminado
+            while True:
+                try:
+                    wait(tasks)
+                    break
+                except KeyboardInterrupt:
+                    self.logger.info("🛑 Aún hay episodios en curso, esperando a que terminen")
+            
+            # Con los trabajadores parados solo quedan con lease los episodios resueltos
+            # sin empezar: vuelven a la cola sin contar el intento
+            released = self.queue.release(self.owner)
+            if released:
+                self.logger.info(f"🛑 {released} trabajo(s) sin terminar devueltos a la cola")
+            raise
+        finally:
+            finished.set()
+            for executor in executors:
+                executor.shutdown(wait=not self._stop.is_set())
+            if self.journal:
+                self.journal.sync()
+        
+        self.stats['end_time'] = time.time()
+        return self._generate_summary(self.aggregate)
+        
+    def stop(self):
+        """
+        Deja de tomar trabajos nuevos; los episodios en curso terminan y
+        run_jobs vuelve cuando acaban
+        """
+        self._stop.set()
+        
+    def _download_slots(self):
+        """
+        Trabajadores de descarga a crear (el máximo del autoajuste o de las
+        franjas horarias; la capacidad del planificador decide cuántos trabajan)
+        """
+        slots = self.autotune[1] if self.autotune else self.max_workers
+        if self.schedule:
+            slots = max(slots, self.schedule.max_workers)
+        return slots
+        
+    def _start_autotune(self, scheduler, finished):
+        """
+        Arranca el autoajuste de la concurrencia de descarga, si está activo
+        
+        Args:
+            scheduler (HostScheduler): Planificador de las descargas
+            finished (threading.Event): Se activa al terminar la ejecución
+        """
+        self.tuner = None
+        if not self.autotune:
+            return
+        
+        self.tuner = AutoTuner(scheduler, *self.autotune, start=self.max_workers)
+        threading.Thread(target=self.tuner.run, args=(finished,), name='autotune', daemon=True).start()
+        
+    def _start_schedule(self, scheduler, finished):
+        """
+        Aplica las franjas horarias de velocidad y concurrencia, si las hay
+        
+        Args:
+            scheduler (HostScheduler): Planificador de las descargas
+            finished (threading.Event): Se activa al terminar la ejecución
+        """
+        if self.schedule:
+            self.schedule.follow(scheduler, finished, self.max_workers, self.tuner)
+        
+    def _streaming(self):
+        """True mientras una entrada en streaming siga encolando trabajos"""
+        return self._ingest_done is not None and not self._ingest_done.is_set()
+        
+    def _renew_leases(self, finished):
+        """
+        Renueva periódicamente los leases de este trabajador
+        
+        Si el proceso o la máquina caen, los leases dejan de renovarse y sus
+        trabajos vuelven a la cola para otro trabajador.
+        
+        Args:
+            finished (threading.Event): Se activa al terminar la ejecución
+        """
+        while not finished.wait(Config.JOB_HEARTBEAT_SECONDS):
+            try:
+                self.queue.renew(self.owner)
+            except Exception as e:
+                self.logger.warning(f"No se pudieron renovar los leases: {e}")
+        
+    def _start_run(self, run_id, skipped=0):
+        """
+        Recupera los trabajos abandonados y reinicia las estadísticas de una ejecución
+        
+        Con una entrada en streaming el total crece a medida que se encola.
+        
+        Args:
+            run_id (str): Ejecución que va a procesarse
+            skipped (int): Episodios saltados por estar ya completados
+            
+        Returns:
+            int: Número de trabajos por procesar
+        """
+        # Retomar los trabajos que dejó a medias un proceso que ya no existe
+        self.queue.recover()
+        
+        total = len([job for job in self.queue.jobs(run_id) if job['state'] not in (DONE, FAILED)])
+        
+        self.stats.update({
+            'total': total,
+            'successful': 0,
+            'failed': 0,
+            'skipped': skipped,
+            'start_time': time.time(),
+            'end_time': None
+        })
+        self.aggregate = BatchAggregate()
+        self._resolved.clear()
+        self._stop.clear()
+        return total
+        
+    def _run_processes(self, run_id, progress_callback=None, skipped=0, ingest=None):
+        """
+        Reparte los trabajos de una ejecución entre varios procesos
+        
+        Cada proceso hijo abre la misma cola SQLite y ejecuta run_jobs con sus
+        propios trabajadores, así la extracción y el parseo (Python puro) usan
+        varios núcleos. Los hijos solo envían un aviso por episodio terminado,
+        el ancho de banda se reparte con un contador en memoria compartida y
+        el espacio en disco se reserva a través de la cola. Una entrada en
+        streaming la encola este proceso; los hijos esperan trabajos hasta que
+        se agota.
+        
+        Args:
+            run_id (str): Ejecución cuyos trabajos se procesan
+            progress_callback (callable): Función para reportar progreso
+            skipped (int): Episodios saltados por estar ya completados
+            ingest (tuple): (pares (url, episodio), prioridad) a encolar en streaming (opcional)
+            
+        Returns:
+            dict: Resultados de la descarga por lotes
+        """
+        context = multiprocessing.get_context('spawn')
+        ingest_done = context.Event()
+        
+        self._start_run(run_id, skipped)
+        if ingest is not None:
+            self._start_ingest(run_id, *ingest, ingest_done)
+        else:
+            ingest_done.set()
+        
+        self.logger.info(f"Iniciando descarga por lotes de {self.stats['total']} episodios"
+                         f"{' (leyendo el resto en streaming)' if self._streaming() else ''}")
+        self.logger.info(f"Procesos: {self.processes}, Trabajadores por proceso: {self.max_workers}")
+        
+        # Los tamaños se comparten a través de la cola: se miden una sola vez, antes de repartir
+        if self.order in ('shortest', 'longest'):
+            self._measure_sizes(run_id)
+        
+        events = context.Queue()
+        active_downloads = context.Value('i', 0)
+        options = {
+            'output_path': str(self.output_path),
+            'quality': self.quality,
+            'max_workers': self.max_workers,
+            'queue_path': self.queue.location,
+            'resolve_workers': self.resolve_workers,
+            'host_limits': self.host_limits,
+            'order': self.order,
+            'processes': 1,
+            'journal_path': str(self.journal.path) if self.journal else None,
+            'autotune': self.autotune,
+            'schedule': self.schedule,
+        }
+        settings = {name: value for name, value in vars(Config).items() if name.isupper()}
+        verbose = logging.getLogger().getEffectiveLevel() <= logging.DEBUG
+        
+        completed = 0
+        executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=context,
+            initializer=_init_batch_process,
+            initargs=(settings, verbose, events, active_downloads, get_governor().rate, ingest_done)
+        )
+        
+        def report(event):
+            nonlocal completed
+            completed += 1
+            episode, url, success = event
+            if progress_callback:
+                try:
+                    progress_callback({
+                        'completed': completed,
+                        'total': self.stats['total'],
+                        'current_episode': episode,
+                        'current_url': url,
+                        'success': success
                     })
-                    self.stats['failed'] += 1
+                except Exception as e:
+                    self.logger.debug(f"Error en callback de progreso (ignorado): {e}")
+        
+        processes = []
+        try:
+            processes = [
+                executor.submit(_run_batch_process, options, run_id, self.processes)
+                for _ in range(self.processes)
+            ]
+            
+            while not all(process.done() for process in processes):
+                try:
+                    report(events.get(timeout=0.5))
+                except Empty:
+                    pass
+            
+            for process in processes:
+                outcome = process.result()
+                if outcome is None:
+                    continue
+                # Los tiempos de cada hijo cuentan desde su propio inicio
+                start_time, aggregate = outcome
+                self.aggregate.merge(aggregate, start_time - self.stats['start_time'])
+            
+            # Avisos que aún estaban en camino cuando terminaron los procesos
+            while completed < self.aggregate.completed:
+                try:
+                    report(events.get(timeout=1))
+                except Empty:
+                    break
+        except KeyboardInterrupt:
+            # Cada hijo recibe también Ctrl-C, termina sus descargas en curso y devuelve el resto a la cola
+            self._stop.set()
+            raise
+        finally:
+            # Los procesos aún sin empezar no llegan a arrancar (cancel_futures requiere Python 3.9)
+            for process in processes:
+                process.cancel()
+            executor.shutdown(wait=True)
         
         self.stats['end_time'] = time.time()
-        return self._generate_summary(results)
+        self.aggregate.failures.sort(key=lambda record: record.completed_after)
+        return self._generate_summary(self.aggregate)
+        
+    def _run_pipeline(self, scheduler, progress_callback, executors, tasks, finished):
+        """
+        Modo pipeline: los resolutores van unos episodios por delante y dejan
+        los episodios resueltos en una cola acotada que vacían las descargas
         
-    def _generate_summary(self, results):
+        Cada etapa respeta por separado el límite de concurrencia de cada host.
+        
+        Args:
+            scheduler (HostScheduler): Planificador de los trabajos de la cola
+            progress_callback (callable): Función para reportar progreso
+            executors (list): Lista donde registrar los pools creados
+            tasks (list): Lista donde registrar las tareas de los pools
+            finished (threading.Event): Se activa al terminar la ejecución
+        """
+        ready = ReadyQueue(Config.PIPELINE_QUEUE_SIZE, self.order)
+        transfer_scheduler = HostScheduler(ready, self.host_limits, share=self.host_share)
+        
+        # El autoajuste regula las descargas; los resolutores son fijos
+        self._start_autotune(transfer_scheduler, finished)
+        self._start_schedule(transfer_scheduler, finished)
+        resolver_pool = ThreadPoolExecutor(max_workers=self.resolve_workers)
+        transfer_pool = ThreadPoolExecutor(max_workers=self._download_slots())
+        executors.extend([resolver_pool, transfer_pool])
+        
+        self.logger.info(f"Modo pipeline: {self.resolve_workers} resolutor(es), {self.max_workers} descarga(s)")
+        
+        resolvers = [
+            resolver_pool.submit(self._resolver, scheduler, ready)
+            for _ in range(self.resolve_workers)
+        ]
+        transfers = [
+            transfer_pool.submit(self._worker, transfer_scheduler, progress_callback)
+            for _ in range(self._download_slots())
+        ]
+        tasks.extend(resolvers + transfers)
+        
+        try:
+            for resolver in resolvers:
+                resolver.result()
+        finally:
+            # Sin más episodios por resolver, las descargas terminan al vaciar la cola
+            ready.close()
+        
+        for transfer in transfers:
+            transfer.result()
+        
+    def _resolver(self, scheduler, ready):
+        """
+        Bucle de un resolutor: toma un trabajo, lo resuelve y lo deja en la cola de descargas
+        
+        Args:
+            scheduler (HostScheduler): Planificador de los trabajos de la cola
+            ready (ReadyQueue): Cola acotada de episodios resueltos
+        """
+        while True:
+            leased = scheduler.acquire(self._stop)
+            if leased is None:
+                return
+            
+            host, job = leased
+            try:
+                resolved = self._resolve_job(job)
+                if resolved:
+                    self.logger.info(f"🔍 Episodio {job['episode'] or '?'} resuelto")
+            finally:
+                scheduler.release(host)
+            
+            # Esperar hueco en la cola (el lease lo mantiene _renew_leases)
+            while not self._stop.is_set():
+                if ready.put(host, (job, resolved), timeout=1):
+                    break
+        
+    def _worker(self, scheduler, progress_callback=None):
+        """
+        Bucle de un trabajador: toma un trabajo, lo descarga y repite
+        
+        En modo pipeline los trabajos llegan ya resueltos desde la ReadyQueue.
+        
+        Args:
+            scheduler (HostScheduler): Planificador de donde tomar trabajos
+            progress_callback (callable): Función para reportar progreso
+        """
+        while True:
+            leased = scheduler.acquire(self._stop)
+            if leased is None:
+                return
+            
+            host, item = leased
+            job, resolved = item if isinstance(item, tuple) else (item, self._resolved.pop(item['id'], None))
+            
+            if job['attempts'] > 1:
+                self.logger.info(f"Retomando episodio {job['episode'] or '?'} (intento {job['attempts']})")
+            
+            try:
+                size = job.get('size') or (resolved or {}).get('size')
+                result = self.download_single(job['url'], job['episode'], job['id'], resolved, size)
+            finally:
+                scheduler.release(host)
+            
+            self._record_result(job, result, progress_callback)
+        
+    def _measure_sizes(self, run_id):
+        """
+        Resuelve los episodios pendientes sin tamaño conocido y guarda su tamaño
+        
+        Las resoluciones se conservan para descargar después sin repetirlas,
+        salvo en el proceso principal del modo multiproceso: ahí descargan los
+        hijos y solo les llega el tamaño.
+        
+        Args:
+            run_id (str): Ejecución cuyos trabajos se miden
+        """
+        jobs = [job for job in self.queue.jobs(run_id, PENDING) if job['size'] is None and job['id'] not in self._measured]
+        if not jobs:
+            return
+        self._measured.update(job['id'] for job in jobs)
+        
+        self.logger.info(f"📏 Resolviendo {len(jobs)} episodio(s) para conocer su tamaño")
+        with ThreadPoolExecutor(max_workers=self.resolve_workers or self.max_workers) as executor:
+            for job, resolved in zip(jobs, executor.map(self.downloader.resolve_episode, [job['url'] for job in jobs])):
+                if resolved:
+                    if self.processes == 1:
+                        self._resolved[job['id']] = resolved
+                    if resolved.get('size'):
+                        self.queue.set_size(job['id'], resolved['size'])
+        
+    def _resolve_job(self, job):
+        """
+        Resuelve el episodio de un trabajo (o reutiliza su resolución previa)
+        y anota su tamaño en el trabajo y en la cola
+        
+        Args:
+            job (dict): Trabajo tomado de la cola
+            
+        Returns:
+            dict: Episodio resuelto, o None si falló
+        """
+        resolved = self._resolved.pop(job['id'], None) or self.downloader.resolve_episode(job['url'])
+        if resolved and resolved.get('size') and not job.get('size'):
+            job['size'] = resolved['size']
+            self.queue.set_size(job['id'], resolved['size'])
+        return resolved
+        
+    def _record_result(self, job, result, progress_callback=None):
+        """Acumula el resultado de un trabajo y reporta el progreso"""
+        if self.library and result.success and result.path:
+            try:
+                self.library.add_file(result.path, job['url'], episode=job['episode'])
+            except Exception as e:
+                self.logger.warning(f"No se pudo añadir {result.path} a la biblioteca: {e}")
+        
+        with self._progress_lock:
+            # Momento en que el episodio queda disponible, desde el inicio del lote
+            result.completed_after = time.time() - self.stats['start_time']
+            result.attempts = job['attempts']
+            self.aggregate.add(result)
+            if self.tuner:
+                self.tuner.record_result(result)
+            
+            if self.journal:
+                try:
+                    self.journal.write(record_entry(result, job.get('run_id')))
+                except Exception as e:
+                    self.logger.warning(f"No se pudo escribir en el diario del lote: {e}")
+            
+            # Callback de progreso
+            if progress_callback:
+                try:
+                    progress_callback({
+                        'completed': self.aggregate.completed,
+                        'total': self.stats['total'],
+                        'current_episode': job['episode'],
+                        'current_url': job['url'],
+                        'success': result.success,
+                        'error': result.error,
+                        'job_id': job['id'],
+                        'run_id': job.get('run_id')
+                    })
+                except Exception as e:
+                    self.logger.debug(f"Error en callback de progreso (ignorado): {e}")
+        
+    def _generate_summary(self, aggregate):
         """
         Genera resumen de la descarga por lotes
         
-        Args:
-            results (list): Lista de resultados de descarga
-            
-        Returns:
-            dict: Resumen detallado
-        """
-        total_duration = self.stats['end_time'] - self.stats['start_time']
-        successful_results = [r for r in results if r['success']]
-        failed_results = [r for r in results if not r['success']]
+        Args:
+            aggregate (BatchAggregate): Resultados acumulados del lote
+            
+        Returns:
+            dict: Resumen detallado ('failed_downloads' es una lista de JobRecord)
+        """
+        total_duration = self.stats['end_time'] - self.stats['start_time']
+        self.stats['successful'] = aggregate.successful
+        self.stats['failed'] = aggregate.failed
+        successful = aggregate.successful
+        
+        summary = {
+            'stats': self.stats.copy(),
+            'duration': total_duration,
+            'failed_downloads': aggregate.failures,
+            'success_rate': (self.stats['successful'] / self.stats['total'] * 100) if self.stats['total'] > 0 else 0,
+            'average_time_per_download': aggregate.download_time / successful if successful else 0,
+            'first_playable': aggregate.first_playable,
+            'mean_time_to_playable': aggregate.playable_time / successful if successful else None
+        }
+        
+        return summary
+        
+    def print_plan(self, plan):
+        """
+        Imprime el plan de un lote
+        
+        Args:
+            plan (dict): Resumen generado por plan()
+        """
+        print("\n" + "="*60)
+        print("🗺️  PLAN DEL LOTE")
+        print("="*60)
+        
+        for entry in plan['episodes']:
+            if entry['reachable']:
+                size = format_bytes(entry['size']) if entry['size'] else '¿?'
+                print(f"  • Episodio {entry['episode']}: {entry['quality'] or '¿?':>6} {size:>10}  {str(entry['stream'])[:60]}")
+        
+        reachable = len(plan['episodes']) - len(plan['unreachable'])
+        print(f"\n📊 Episodios resueltos: {reachable} de {len(plan['episodes'])}")
+        unknown = f" ({plan['unknown_size']} sin tamaño conocido)" if plan['unknown_size'] else ''
+        print(f"💾 Tamaño estimado: {format_bytes(plan['estimated_size'])}{unknown}")
+        
+        if plan['free_space'] is not None and plan['free_space'] != float('inf'):
+            status = "✅ suficiente" if plan['enough_space'] else "❌ insuficiente"
+            print(f"🗄️  Espacio libre: {format_bytes(plan['free_space'])} ({status})")
         
-        summary = {
-            'stats': self.stats.copy(),
-            'duration': total_duration,
-            'successful_downloads': successful_results,
-            'failed_downloads': failed_results,
-            'success_rate': (self.stats['successful'] / self.stats['total'] * 100) if self.stats['total'] > 0 else 0,
-            'average_time_per_download': sum(r['duration'] for r in successful_results) / len(successful_results) if successful_results else 0
-        }
+        if plan['estimated_seconds'] is not None:
+            print(f"⏱️  Duración estimada: {plan['estimated_seconds'] / 60:.1f} minutos")
+        if plan['hosts_without_history']:
+            print(f"❔ Sin historial de velocidad: {', '.join(plan['hosts_without_history'])}")
         
-        return summary
+        if plan['unreachable']:
+            print(f"\n❌ INALCANZABLES ({len(plan['unreachable'])}):")
+            for entry in plan['unreachable']:
+                error_msg = entry['error'] or "Error desconocido"
+                print(f"  • Episodio {entry['episode']}: {entry['url']} ({error_msg[:50]})")
+        
+        print("="*60)
         
     def print_summary(self, summary):
         """
@@ -236,21 +1406,125 @@ class BatchDownloader:
         print(f"📊 Total de episodios: {stats['total']}")
         print(f"✅ Exitosas: {stats['successful']}")
         print(f"❌ Fallidas: {stats['failed']}")
+        if stats.get('skipped'):
+            print(f"⏭️  Ya descargadas antes: {stats['skipped']}")
         print(f"📈 Tasa de éxito: {summary['success_rate']:.1f}%")
         print(f"⏱️  Tiempo total: {summary['duration']:.1f} segundos")
         
         if summary['average_time_per_download'] > 0:
             print(f"⚡ Tiempo promedio por descarga: {summary['average_time_per_download']:.1f} segundos")
         
+        if summary.get('first_playable') is not None:
+            print(f"🎬 Primer episodio disponible a los: {summary['first_playable']:.1f} segundos")
+            print(f"📺 Tiempo medio hasta tener cada episodio: {summary['mean_time_to_playable']:.1f} segundos")
+        
         # Mostrar descargas fallidas si las hay
         if summary['failed_downloads']:
             print(f"\n❌ DESCARGAS FALLIDAS ({len(summary['failed_downloads'])}):")
             for fail in summary['failed_downloads']:
-                error_msg = fail['error'] or "Error desconocido"
-                print(f"  • Episodio {fail['episode']}: {error_msg[:50]}...")
+                error_msg = fail.error or "Error desconocido"
+                print(f"  • Episodio {fail.episode}: {error_msg[:50]}...")
         
         print("="*60)
         
+# Cola de avisos hacia el proceso principal (en los procesos hijos del lote)
+_process_events = None
+
+# Se activa cuando el proceso principal termina de encolar la entrada del lote
+_process_ingest_done = None
+
+def _init_batch_process(settings, verbose, events, active_downloads, rate, ingest_done):
+    """
+    Prepara un proceso hijo del modo multiproceso
+    
+    Args:
+        settings (dict): Configuración del proceso principal (atributos de Config)
+        verbose (bool): Logging detallado
+        events (multiprocessing.Queue): Cola de avisos hacia el proceso principal
+        active_downloads (multiprocessing.Value): Descargas activas entre todos los procesos
+        rate (float): Velocidad total del lote (None sin límite)
+        ingest_done (multiprocessing.Event): Se activa al terminar de encolar la entrada
+    """
+    global _process_events, _process_ingest_done
+    
+    for name, value in settings.items():
+        setattr(Config, name, value)
+    
+    setup_logging(verbose=verbose)
+    _process_events = events
+    _process_ingest_done = ingest_done
+    configure_bandwidth(rate, active_downloads)
+
+def _report_to_parent(data):
+    """Envía al proceso principal un aviso por episodio terminado"""
+    _process_events.put((data['current_episode'], data['current_url'], data['success']))
+
+def _run_batch_process(options, run_id, share):
+    """
+    Procesa trabajos de una ejecución dentro de un proceso hijo
+    
+    Args:
+        options (dict): Argumentos de BatchDownloader
+        run_id (str): Ejecución cuyos trabajos se procesan
+        share (int): Procesos entre los que se reparten los límites por host
+        
+    Returns:
+        tuple: (inicio del proceso, BatchAggregate), o None si se canceló con Ctrl-C
+    """
+    batch_downloader = BatchDownloader(**options)
+    batch_downloader.host_share = share
+    batch_downloader.measure_sizes = False
+    batch_downloader._ingest_done = _process_ingest_done
+    
+    try:
+        summary = batch_downloader.run_jobs(run_id, _report_to_parent)
+    except KeyboardInterrupt:
+        return None
+    
+    return summary['stats']['start_time'], batch_downloader.aggregate
+
+def iter_urls_from_file(file_path):
+    """
+    Lee URLs de un archivo de texto línea a línea, sin cargarlo entero
+    (también lo usan los clientes del servicio, sin crear un BatchDownloader)
+    
+    Args:
+        file_path (str): Ruta del archivo con URLs ('-' para la entrada estándar)
+        
+    Yields:
+        str: Cada URL válida
+    """
+    logger = logging.getLogger(__name__)
+    if file_path == '-':
+        yield from _iter_urls(sys.stdin, 'stdin', logger)
+        return
+    
+    file_path = Path(file_path)
+    if not file_path.exists():
+        logger.error(f"Archivo no encontrado: {file_path}")
+        return
+    
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            yield from _iter_urls(f, file_path, logger)
+    except OSError as e:
+        logger.error(f"Error leyendo archivo {file_path}: {e}")
+
+def _iter_urls(lines, source, logger):
+    """URLs válidas de un iterable de líneas (ignora comentarios y líneas vacías)"""
+    for line_num, line in enumerate(lines, 1):
+        line = line.strip()
+        
+        # Ignorar líneas vacías y comentarios
+        if not line or line.startswith('#'):
+            continue
+            
+        # Validar URL
+        if validate_url(line):
+            yield line
+        else:
+            logger.warning(f"URL inválida en línea {line_num} de {source}: {line}")
+
 def create_sample_urls_file(filename="sample_urls.txt"):
     """
     Crea un archivo de ejemplo con URLs
@@ -280,6 +1554,234 @@ def create_sample_urls_file(filename="sample_urls.txt"):
     except Exception as e:
         print(f"❌ Error creando archivo de ejemplo: {e}")
 
+def print_batch_progress(data):
+    """Muestra el progreso de una descarga por lotes en consola"""
+    completed = data['completed']
+    total = data['total']
+    percentage = (completed / total) * 100
+    current_ep = data['current_episode']
+    status = "✅" if data['success'] else "❌"
+    
+    print(f"{status} Progreso: {completed}/{total} ({percentage:.1f}%) - Episodio {current_ep}")
+
+def print_queue_status(queue):
+    """
+    Muestra el estado de la cola de trabajos
+    
+    Args:
+        queue (JobQueue): Cola de trabajos (local o remota)
+    """
+    counts = queue.counts()
+    icons = {
+        'pending': '⏳', 'extracting': '🔍', 'downloading': '⬇️ ',
+        'postprocessing': '⚙️ ', 'done': '✅', 'failed': '❌'
+    }
+    
+    print("\n" + "="*60)
+    print("🗂️  COLA DE DESCARGAS")
+    print("="*60)
+    for state, count in counts.items():
+        print(f"{icons[state]} {state:<15} {count}")
+    
+    active = [job for job in queue.jobs() if job['state'] not in ('pending', 'done', 'failed')]
+    if active:
+        print(f"\n🔄 EN CURSO ({len(active)}):")
+        for job in active:
+            print(f"  • Episodio {job['episode'] or '?'} [{job['state']}] {job['url']}")
+    
+    failed = queue.jobs(state=FAILED)
+    if failed:
+        print(f"\n❌ FALLIDOS ({len(failed)}) - reintentar con --retry-failed:")
+        for job in failed:
+            error_msg = job['last_error'] or "Error desconocido"
+            print(f"  • Episodio {job['episode'] or '?'} ({job['attempts']} intento(s)): {error_msg[:50]}")
+    
+    print("="*60)
+
+def create_batch_downloader(args):
+    """
+    Crea el descargador por lotes con las opciones de línea de comandos
+    
+    Args:
+        args (argparse.Namespace): Argumentos de línea de comandos
+    
+    Returns:
+        BatchDownloader: Descargador configurado
+    """
+    return BatchDownloader(
+        output_path=args.output,
+        quality=args.quality,
+        max_workers=args.workers,
+        queue_path=args.queue_db,
+        resolve_workers=args.resolvers if args.pipeline else 0,
+        host_limits=args.host_limit,
+        order=args.order,
+        processes=args.processes,
+        journal_path=args.journal,
+        autotune=args.autotune,
+        schedule=args.schedule,
+        force=args.force
+    )
+
+def run_sync(args):
+    """
+    Sincroniza las series de un archivo descargando solo episodios nuevos
+    
+    Args:
+        args (argparse.Namespace): Argumentos de línea de comandos
+    """
+    from series_sync import SeriesSync, SyncState
+    
+    if not Path(args.sync).exists():
+        print(f"Error: Archivo no encontrado: {args.sync}")
+        sys.exit(1)
+    
+    print("🎌 Anime Batch Downloader v1.0.0 - Sincronización")
+    print(f"📂 Series: {args.sync}")
+    print(f"🗄️  Estado: {args.sync_db}")
+    print("-" * 50)
+    
+    batch_downloader = create_batch_downloader(args)
+    sync = SeriesSync(batch_downloader, SyncState(args.sync_db))
+    
+    try:
+        if args.sync_interval:
+            sync.watch(args.sync, args.sync_interval, print_batch_progress)
+            return
+        
+        summary = sync.run_once(sync.load_series_file(args.sync), print_batch_progress)
+        if not summary:
+            print("✔️  No hay episodios nuevos.")
+            sys.exit(0)
+        
+        batch_downloader.print_summary(summary)
+        sys.exit(0 if summary['stats']['failed'] == 0 else 1)
+        
+    except KeyboardInterrupt:
+        print("\n🛑 Sincronización cancelada por el usuario.")
+        sys.exit(0)
+
+def run_retry_failed(args):
+    """
+    Reintenta los episodios fallidos de la cola de descargas
+    
+    Args:
+        args (argparse.Namespace): Argumentos de línea de comandos
+    """
+    batch_downloader = create_batch_downloader(args)
+    
+    try:
+        summary = batch_downloader.retry_failed(print_batch_progress)
+        if not summary:
+            print("✔️  No hay episodios fallidos en la cola.")
+            sys.exit(0)
+        
+        batch_downloader.print_summary(summary)
+        sys.exit(0 if summary['stats']['failed'] == 0 else 1)
+        
+    except KeyboardInterrupt:
+        print("\n🛑 Reintento cancelado por el usuario. El progreso queda guardado en la cola.")
+        sys.exit(0)
+
+def run_worker(args):
+    """
+    Procesa los trabajos pendientes de una cola compartida hasta vaciarla
+    
+    Args:
+        args (argparse.Namespace): Argumentos de línea de comandos
+    """
+    print("🎌 Anime Batch Downloader v1.0.0 - Trabajador")
+    print(f"🗂️  Cola: {args.queue_db}")
+    print(f"👥 Trabajadores: {args.workers}")
+    print("-" * 50)
+    
+    batch_downloader = create_batch_downloader(args)
+    
+    try:
+        summary = batch_downloader.run_jobs(None, print_batch_progress)
+        if not summary['stats']['total']:
+            print("✔️  No hay episodios pendientes en la cola.")
+            sys.exit(0)
+        
+        batch_downloader.print_summary(summary)
+        sys.exit(0 if summary['stats']['failed'] == 0 else 1)
+        
+    except KeyboardInterrupt:
+        print("\n🛑 Trabajador detenido. Sus episodios sin empezar vuelven a la cola.")
+        sys.exit(0)
+
+def run_daemon_client(args):
+    """
+    Envía el lote al servicio de descargas (daemon.py) y sigue su progreso
+    
+    El servicio descarga con su propia configuración (destino, calidad,
+    trabajadores); Ctrl-C deja de seguir el lote pero no lo detiene.
+    
+    Args:
+        args (argparse.Namespace): Argumentos de línea de comandos
+    """
+    from daemon import find_daemon
+    
+    client = find_daemon(args.daemon)
+    if not client:
+        print(f"❌ No hay un servicio de descargas en {args.daemon} (arráncalo con: python daemon.py)")
+        sys.exit(1)
+    
+    service = client.status()
+    since = service['last_event']
+    print(f"🛰️  Servicio: {client.url} (destino: {service['output_path']}, calidad: {service['quality']})")
+    
+    # Las URLs se envían por tandas a la misma ejecución
+    run_id = None
+    queued = skipped = 0
+    urls = iter_urls_from_file(args.file) if args.file else iter(())
+    numbers = itertools.count(1)
+    while True:
+        chunk = list(itertools.islice(urls, Config.INGEST_WINDOW))
+        if not chunk and run_id:
+            break
+        
+        params = {'urls': chunk, 'episodes': list(itertools.islice(numbers, len(chunk))),
+                  'priority': args.priority, 'run_id': run_id}
+        if not run_id and args.series:
+            params.update(series=args.series, series_episodes=sorted(args.episodes) if args.episodes else None)
+        
+        result = client.enqueue(**params)
+        run_id = result['run_id']
+        queued += result['queued']
+        skipped += result['skipped']
+        if not chunk:
+            break
+    
+    if not queued and not skipped:
+        print("❌ No se encontraron URLs válidas para descargar.")
+        sys.exit(1)
+    print(f"🗂️  {queued} episodio(s) encolados en el servicio (ejecución {run_id})")
+    if skipped:
+        print(f"⏭️  {skipped} episodio(s) ya descargados en ejecuciones anteriores")
+    
+    completed = failed = 0
+    try:
+        for event in client.follow(run_id, since):
+            if event['type'] == 'result':
+                completed += 1
+                failed += not event['success']
+                print_batch_progress({'completed': completed, 'total': queued,
+                                      'current_episode': event['episode'], 'success': event['success']})
+            elif event['type'] == 'cancelled':
+                completed += len(event['job_ids'])
+                failed += len(event['job_ids'])
+                print(f"🚫 {len(event['job_ids'])} episodio(s) cancelados")
+    except KeyboardInterrupt:
+        print(f"\n👋 El lote sigue en el servicio; cancélalo con: python daemon.py --cancel {run_id}")
+        sys.exit(0)
+    
+    # El resultado final sale de la cola (por si se perdió algún evento)
+    jobs = client.list(run_id=run_id)
+    failed = sum(job['state'] == FAILED for job in jobs)
+    print(f"📊 {len(jobs) - failed} completado(s), {failed} fallido(s)")
+    sys.exit(0 if not failed else (1 if failed < len(jobs) else 2))
+
 def main():
     """Función principal para descarga por lotes"""
     parser = argparse.ArgumentParser(
@@ -289,6 +1791,23 @@ def main():
 Ejemplos de uso:
   python batch_download.py -f urls.txt -q 720p
   python batch_download.py -f episodes.txt -o "~/Anime/MiSerie" -w 3
+  python batch_download.py -f urls.txt -w 2 --pipeline --resolvers 2  # Resolver por adelantado
+  python batch_download.py -f mixto.txt -w 6 --host-limit jkanime=2,youtube=4
+  python batch_download.py -f urls.txt --pipeline --order shortest  # Episodios pequeños primero
+  python batch_download.py -f urls.txt --processes 4 -w 2 --limit-rate 8M  # Varios núcleos
+  python batch_download.py -f urls.txt --plan plan.jsonl  # Resolver y estimar antes de descargar
+  python batch_download.py --from-plan plan.jsonl -w 3  # Descargar lo planificado
+  python batch_download.py -f urls.txt -w 2 --autotune 1-8  # Ajustar -w sobre la marcha
+  python batch_download.py -f urls.txt --schedule "08:00-20:00=1M/1,20:00-08:00=max/6"  # Por horario
+  python batch_download.py -f urls.txt --journal lote.jsonl  # Resultados en vivo (tail -f lote.jsonl)
+  python batch_download.py -s "https://jkanime.net/dandadan-2nd-season/" --episodes 1-6,10
+  python batch_download.py --sync series.txt  # Solo episodios nuevos (ideal para cron)
+  python batch_download.py --sync series.txt --sync-interval 60  # Comprobar cada hora
+  python batch_download.py --status  # Estado de la cola de descargas
+  python batch_download.py --retry-failed  # Reintentar los episodios fallidos
+  python batch_download.py -f urls.txt --enqueue-only --queue-db http://nas:8765  # Repartir entre máquinas
+  python batch_download.py --worker --queue-db http://nas:8765  # En cada máquina
+  python batch_download.py -f urls.txt --daemon  # Encolar en el servicio de descargas (daemon.py)
   python batch_download.py --create-sample  # Crear archivo de ejemplo
         """
     )
@@ -299,6 +1818,39 @@ Ejemplos de uso:
         help='Archivo con lista de URLs (una por línea)'
     )
     
+    parser.add_argument(
+        '-s', '--series',
+        type=str,
+        help='URL de una serie de JKAnime para descargar sus episodios'
+    )
+    
+    parser.add_argument(
+        '--episodes',
+        type=argparse_type(parse_episode_ranges),
+        help='Episodios de la serie a descargar, ej. "1-24,30" (default: todos)'
+    )
+    
+    parser.add_argument(
+        '--sync',
+        type=str,
+        metavar='SERIES_FILE',
+        help='Archivo con URLs de series: descarga solo los episodios nuevos desde la última sincronización'
+    )
+    
+    parser.add_argument(
+        '--sync-interval',
+        type=float,
+        metavar='MINUTES',
+        help='Repetir la sincronización cada N minutos en lugar de una sola pasada'
+    )
+    
+    parser.add_argument(
+        '--sync-db',
+        type=str,
+        default=Config.SYNC_DB_PATH,
+        help=f'Base de datos del estado de sincronización (default: {Config.SYNC_DB_PATH})'
+    )
+    
     parser.add_argument(
         '-q', '--quality',
         type=str,
@@ -321,12 +1873,156 @@ Ejemplos de uso:
         help=f'Número de descargas simultáneas (default: {Config.CONCURRENT_DOWNLOADS})'
     )
     
+    parser.add_argument(
+        '--processes',
+        type=int,
+        default=Config.BATCH_PROCESSES,
+        help=f'Procesos del lote, cada uno con -w trabajadores (default: {Config.BATCH_PROCESSES})'
+    )
+    
+    parser.add_argument(
+        '--autotune',
+        type=argparse_type(parse_bounds),
+        metavar='MIN-MAX',
+        default=Config.BATCH_AUTOTUNE,
+        help='Ajustar las descargas simultáneas entre MIN y MAX según la velocidad, los errores '
+             'y las respuestas 429, empezando en -w (ej. "1-8")'
+    )
+    
+    parser.add_argument(
+        '--limit-rate',
+        type=argparse_type(parse_rate),
+        metavar='VELOCIDAD',
+        help='Velocidad total del lote repartida entre sus descargas, ej. "8M" (default: sin límite)'
+    )
+    
+    parser.add_argument(
+        '--schedule',
+        type=argparse_type(parse_schedule),
+        metavar='FRANJAS',
+        default=Config.BANDWIDTH_SCHEDULE,
+        help='Velocidad y descargas simultáneas por franja horaria, aplicadas en vivo, ej. '
+             '"08:00-20:00=1M/1,20:00-08:00=max/6" (fuera de las franjas: --limit-rate y -w)'
+    )
+    
+    parser.add_argument(
+        '--order',
+        choices=ORDER_POLICIES,
+        default=Config.BATCH_ORDER,
+        help='Orden de descarga: fifo (como se añadieron), shortest (más pequeños primero), '
+             f'longest (más grandes primero) o episode (por número) (default: {Config.BATCH_ORDER})'
+    )
+    
+    parser.add_argument(
+        '--pipeline',
+        action='store_true',
+        help='Resolver los siguientes episodios mientras se descargan los actuales'
+    )
+    
+    parser.add_argument(
+        '--resolvers',
+        type=int,
+        default=Config.PIPELINE_RESOLVERS,
+        help=f'Resolutores del modo --pipeline (default: {Config.PIPELINE_RESOLVERS})'
+    )
+    
+    parser.add_argument(
+        '--host-limit',
+        type=argparse_type(parse_host_limits),
+        metavar='SITIO=N[,SITIO=N]',
+        help='Descargas simultáneas por sitio, ej. "jkanime=2,youtube=4" (default: config.py)'
+    )
+    
+    parser.add_argument(
+        '--plan',
+        nargs='?',
+        const=Config.PLAN_PATH,
+        metavar='ARCHIVO',
+        help='Resolver todos los episodios sin descargarlos, estimar disco y tiempo y guardar '
+             f'el plan en ARCHIVO (default: {Config.PLAN_PATH})'
+    )
+    
+    parser.add_argument(
+        '--from-plan',
+        type=str,
+        metavar='ARCHIVO',
+        help='Descargar los episodios de un plan generado con --plan sin resolverlos de nuevo'
+    )
+    
+    parser.add_argument(
+        '--journal',
+        type=str,
+        metavar='ARCHIVO',
+        default=Config.BATCH_JOURNAL_PATH,
+        help='Anotar el resultado de cada episodio como una línea JSON en ARCHIVO (se puede seguir con tail -f)'
+    )
+    
+    parser.add_argument(
+        '--priority',
+        type=int,
+        default=0,
+        help='Prioridad de los episodios encolados; mayor se descarga antes (default: 0)'
+    )
+    
+    parser.add_argument(
+        '--status',
+        action='store_true',
+        help='Mostrar el estado de la cola de descargas y salir'
+    )
+    
+    parser.add_argument(
+        '--retry-failed',
+        action='store_true',
+        help='Volver a descargar todos los episodios fallidos de la cola'
+    )
+    
+    parser.add_argument(
+        '--queue-db',
+        type=str,
+        default=Config.JOB_QUEUE_PATH,
+        help='Base de datos de la cola de descargas o URL de un servidor de cola '
+             f'(http://host:{Config.QUEUE_SERVER_PORT}) (default: {Config.JOB_QUEUE_PATH})'
+    )
+    
+    parser.add_argument(
+        '--worker',
+        action='store_true',
+        help='Procesar los trabajos pendientes de la cola compartida, los haya encolado quien sea'
+    )
+    
+    parser.add_argument(
+        '--enqueue-only',
+        action='store_true',
+        help='Solo encolar las URLs para que las descarguen los trabajadores (--worker)'
+    )
+    
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Volver a descargar los episodios ya completados (ej. con otra calidad)'
+    )
+    
+    parser.add_argument(
+        '--daemon',
+        nargs='?',
+        const=Config.DAEMON_URL,
+        metavar='URL',
+        help='Enviar el lote al servicio de descargas (daemon.py) y seguir su progreso '
+             f'(default: {Config.DAEMON_URL})'
+    )
+    
     parser.add_argument(
         '--create-sample',
         action='store_true',
         help='Crear archivo de ejemplo con URLs'
     )
     
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help='Usar solo páginas guardadas en la caché HTTP, sin tocar la red'
+    )
+    
     parser.add_argument(
         '-v', '--verbose',
         action='store_true',
@@ -338,57 +2034,116 @@ Ejemplos de uso:
     # Configurar logging
     setup_logging(verbose=args.verbose)
     
+    if args.offline:
+        Config.HTTP_CACHE_OFFLINE = True
+    
+    if args.limit_rate:
+        configure_bandwidth(args.limit_rate)
+    
     # Crear archivo de ejemplo si se solicita
     if args.create_sample:
         create_sample_urls_file()
         return
     
+    if args.status:
+        print_queue_status(open_queue(args.queue_db))
+        return
+    
+    if args.sync:
+        run_sync(args)
+        return
+    
+    if args.retry_failed:
+        run_retry_failed(args)
+        return
+    
+    if args.worker:
+        run_worker(args)
+        return
+    
     # Validar argumentos
-    if not args.file:
-        print("Error: Se requiere un archivo con URLs.")
+    if not args.file and not args.series and not args.from_plan:
+        print("Error: Se requiere un archivo con URLs o una serie (--series).")
         print("Usa --help para ver opciones o --create-sample para crear un archivo de ejemplo.")
         sys.exit(1)
     
-    # Verificar que el archivo existe
-    if not Path(args.file).exists():
+    if args.episodes and not args.series:
+        print("Error: --episodes solo se puede usar junto con --series.")
+        sys.exit(1)
+    
+    # Verificar que el archivo existe ('-' lee las URLs de la entrada estándar)
+    if args.file and args.file != '-' and not Path(args.file).exists():
         print(f"Error: Archivo no encontrado: {args.file}")
         print("Usa --create-sample para crear un archivo de ejemplo.")
         sys.exit(1)
     
+    if args.from_plan and not Path(args.from_plan).expanduser().exists():
+        print(f"Error: Plan no encontrado: {args.from_plan}")
+        sys.exit(1)
+    
+    if args.daemon:
+        if args.plan or args.from_plan:
+            print("Error: --plan y --from-plan no se pueden usar con --daemon.")
+            sys.exit(1)
+        run_daemon_client(args)
+        return
+    
     print(f"🎌 Anime Batch Downloader v1.0.0")
-    print(f"📂 Archivo: {args.file}")
+    if args.file:
+        print(f"📂 Archivo: {args.file}")
+    if args.from_plan:
+        print(f"🗺️  Plan: {args.from_plan}")
+    if args.series:
+        print(f"📺 Serie: {args.series}")
     print(f"🎥 Calidad: {args.quality}")
     print(f"📁 Destino: {args.output}")
     print(f"👥 Trabajadores: {args.workers}")
+    if args.processes > 1:
+        print(f"🧵 Procesos: {args.processes}")
+    if args.pipeline:
+        print(f"🔍 Resolutores: {args.resolvers} (modo pipeline)")
     print("-" * 50)
     
     # Crear batch downloader
-    batch_downloader = BatchDownloader(
-        output_path=args.output,
-        quality=args.quality,
-        max_workers=args.workers
-    )
+    batch_downloader = create_batch_downloader(args)
     
-    # Cargar URLs
-    urls = batch_downloader.load_urls_from_file(args.file)
+    # Las URLs del archivo se leen bajo demanda, a medida que avanza el lote
+    def entries():
+        if args.file:
+            yield from zip(batch_downloader.iter_urls_from_file(args.file), itertools.count(1))
+        if args.series:
+            for number, url in batch_downloader.expand_series(args.series, args.episodes):
+                yield url, number
     
-    if not urls:
-        print("❌ No se encontraron URLs válidas en el archivo.")
-        sys.exit(1)
+    if args.plan:
+        plan = batch_downloader.plan(entries(), args.plan)
+        if not plan['episodes']:
+            print("❌ No se encontraron URLs válidas para descargar.")
+            sys.exit(1)
+        batch_downloader.print_plan(plan)
+        print(f"🗺️  Plan guardado en {args.plan}; descárgalo con --from-plan {args.plan}")
+        sys.exit(0 if plan['enough_space'] and not plan['unreachable'] else 1)
     
-    # Función de callback para mostrar progreso
-    def progress_callback(data):
-        completed = data['completed']
-        total = data['total']
-        percentage = (completed / total) * 100
-        current_ep = data['current_episode']
-        status = "✅" if data['success'] else "❌"
-        
-        print(f"{status} Progreso: {completed}/{total} ({percentage:.1f}%) - Episodio {current_ep}")
+    if args.enqueue_only:
+        run_id, queued, skipped = batch_downloader.enqueue_stream(entries(), args.priority)
+        if not queued and not skipped:
+            print("❌ No se encontraron URLs válidas para descargar.")
+            sys.exit(1)
+        print(f"🗂️  {queued} episodio(s) encolados (ejecución {run_id[:8]}); "
+              f"lánzalos con --worker --queue-db {args.queue_db}")
+        sys.exit(0)
     
     try:
         # Realizar descarga por lotes
-        summary = batch_downloader.download_batch(urls, progress_callback)
+        if args.from_plan:
+            summary = batch_downloader.download_plan(args.from_plan, print_batch_progress, args.priority)
+        else:
+            summary = batch_downloader.download_stream(entries(), print_batch_progress, args.priority)
+        
+        stats = summary['stats']
+        if not stats['total'] and not stats['skipped']:
+            print("❌ No se encontraron URLs válidas para descargar.")
+            sys.exit(1)
         
         # Mostrar resumen
         batch_downloader.print_summary(summary)
@@ -405,7 +2160,7 @@ Ejemplos de uso:
             sys.exit(2)
             
     except KeyboardInterrupt:
-        print("\n🛑 Descarga por lotes cancelada por el usuario.")
+        print("\n🛑 Descarga por lotes cancelada por el usuario. Vuelve a ejecutar el mismo comando para continuar.")
         sys.exit(0)
     except Exception as e:
         print(f"💥 Error inesperado: {e}")
@@ -24,10 +24,92 @@ class Config:
     )
     MAX_CONNECTIONS = 3  # Reducido para evitar rate limiting
     
+    # === Configuración de Extractores ===
+    IFRAME_WORKERS = 3  # Iframes de reproductores resueltos en paralelo por episodio
+    IFRAME_MAX_DEPTH = 2  # Profundidad máxima de iframes anidados
+    IFRAME_TIMEOUT = 15  # Timeout por request de iframe en segundos
+    MIN_VIDEO_CANDIDATES = 3  # Dejar de resolver iframes al reunir este número de candidatos
+    SERIES_PAGE_WORKERS = 4  # Páginas del listado de episodios descargadas en paralelo
+    STREAMING_SCAN = True  # Escanear las páginas mientras se descargan y cortar al tener lo necesario
+    PAGE_MAX_BYTES = 2 * 1024 * 1024  # Máximo de bytes leídos por página en modo streaming
+    PAGE_CHUNK_SIZE = 16 * 1024  # Tamaño de los fragmentos leídos en modo streaming
+    
+    # === Configuración del Transporte HTTP compartido ===
+    HTTP_POOL_HOSTS = 16  # Hosts distintos con pool de conexiones abierto a la vez
+    HTTP_MAX_CONNECTIONS_PER_HOST = 6  # Conexiones simultáneas máximas a un mismo host
+    
+    # === Configuración de Caché HTTP ===
+    HTTP_CACHE_ENABLED = True  # Cachear en disco las páginas que consultan los extractores
+    HTTP_CACHE_DIR = str(Path.home() / '.cache' / 'anime_downloader' / 'http')
+    HTTP_CACHE_MAX_SIZE = 200 * 1024 * 1024  # Tamaño máximo (comprimido) antes de desalojar (200MB)
+    HTTP_CACHE_DEFAULT_TTL = 600  # Frescura en segundos si el servidor no envía Cache-Control/Expires
+    HTTP_CACHE_OFFLINE = False  # Servir entradas caducadas sin tocar la red
+    
+    # === Configuración de Caché de Streams Resueltos ===
+    STREAM_CACHE_ENABLED = True  # Reutilizar URLs de video ya resueltas por episodio
+    STREAM_CACHE_PATH = str(Path.home() / '.cache' / 'anime_downloader' / 'streams.sqlite3')
+    STREAM_CACHE_DEFAULT_TTL = 15 * 60  # Validez si las URLs no indican caducidad (segundos)
+    STREAM_CACHE_MAX_TTL = 6 * 3600  # Validez máxima aunque la URL firmada dure más
+    STREAM_CACHE_SAFETY_MARGIN = 5 * 60  # Descontar a la caducidad deducida de la URL
+    
+    # === Configuración de Sincronización de Series ===
+    DATA_DIR = str(Path.home() / '.local' / 'share' / 'anime_downloader')  # Bases de datos locales
+    SYNC_DB_PATH = str(Path(DATA_DIR) / 'sync.sqlite3')  # Último episodio visto por serie
+    SYNC_BACKOFF_BASE = 300  # Espera inicial tras un fallo comprobando una serie (segundos)
+    SYNC_BACKOFF_MAX = 6 * 3600  # Espera máxima entre comprobaciones fallidas (segundos)
+    
+    # === Configuración del Índice de la Biblioteca ===
+    LIBRARY_DB_PATH = str(Path(DATA_DIR) / 'library.sqlite3')  # Índice de los videos descargados (library.py)
+    LIBRARY_INDEX_DOWNLOADS = True  # Añadir al índice cada episodio que termina un lote
+    LIBRARY_SCAN_INTERVAL = 300  # Segundos entre escaneos de --watch cuando no hay inotify
+    LIBRARY_WATCH_DEBOUNCE = 2  # Segundos para agrupar los avisos de inotify antes de relistar
+    LIBRARY_HASH_ALGORITHM = 'md5'  # Hash con el que --verify registra los archivos que aún no tienen
+    VERIFY_PROCESSES = None  # Procesos que calculan hashes en --verify (None: uno por CPU)
+    VERIFY_READERS_PER_DEVICE = 2  # Archivos leídos a la vez en cada disco (1 para discos mecánicos)
+    VERIFY_REPORT_PATH = str(Path(DATA_DIR) / 'verify_report.jsonl')  # Archivos dañados encontrados por --verify
+    
+    # === Configuración de la Cola de Trabajos ===
+    JOB_QUEUE_PATH = str(Path(DATA_DIR) / 'jobs.sqlite3')  # Estado persistente de las descargas por lotes
+    JOB_QUEUE_JOURNAL_MODE = 'WAL'  # 'DELETE' si la cola está en almacenamiento de red (NFS, SMB)
+    JOB_LEASE_SECONDS = 120  # Un trabajo sin noticias de su trabajador durante este tiempo vuelve a la cola
+    JOB_HEARTBEAT_SECONDS = 30  # Frecuencia con la que un trabajador renueva sus leases
+    QUEUE_SERVER_PORT = 8765  # Puerto del servidor de cola (queue_server.py)
+    QUEUE_SERVER_TOKEN = None  # Token compartido entre el servidor de cola y los trabajadores
+    DAEMON_URL = 'http://127.0.0.1:8766'  # Dirección del servicio de descargas (daemon.py)
+    DAEMON_TOKEN = None  # Token que deben enviar los clientes del servicio de descargas
+    DAEMON_EVENT_BUFFER = 2000  # Eventos de progreso que el servicio guarda para sus clientes
+    DAEMON_POLL_TIMEOUT = 25  # Espera máxima de los clientes por eventos nuevos (long polling)
+    JOB_MAX_ATTEMPTS = 3  # Intentos interrumpidos (cierres, cuelgues) antes de dar un trabajo por fallido
+    HOST_CONCURRENCY = {'jkanime': 2, 'youtube': 4}  # Descargas simultáneas por sitio (dominio o nombre)
+    HOST_DEFAULT_CONCURRENCY = 2  # Descargas simultáneas para sitios sin entrada propia
+    SCHEDULER_QUANTUM = 1  # Crédito por turno de cada host en el reparto deficit round robin
+    PIPELINE_RESOLVERS = 2  # Trabajadores que resuelven episodios por adelantado en modo pipeline
+    PIPELINE_QUEUE_SIZE = 2  # Episodios resueltos esperando una descarga libre
+    PIPELINE_MAX_RESOLVED_AGE = 15 * 60  # Resoluciones más antiguas se repiten (URLs firmadas caducan)
+    BATCH_PROCESSES = 1  # Procesos del lote (cada uno con sus trabajadores) para usar varios núcleos
+    INGEST_WINDOW = 500  # Trabajos pendientes como máximo al leer listas de URLs en streaming
+    BATCH_ORDER = 'fifo'  # Orden de los episodios: 'fifo', 'shortest', 'longest' o 'episode'
+    PLAN_PATH = 'plan_lote.jsonl'  # Archivo donde --plan guarda los episodios resueltos
+    PLAN_WORKERS = 8  # Episodios que --plan resuelve a la vez (respetando los límites por host)
+    PLAN_HISTORY_DAYS = 30  # Antigüedad máxima de las descargas usadas para estimar la velocidad
+    BATCH_AUTOTUNE = None  # (mínimo, máximo) de descargas simultáneas ajustadas en vivo (--autotune); None fijo
+    AUTOTUNE_INTERVAL = 20  # Segundos entre decisiones del autoajuste
+    AUTOTUNE_MIN_GAIN = 0.05  # Mejora de velocidad mínima para mantener un trabajador más
+    AUTOTUNE_MAX_ERROR_RATE = 0.25  # Proporción de episodios fallidos a partir de la cual se reduce
+    AUTOTUNE_BACKOFF = 0.5  # Factor de reducción ante 429/503 o demasiados fallos
+    AUTOTUNE_HOLD_INTERVALS = 3  # Intervalos sin probar más trabajadores tras una reducción
+    BATCH_JOURNAL_PATH = None  # Diario JSONL con el resultado de cada episodio (--journal); None desactivado
+    JOURNAL_FSYNC_SECONDS = 5  # Frecuencia con la que el diario se fuerza a disco
+    SIZE_PROBE_TIMEOUT = 10  # Timeout al consultar el tamaño de un stream (ordenar por tamaño)
+    
     # === Configuración de Rate Limiting ===
     RATE_LIMIT_DELAY = 1  # Delay entre requests en segundos
     MAX_DOWNLOAD_RATE = '2M'  # Velocidad máxima para evitar detección
     USE_RATE_LIMITING = True  # Activar rate limiting por defecto
+    BANDWIDTH_LIMIT = None  # Velocidad total de un lote repartida entre sus descargas (ej. '8M'); None sin límite
+    BANDWIDTH_SCHEDULE = None  # Franjas horarias de velocidad/descargas, ej. '08:00-20:00=1M/1,20:00-08:00=max/6'
+    SCHEDULE_CHECK_SECONDS = 30  # Frecuencia con la que se comprueba si cambió la franja horaria
+    BANDWIDTH_REBALANCE_SECONDS = 1  # Frecuencia con la que se reparte de nuevo entre procesos
     
     # === Configuración de Subtítulos (MEJORADA) ===
     DOWNLOAD_SUBTITLES = True  # Descargar subtítulos automáticamente
@@ -110,6 +192,9 @@ class Config:
         }
     }
     
+    QUALITY_PROBE_HLS = True  # Leer master playlists HLS para ordenar mirrors por calidad
+    QUALITY_PROBE_TIMEOUT = 10  # Timeout al leer un master playlist (segundos)
+    
     @classmethod
     def get_ydl_config_safe(cls, quality='720p'):
         """Retorna configuración segura para yt-dlp que evita rate limiting"""
@@ -180,6 +265,22 @@ class Config:
         # Rate limiting
         cls.USE_RATE_LIMITING = os.getenv('ANIME_RATE_LIMIT', 'true').lower() == 'true'
         cls.MAX_DOWNLOAD_RATE = os.getenv('ANIME_MAX_RATE', cls.MAX_DOWNLOAD_RATE)
+        cls.BANDWIDTH_LIMIT = os.getenv('ANIME_BANDWIDTH', cls.BANDWIDTH_LIMIT)
+        cls.BANDWIDTH_SCHEDULE = os.getenv('ANIME_SCHEDULE', cls.BANDWIDTH_SCHEDULE)
+        
+        # Caché HTTP
+        cls.HTTP_CACHE_ENABLED = os.getenv('ANIME_HTTP_CACHE', 'true').lower() == 'true'
+        cls.HTTP_CACHE_DIR = os.getenv('ANIME_HTTP_CACHE_DIR', cls.HTTP_CACHE_DIR)
+        cls.HTTP_CACHE_OFFLINE = os.getenv('ANIME_OFFLINE', 'false').lower() == 'true'
+        
+        # Sincronización de series
+        cls.SYNC_DB_PATH = os.getenv('ANIME_SYNC_DB', cls.SYNC_DB_PATH)
+        cls.LIBRARY_DB_PATH = os.getenv('ANIME_LIBRARY_DB', cls.LIBRARY_DB_PATH)
+        cls.JOB_QUEUE_PATH = os.getenv('ANIME_JOB_DB', cls.JOB_QUEUE_PATH)
+        cls.JOB_QUEUE_JOURNAL_MODE = os.getenv('ANIME_JOB_DB_JOURNAL', cls.JOB_QUEUE_JOURNAL_MODE)
+        cls.QUEUE_SERVER_TOKEN = os.getenv('ANIME_QUEUE_TOKEN', cls.QUEUE_SERVER_TOKEN)
+        cls.DAEMON_URL = os.getenv('ANIME_DAEMON_URL', cls.DAEMON_URL)
+        cls.DAEMON_TOKEN = os.getenv('ANIME_DAEMON_TOKEN', cls.DAEMON_TOKEN)
 
 # Cargar configuración desde variables de entorno al importar
 Config.load_from_env()
@@ -0,0 +1,638 @@
+#!/usr/bin/env python3
+"""
+Anime Downloader - Servicio de descargas
+Proceso de larga duración que mantiene la cola, los pools de conexiones, las
+cachés y el reparto de ancho de banda, y los expone por HTTP (JSON) en local
+para que main.py, gui.py y batch_download.py compartan un solo motor
+"""
+
+import sys
+import json
+import time
+import logging
+import argparse
+import itertools
+import threading
+from collections import deque
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from config import Config
+from job_queue import ACTIVE_STATES, DONE, FAILED
+from utils import validate_url, argparse_type
+
+# Operaciones del servicio que se pueden invocar por POST /api
+DAEMON_METHODS = ('enqueue', 'list', 'pause', 'resume', 'cancel', 'status')
+
+logger = logging.getLogger(__name__)
+
+def progress_number(value):
+    """
+    Valor numérico de un campo de progreso
+    
+    Los hooks de algunos extractores envían textos ('12.5%', 'N/A'); los
+    clientes reciben siempre números.
+    
+    Args:
+        value: Valor recibido del hook
+    
+    Returns:
+        float: Valor numérico, o None si no lo tiene
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    try:
+        return float(str(value).strip().rstrip('%'))
+    except ValueError:
+        return None
+
+class EventLog:
+    """
+    Últimos eventos del servicio, numerados para seguirlos con long polling
+    
+    Cada cliente recuerda el número del último evento que vio y pide los
+    siguientes; si se queda atrás más de Config.DAEMON_EVENT_BUFFER eventos
+    se le avisa de que perdió algunos.
+    """
+    
+    def __init__(self, size=None):
+        """
+        Args:
+            size (int): Eventos que se guardan (default: Config.DAEMON_EVENT_BUFFER)
+        """
+        self._events = deque(maxlen=size or Config.DAEMON_EVENT_BUFFER)
+        self._last = 0
+        self._cond = threading.Condition()
+    
+    @property
+    def last(self):
+        """Número del último evento publicado"""
+        with self._cond:
+            return self._last
+    
+    def publish(self, kind, **data):
+        """
+        Publica un evento
+        
+        Args:
+            kind (str): Tipo de evento ('progress', 'result', 'enqueued', ...)
+            **data: Datos del evento (serializables a JSON)
+        """
+        with self._cond:
+            self._last += 1
+            self._events.append({'seq': self._last, 'type': kind, 'time': time.time(), **data})
+            self._cond.notify_all()
+    
+    def since(self, seq, timeout=0):
+        """
+        Eventos posteriores a uno dado, esperando si todavía no hay
+        
+        Args:
+            seq (int): Último evento que vio el cliente (0 para todos los guardados)
+            timeout (float): Segundos máximos de espera por eventos nuevos
+        
+        Returns:
+            dict: {'next': último evento devuelto, 'events': lista, 'lost': True si se perdieron eventos}
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._last > seq, timeout)
+            events = [event for event in self._events if event['seq'] > seq]
+            lost = bool(seq) and bool(events) and events[0]['seq'] > seq + 1
+            return {'next': events[-1]['seq'] if events else max(seq, 0), 'events': events, 'lost': lost}
+
+class DownloadDaemon:
+    """
+    Motor de descargas compartido
+    
+    Un hilo procesa los trabajos pendientes de la cola con un BatchDownloader
+    (como un trabajador --worker) y vuelve a empezar cada vez que se encola
+    algo. Al pausar no se toman trabajos nuevos; los episodios en curso
+    terminan.
+    """
+    
+    def __init__(self, batch):
+        """
+        Args:
+            batch (BatchDownloader): Descargador por lotes (un solo proceso) que hace el trabajo
+        """
+        self.batch = batch
+        self.batch.on_job_progress = self._on_progress
+        self.queue = batch.queue
+        self.events = EventLog()
+        self.paused = False
+        self.busy = False
+        self.logger = logging.getLogger(__name__)
+        
+        # Último progreso de cada trabajo en curso
+        self.progress = {}
+        self._work = threading.Event()
+        self._lock = threading.Lock()
+        self._stopping = False
+        self._engine_thread = None
+    
+    def start(self):
+        """Arranca el motor (retoma también lo que quedó pendiente en la cola)"""
+        self._work.set()
+        self._engine_thread = threading.Thread(target=self._engine, name='daemon-engine', daemon=True)
+        self._engine_thread.start()
+    
+    def shutdown(self):
+        """
+        Deja de tomar trabajos, espera a que terminen los episodios en curso y
+        devuelve a la cola los que quedaron con lease sin empezar
+        
+        Las descargas en curso no se pueden cortar: si se devolvieran antes,
+        al terminar no se podrían anotar como completadas.
+        """
+        self._stopping = True
+        self._work.set()
+        if self.busy:
+            self.logger.info("🛑 Esperando a que terminen los episodios en curso...")
+        while self._engine_thread and self._engine_thread.is_alive():
+            # run_jobs borra la parada al empezar: se repite por si el motor arrancaba justo ahora
+            self.batch.stop()
+            self._engine_thread.join(0.5)
+        
+        released = self.queue.release(self.batch.owner)
+        if released:
+            self.logger.info(f"🛑 {released} trabajo(s) sin terminar devueltos a la cola")
+    
+    def enqueue(self, urls=(), episodes=None, series=None, series_episodes=None, priority=0, run_id=None):
+        """
+        Encola episodios para descargarlos
+        
+        Args:
+            urls (list): URLs de episodios
+            episodes (list): Número de episodio de cada URL (por defecto su posición)
+            series (str): URL de una serie cuyos episodios encolar (opcional)
+            series_episodes (list): Números de episodio de la serie (default: todos)
+            priority (int): Prioridad de los trabajos (mayor se descarga antes)
+            run_id (str): Ejecución a la que añadirlos (default: una nueva)
+        
+        Returns:
+            dict: run_id, episodios encolados, ya descargados antes e inválidos
+        """
+        entries = [(url, number) for url, number in zip(urls, episodes or itertools.count(1)) if validate_url(url)]
+        invalid = len(urls) - len(entries)
+        if series:
+            wanted = set(series_episodes) if series_episodes else None
+            entries += [(url, number) for number, url in self.batch.expand_series(series, wanted)]
+        
+        run_id, queued, skipped = self.batch.enqueue_stream(entries, priority, run_id)
+        self.logger.info(f"📥 {queued} episodio(s) encolados (ejecución {run_id[:8]})")
+        self.events.publish('enqueued', run_id=run_id, queued=queued, skipped=skipped)
+        self._work.set()
+        return {'run_id': run_id, 'queued': queued, 'skipped': skipped, 'invalid': invalid}
+    
+    def list(self, run_id=None, state=None):
+        """
+        Lista trabajos de la cola con el progreso de los que están en curso
+        
+        Args:
+            run_id (str): Filtrar por ejecución (opcional)
+            state (str): Filtrar por estado (opcional)
+        
+        Returns:
+            list: Trabajos como dicts (con 'progress' si están en curso)
+        """
+        jobs = self.queue.jobs(run_id, state)
+        with self._lock:
+            for job in jobs:
+                if job['id'] in self.progress:
+                    job['progress'] = dict(self.progress[job['id']])
+        return jobs
+    
+    def pause(self):
+        """No tomar trabajos nuevos hasta resume (los episodios en curso terminan)"""
+        with self._lock:
+            self.paused = True
+        self.batch.stop()
+        self.logger.info("⏸️  Servicio en pausa")
+        self.events.publish('paused')
+        return self.status()
+    
+    def resume(self):
+        """Vuelve a tomar trabajos de la cola"""
+        with self._lock:
+            self.paused = False
+        self._work.set()
+        self.logger.info("▶️  Servicio reanudado")
+        self.events.publish('resumed')
+        return self.status()
+    
+    def cancel(self, job_ids=None, run_id=None):
+        """
+        Cancela trabajos pendientes (los episodios en curso no se interrumpen)
+        
+        Args:
+            job_ids (list): IDs de los trabajos a cancelar (opcional)
+            run_id (str): Cancelar los trabajos pendientes de una ejecución (opcional)
+        
+        Returns:
+            dict: IDs cancelados y los que siguen en curso
+        """
+        cancelled = self.queue.cancel(job_ids, run_id)
+        running = [
+            job['id'] for job in self.queue.jobs(run_id)
+            if job['state'] in ACTIVE_STATES and (not job_ids or job['id'] in job_ids)
+        ]
+        
+        if cancelled:
+            self.logger.info(f"🚫 {len(cancelled)} trabajo(s) cancelados")
+            self.events.publish('cancelled', job_ids=cancelled, run_id=run_id)
+        return {'cancelled': cancelled, 'running': running}
+    
+    def status(self):
+        """
+        Estado del servicio
+        
+        Returns:
+            dict: Pausa, actividad, trabajos por estado, descargas en curso y último evento
+        """
+        with self._lock:
+            active = [dict(progress, job_id=job_id) for job_id, progress in self.progress.items()]
+            paused = self.paused
+        return {
+            'paused': paused,
+            'busy': self.busy,
+            'counts': self.queue.counts(),
+            'active': active,
+            'last_event': self.events.last,
+            'output_path': str(self.batch.output_path),
+            'quality': self.batch.quality,
+        }
+    
+    def _engine(self):
+        """Procesa la cola cada vez que hay trabajo nuevo y el servicio no está en pausa"""
+        while True:
+            self._work.wait()
+            self._work.clear()
+            if self._stopping:
+                return
+            if self.paused:
+                continue
+            
+            self.busy = True
+            try:
+                self.batch.run_jobs(None, self._on_result)
+            except Exception as e:
+                self.logger.error(f"Error procesando la cola: {e}")
+            finally:
+                self.busy = False
+                with self._lock:
+                    self.progress.clear()
+            self.events.publish('idle', counts=self.queue.counts())
+    
+    def _on_progress(self, job_id, data):
+        """Progreso de un episodio en curso (lo llama el BatchDownloader)"""
+        if data.get('status') not in ('downloading', 'finished'):
+            return
+        
+        # Un trabajo que empezó justo al pausar detiene al resto
+        if self.paused:
+            self.batch.stop()
+        
+        progress = {key: progress_number(data.get(key)) for key in ('percentage', 'downloaded_bytes', 'total_bytes', 'speed')}
+        progress['status'] = data['status']
+        with self._lock:
+            self.progress[job_id] = progress
+        self.events.publish('progress', job_id=job_id, **progress)
+    
+    def _on_result(self, data):
+        """Resultado de un episodio terminado (progress_callback de run_jobs)"""
+        if self.paused:
+            self.batch.stop()
+        
+        with self._lock:
+            self.progress.pop(data['job_id'], None)
+        self.events.publish(
+            'result',
+            job_id=data['job_id'], run_id=data['run_id'], url=data['current_url'],
+            episode=data['current_episode'], success=data['success'], error=data['error']
+        )
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    """Atiende las llamadas JSON de los clientes del servicio"""
+    
+    server_version = 'AnimeDaemon/1.0'
+    
+    def do_POST(self):
+        if self.path != '/api':
+            return self._reply(404, {'error': 'Ruta no encontrada'})
+        if not self._authorized():
+            return self._reply(403, {'error': 'Token inválido'})
+        if not self._same_origin():
+            return self._reply(403, {'error': 'Solo se aceptan peticiones JSON de clientes locales'})
+        
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            call = json.loads(self.rfile.read(length) or b'{}')
+            method = call.get('method')
+            if method not in DAEMON_METHODS:
+                return self._reply(400, {'error': f'Método no permitido: {method}'})
+            
+            result = getattr(self.server.daemon, method)(**call.get('params', {}))
+            self._reply(200, {'result': result})
+        except (ValueError, TypeError, KeyError) as e:
+            self._reply(400, {'error': str(e)})
+        except Exception as e:
+            logger.error(f"Error atendiendo {self.path}: {e}")
+            self._reply(500, {'error': str(e)})
+    
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path not in ('/status', '/events'):
+            return self._reply(404, {'error': 'Ruta no encontrada'})
+        if not self._authorized():
+            return self._reply(403, {'error': 'Token inválido'})
+        
+        if url.path == '/status':
+            return self._reply(200, {'result': self.server.daemon.status()})
+        
+        try:
+            query = parse_qs(url.query)
+            since = int(query.get('since', ['0'])[0])
+            timeout = min(float(query.get('timeout', ['0'])[0]), Config.DAEMON_POLL_TIMEOUT)
+        except ValueError as e:
+            return self._reply(400, {'error': str(e)})
+        self._reply(200, {'result': self.server.daemon.events.since(since, timeout)})
+    
+    def _authorized(self):
+        token = self.server.token
+        return not token or self.headers.get('X-Daemon-Token') == token
+    
+    def _same_origin(self):
+        """
+        Rechaza las órdenes que puede enviar una página web abierta en el navegador
+        
+        Un formulario o fetch de otra web puede hacer un POST text/plain a
+        127.0.0.1 sin preflight, pero siempre lleva Origin; los clientes del
+        servicio envían application/json y nunca Origin.
+        """
+        content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        return content_type == 'application/json' and 'Origin' not in self.headers
+    
+    def _reply(self, status, payload):
+        body = json.dumps(payload, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+class DaemonServer(ThreadingHTTPServer):
+    """Servidor HTTP del servicio de descargas"""
+    
+    daemon_threads = True
+    
+    def __init__(self, daemon, host='127.0.0.1', port=None, token=None):
+        """
+        Args:
+            daemon (DownloadDaemon): Motor de descargas a servir
+            host (str): Dirección en la que escuchar
+            port (int): Puerto (default: el de Config.DAEMON_URL)
+            token (str): Token que deben enviar los clientes (default: Config.DAEMON_TOKEN)
+        """
+        self.daemon = daemon
+        self.token = token if token is not None else Config.DAEMON_TOKEN
+        super().__init__((host, port or urlparse(Config.DAEMON_URL).port or 8766), DaemonRequestHandler)
+
+class DaemonClient:
+    """Cliente del servicio de descargas (los métodos de DAEMON_METHODS, con argumentos por nombre)"""
+    
+    def __init__(self, url=None, token=None, timeout=None):
+        """
+        Args:
+            url (str): URL del servicio (default: Config.DAEMON_URL)
+            token (str): Token del servicio (default: Config.DAEMON_TOKEN)
+            timeout (float): Timeout de cada llamada (default: Config.TIMEOUT)
+        """
+        self.url = (url or Config.DAEMON_URL).rstrip('/')
+        self.timeout = timeout or Config.TIMEOUT
+        self._session = requests.Session()
+        
+        token = token if token is not None else Config.DAEMON_TOKEN
+        if token:
+            self._session.headers['X-Daemon-Token'] = token
+    
+    def __getattr__(self, method):
+        if method not in DAEMON_METHODS:
+            raise AttributeError(method)
+        return lambda **params: self._call(method, params)
+    
+    def events(self, since=0, timeout=None):
+        """
+        Eventos posteriores a uno dado (ver EventLog.since)
+        
+        Args:
+            since (int): Último evento visto
+            timeout (float): Segundos que el servicio espera por eventos nuevos (default: Config.DAEMON_POLL_TIMEOUT)
+        
+        Returns:
+            dict: {'next', 'events', 'lost'}
+        """
+        timeout = Config.DAEMON_POLL_TIMEOUT if timeout is None else timeout
+        response = self._session.get(
+            f"{self.url}/events",
+            params={'since': since, 'timeout': timeout},
+            timeout=self.timeout + timeout
+        )
+        return self._result(response)
+    
+    def follow(self, run_id, since=0):
+        """
+        Sigue los eventos de una ejecución hasta que terminen todos sus trabajos
+        
+        Si se pierden eventos (cliente lento) se vuelve a consultar el estado de
+        la ejecución, así el seguimiento siempre termina.
+        
+        Args:
+            run_id (str): Ejecución a seguir
+            since (int): Último evento visto antes de encolar (status()['last_event'])
+        
+        Yields:
+            dict: Eventos 'progress', 'result' y 'cancelled' de la ejecución
+        """
+        pending = self._pending(run_id)
+        while pending:
+            batch = self.events(since)
+            since = batch['next']
+            
+            for event in batch['events']:
+                if event['type'] == 'cancelled' and (event.get('run_id') == run_id or pending & set(event['job_ids'])):
+                    pending -= set(event['job_ids'])
+                    yield event
+                elif event['type'] in ('progress', 'result') and event['job_id'] in pending:
+                    if event['type'] == 'result':
+                        pending.discard(event['job_id'])
+                    yield event
+            
+            if batch['lost'] or not batch['events']:
+                pending = self._pending(run_id)
+    
+    def _pending(self, run_id):
+        """IDs de los trabajos de una ejecución que aún no han terminado"""
+        return {job['id'] for job in self.list(run_id=run_id) if job['state'] not in (DONE, FAILED)}
+    
+    def _call(self, method, params):
+        response = self._session.post(f"{self.url}/api", json={'method': method, 'params': params}, timeout=self.timeout)
+        return self._result(response)
+    
+    def _result(self, response):
+        payload = response.json()
+        if response.status_code != 200:
+            raise RuntimeError(f"Servicio de descargas: {payload.get('error', response.status_code)}")
+        return payload['result']
+
+def find_daemon(url=None, timeout=1):
+    """
+    Busca un servicio de descargas en marcha
+    
+    Args:
+        url (str): URL del servicio (default: Config.DAEMON_URL)
+        timeout (float): Segundos máximos de espera de la comprobación
+    
+    Returns:
+        DaemonClient: Cliente del servicio, o None si no responde
+    """
+    client = DaemonClient(url)
+    try:
+        client._session.get(f"{client.url}/status", timeout=timeout).raise_for_status()
+    except requests.RequestException:
+        return None
+    return client
+
+def serve(args):
+    """
+    Arranca el servicio de descargas hasta que se interrumpa con Ctrl-C
+    
+    Args:
+        args (argparse.Namespace): Argumentos de línea de comandos
+    """
+    from batch_download import BatchDownloader
+    from bandwidth import configure_bandwidth
+    
+    if args.limit_rate:
+        configure_bandwidth(args.limit_rate)
+    
+    # Un solo proceso: los pools, las cachés y el ancho de banda se comparten entre todos los clientes
+    batch = BatchDownloader(
+        output_path=args.output,
+        quality=args.quality,
+        max_workers=args.workers,
+        queue_path=args.queue_db,
+        host_limits=args.host_limit,
+        journal_path=args.journal,
+        autotune=args.autotune,
+        schedule=args.schedule
+    )
+    daemon = DownloadDaemon(batch)
+    server = DaemonServer(daemon, args.bind, args.port, args.token)
+    daemon.start()
+    
+    logger.info(f"🛰️  Servicio de descargas en http://{args.bind}:{server.server_address[1]} "
+                f"(destino: {batch.output_path}, calidad: {batch.quality})")
+    if not server.token and args.bind not in ('127.0.0.1', 'localhost'):
+        logger.warning("Servicio accesible desde la red sin token (configura ANIME_DAEMON_TOKEN)")
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        daemon.shutdown()
+        logger.info("🛑 Servicio de descargas detenido")
+    finally:
+        server.server_close()
+
+def print_daemon_status(status):
+    """Muestra el estado del servicio en consola"""
+    print("🛰️  SERVICIO DE DESCARGAS")
+    print(f"  Estado: {'⏸️  en pausa' if status['paused'] else ('⬇️  descargando' if status['busy'] else '💤 esperando')}")
+    print(f"  Destino: {status['output_path']} ({status['quality']})")
+    for state, count in status['counts'].items():
+        print(f"  {state:<15} {count}")
+    for progress in status['active']:
+        print(f"  ⬇️  Trabajo {progress['job_id']}: {progress.get('percentage') or 0:.1f}%")
+
+def main():
+    """Arranca el servicio de descargas o le envía órdenes"""
+    from autotune import parse_bounds
+    from bandwidth import parse_rate, parse_schedule
+    from scheduler import parse_host_limits
+    
+    parser = argparse.ArgumentParser(
+        description='Servicio de descargas compartido por main.py, gui.py y batch_download.py',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos de uso:
+  python daemon.py -w 3 --limit-rate 8M  # Arrancar el servicio
+  python batch_download.py -f urls.txt --daemon  # Encolar en el servicio
+  python daemon.py --status
+  python daemon.py --pause / --resume
+  python daemon.py --cancel RUN_ID
+        """
+    )
+    parser.add_argument('-o', '--output', default=Config.DOWNLOAD_PATH, help=f'Directorio de descarga (default: {Config.DOWNLOAD_PATH})')
+    parser.add_argument('-q', '--quality', default=Config.DEFAULT_QUALITY, choices=['480p', '720p', '1080p', 'best'],
+                        help=f'Calidad de descarga (default: {Config.DEFAULT_QUALITY})')
+    parser.add_argument('-w', '--workers', type=int, default=Config.CONCURRENT_DOWNLOADS,
+                        help=f'Número de descargas simultáneas (default: {Config.CONCURRENT_DOWNLOADS})')
+    parser.add_argument('--autotune', type=argparse_type(parse_bounds), metavar='MIN-MAX', default=Config.BATCH_AUTOTUNE,
+                        help='Ajustar las descargas simultáneas entre MIN y MAX (ej. "1-8")')
+    parser.add_argument('--limit-rate', type=argparse_type(parse_rate), metavar='VELOCIDAD',
+                        help='Velocidad total repartida entre todas las descargas, ej. "8M" (default: sin límite)')
+    parser.add_argument('--schedule', type=argparse_type(parse_schedule), metavar='FRANJAS', default=Config.BANDWIDTH_SCHEDULE,
+                        help='Velocidad y descargas simultáneas por franja horaria, ej. "08:00-20:00=1M/1,20:00-08:00=max/6"')
+    parser.add_argument('--host-limit', type=argparse_type(parse_host_limits), metavar='SITIO=N[,SITIO=N]',
+                        help='Descargas simultáneas por sitio, ej. "jkanime=2,youtube=4" (default: config.py)')
+    parser.add_argument('--journal', metavar='ARCHIVO', default=Config.BATCH_JOURNAL_PATH,
+                        help='Anotar el resultado de cada episodio como una línea JSON en ARCHIVO')
+    parser.add_argument('--queue-db', default=Config.JOB_QUEUE_PATH, help=f'Base de datos de la cola (default: {Config.JOB_QUEUE_PATH})')
+    parser.add_argument('--bind', default='127.0.0.1', help="Dirección en la que escuchar (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, help=f'Puerto (default: el de {Config.DAEMON_URL})')
+    parser.add_argument('--token', help='Token que deben enviar los clientes (default: ANIME_DAEMON_TOKEN)')
+    parser.add_argument('--url', default=Config.DAEMON_URL, help=f'Servicio al que enviar órdenes (default: {Config.DAEMON_URL})')
+    
+    control = parser.add_mutually_exclusive_group()
+    control.add_argument('--status', action='store_true', help='Mostrar el estado del servicio y salir')
+    control.add_argument('--pause', action='store_true', help='Dejar de tomar episodios nuevos (los que están en curso terminan)')
+    control.add_argument('--resume', action='store_true', help='Reanudar las descargas')
+    control.add_argument('--cancel', metavar='ID', help='Cancelar los episodios pendientes de una ejecución (RUN_ID) o un trabajo (número)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Mostrar información detallada')
+    args = parser.parse_args()
+    
+    from utils import setup_logging
+    setup_logging(verbose=args.verbose)
+    
+    if not (args.status or args.pause or args.resume or args.cancel):
+        serve(args)
+        return 0
+    
+    client = find_daemon(args.url)
+    if not client:
+        print(f"❌ No hay un servicio de descargas en {args.url} (arráncalo con: python daemon.py)")
+        return 1
+    
+    if args.cancel:
+        params = {'job_ids': [int(args.cancel)]} if args.cancel.isdigit() else {'run_id': args.cancel}
+        result = client.cancel(**params)
+        print(f"🚫 {len(result['cancelled'])} episodio(s) cancelados")
+        if result['running']:
+            print(f"⬇️  {len(result['running'])} episodio(s) en curso terminarán su descarga")
+        return 0
+    
+    if args.pause:
+        status = client.pause()
+    elif args.resume:
+        status = client.resume()
+    else:
+        status = client.status()
+    print_daemon_status(status)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,7 @@ import os
 import time
 import requests
 import logging
+import threading
 from pathlib import Path
 from urllib.parse import urlparse
 from concurrent.futures import ThreadPoolExecutor
@@ -17,6 +18,7 @@ from utils import (
     check_disk_space, format_bytes
 )
 from config import Config
+from bandwidth import get_governor
 
 class SafeProgressHook:
     """Hook de progreso completamente seguro"""
@@ -31,14 +33,14 @@ class SafeProgressHook:
             return
             
         try:
-            # Limitar frecuencia de actualizaciones
+            status = data.get('status', 'unknown')
+            
+            # Limitar frecuencia de actualizaciones (el aviso de 'finished' nunca se descarta)
             current_time = time.time()
-            if current_time - self.last_update < 1.0:  # Solo cada 1 segundo
+            if status == 'downloading' and current_time - self.last_update < 1.0:  # Solo cada 1 segundo
                 return
             self.last_update = current_time
             
-            status = data.get('status', 'unknown')
-            
             if status == 'downloading':
                 # Obtener valores de forma ultra-segura
                 try:
@@ -106,6 +108,9 @@ class AnimeDownloader:
         self.concurrent_downloads = max(1, min(concurrent_downloads, 2))
         self.logger = logging.getLogger(__name__)
         
+        # Instancias de yt-dlp reutilizadas por hilo (conservan sus conexiones abiertas)
+        self._local = threading.local()
+        
         # Crear directorio de salida
         self.output_path.mkdir(parents=True, exist_ok=True)
         
@@ -148,6 +153,27 @@ class AnimeDownloader:
         
         return config
         
+    def _get_info_ydl(self):
+        """
+        Retorna el YoutubeDL de solo-información de este hilo
+        
+        Reutilizar la instancia entre episodios mantiene vivas las conexiones
+        (y sesiones TLS) de yt-dlp con cada host en lugar de abrirlas de nuevo.
+        
+        Returns:
+            yt_dlp.YoutubeDL: Instancia para extract_info(download=False)
+        """
+        info_ydl = getattr(self._local, 'info_ydl', None)
+        if info_ydl is None:
+            info_opts = self._get_safe_ydl_config(False)
+            info_opts['quiet'] = True
+            info_opts['noprogress'] = True
+            info_opts['socket_timeout'] = 15
+            
+            info_ydl = yt_dlp.YoutubeDL(info_opts)
+            self._local.info_ydl = info_ydl
+        return info_ydl
+        
     def download_episode(self, url, progress_callback=None, enable_subtitles=False):
         """
         Descarga un episodio individual sin errores de callback
@@ -195,15 +221,10 @@ class AnimeDownloader:
                     self.logger.info(f"Esperando {wait_time} segundos antes del intento...")
                     time.sleep(wait_time)
                 
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl, get_governor().limit(ydl.params):
                     # Extraer información primero (sin callback)
                     try:
-                        info_opts = self._get_safe_ydl_config(False)
-                        info_opts['quiet'] = True
-                        info_opts['noprogress'] = True
-                        
-                        with yt_dlp.YoutubeDL(info_opts) as info_ydl:
-                            info = info_ydl.extract_info(url, download=False)
+                        info = self._get_info_ydl().extract_info(url, download=False)
                         
                         if info:
                             title = clean_filename(info.get('title', 'Unknown'))
@@ -257,6 +278,114 @@ class AnimeDownloader:
         self.logger.error("❌ Descarga falló después de todos los intentos")
         return False
     
+    def resolve_episode(self, url):
+        """
+        Resuelve un episodio sin descargarlo (primera etapa del modo pipeline)
+        
+        Args:
+            url (str): URL del episodio
+            
+        Returns:
+            dict: Episodio resuelto ('url', 'info', 'resolved_at' y 'size'), o None si falló
+        """
+        try:
+            info = self._get_info_ydl().extract_info(url, download=False)
+        except Exception as e:
+            self.logger.warning(f"No se pudo resolver {url}: {e}")
+            return None
+        
+        if not info:
+            return None
+        
+        return {'url': url, 'info': info, 'resolved_at': time.time(), 'size': self._info_size(info)}
+    
+    @staticmethod
+    def _info_size(info):
+        """
+        Tamaño del episodio según la información de yt-dlp
+        
+        Args:
+            info (dict): Información extraída por yt-dlp
+            
+        Returns:
+            int: Tamaño en bytes (exacto o aproximado), o None si no se conoce
+        """
+        formats = info.get('requested_formats') or [info]
+        sizes = [f.get('filesize') or f.get('filesize_approx') for f in formats]
+        if not all(sizes):
+            return None
+        return int(sum(sizes))
+    
+    def describe_resolved(self, resolved):
+        """
+        Stream y calidad que se descargarían de un episodio resuelto (para --plan)
+        
+        Args:
+            resolved (dict): Resultado de resolve_episode
+            
+        Returns:
+            dict: 'stream' (formato elegido), 'quality' (ej. '720p' o None) y 'size'
+        """
+        info = resolved['info']
+        formats = info.get('requested_formats') or [info]
+        height = max((f.get('height') or 0 for f in formats), default=0)
+        return {
+            'stream': info.get('format') or info.get('url'),
+            'quality': f"{height}p" if height else None,
+            'size': resolved.get('size'),
+        }
+    
+    def export_resolved(self, resolved):
+        """
+        Copia de un episodio resuelto que se puede guardar como JSON (plan del lote)
+        
+        Args:
+            resolved (dict): Resultado de resolve_episode
+            
+        Returns:
+            dict: Episodio resuelto sin objetos internos de yt-dlp
+        """
+        return dict(resolved, info=yt_dlp.YoutubeDL.sanitize_info(resolved['info']))
+    
+    def download_resolved(self, url, resolved, progress_callback=None):
+        """
+        Descarga un episodio ya resuelto (segunda etapa del modo pipeline)
+        
+        Si la resolución falló, es demasiado antigua (las URLs firmadas caducan)
+        o la descarga directa falla, se hace la descarga completa con reintentos.
+        
+        Args:
+            url (str): URL del episodio
+            resolved (dict): Resultado de resolve_episode (o None)
+            progress_callback (callable): Función callback para progreso
+            
+        Returns:
+            bool: True si la descarga fue exitosa
+        """
+        if not resolved or time.time() - resolved['resolved_at'] > Config.PIPELINE_MAX_RESOLVED_AGE:
+            return self.download_episode(url, progress_callback)
+        
+        if not self._check_available_space():
+            return False
+        
+        ydl_opts = self._get_safe_ydl_config()
+        if progress_callback:
+            ydl_opts['progress_hooks'] = [SafeProgressHook(progress_callback)]
+        else:
+            ydl_opts['noprogress'] = True
+        
+        try:
+            self.logger.info(f"Descargando episodio ya resuelto: {clean_filename(resolved['info'].get('title', url))}")
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl, get_governor().limit(ydl.params):
+                ydl.process_ie_result(dict(resolved['info']), download=True)
+            
+            self.logger.info("✅ Descarga completada exitosamente")
+            return True
+            
+        except Exception as e:
+            self.logger.warning(f"Falló la descarga del episodio resuelto, reintentando desde cero: {e}")
+            return self.download_episode(url, progress_callback)
+    
     def download_episode_safe(self, url, progress_callback=None):
         """Descarga en modo completamente seguro"""
         return self.download_episode(url, progress_callback, enable_subtitles=False)
@@ -289,27 +418,16 @@ class AnimeDownloader:
     def get_video_info(self, url):
         """Obtiene información del video sin descargarlo"""
         try:
-            # Configuración mínima solo para info
-            opts = {
-                'quiet': True,
-                'no_warnings': True,
-                'socket_timeout': 15,
-                'ignoreerrors': True,
-                'noprogress': True,
-                'extract_flat': False,
-            }
-            
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                if info:
-                    return {
-                        'title': clean_filename(info.get('title', 'Unknown')),
-                        'duration': info.get('duration', 0),
-                        'uploader': info.get('uploader', 'Unknown'),
-                        'upload_date': info.get('upload_date'),
-                        'description': info.get('description', ''),
-                        'thumbnail': info.get('thumbnail'),
-                    }
+            info = self._get_info_ydl().extract_info(url, download=False)
+            if info:
+                return {
+                    'title': clean_filename(info.get('title', 'Unknown')),
+                    'duration': info.get('duration', 0),
+                    'uploader': info.get('uploader', 'Unknown'),
+                    'upload_date': info.get('upload_date'),
+                    'description': info.get('description', ''),
+                    'thumbnail': info.get('thumbnail'),
+                }
         except Exception as e:
             self.logger.error(f"Error obteniendo información del video: {e}")
             return None
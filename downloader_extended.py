@@ -13,20 +13,12 @@ import yt_dlp
 from downloader import AnimeDownloader as BaseDownloader
 from utils import clean_filename, format_bytes
 from config import Config
+from stream_cache import get_stream_cache
+from bandwidth import get_governor
+from quality import guess_height, rank_candidates, ydl_format_options
 
-# Intentar importar extractores personalizados
-try:
-    from extractors.animeflv import AnimeFLVExtractor
-    ANIMEFLV_AVAILABLE = True
-except ImportError:
-    ANIMEFLV_AVAILABLE = False
-    logging.warning("Extractor de AnimeFLV no disponible")
-try:
-    from extractors.jkanime import JKAnimeExtractor
-    JKANIME_AVAILABLE = True
-except ImportError:
-    JKANIME_AVAILABLE = False
-    logging.warning("Extractor de JKAnime no disponible")
+# Los extractores personalizados se importan al ver la primera URL de su dominio
+from extractors import EXTRACTOR_SPECS, find_extractor, get_extractor, available_extractors
 
 class ExtendedAnimeDownloader(BaseDownloader):
     """Downloader extendido con soporte para sitios de anime específicos"""
@@ -42,14 +34,15 @@ class ExtendedAnimeDownloader(BaseDownloader):
         """
         super().__init__(output_path, quality, max_retries, 1)
         
-        # Inicializar extractores personalizados
-        self.custom_extractors = {}
+        # Episodios ya resueltos a URLs de video (reintentos y re-encolados las reutilizan)
+        self.stream_cache = get_stream_cache() if Config.STREAM_CACHE_ENABLED else None
         
-        if JKANIME_AVAILABLE:
-            self.custom_extractors['jkanime'] = JKAnimeExtractor()
-            self.logger.info("✅ Extractor de JKAnime cargado")
-        
-        self.logger.info(f"Downloader extendido inicializado con {len(self.custom_extractors)} extractores personalizados")
+        self.logger.info(f"Downloader extendido inicializado con {len(available_extractors())} extractores personalizados")
+    
+    @property
+    def custom_extractors(self):
+        """Extractores personalizados registrados: nombre -> dominios (se cargan al primer uso)"""
+        return {name: spec[2] for name, spec in EXTRACTOR_SPECS.items()}
     
     def can_handle_url(self, url):
         """
@@ -61,10 +54,7 @@ class ExtendedAnimeDownloader(BaseDownloader):
         Returns:
             str: Nombre del extractor que puede manejar la URL, o None
         """
-        for name, extractor in self.custom_extractors.items():
-            if extractor.can_handle(url):
-                return name
-        return None
+        return find_extractor(url)
     
     def download_episode(self, url, progress_callback=None, enable_subtitles=False):
         """
@@ -81,14 +71,168 @@ class ExtendedAnimeDownloader(BaseDownloader):
         # Verificar si tenemos un extractor personalizado para esta URL
         extractor_name = self.can_handle_url(url)
         
-        if extractor_name:
+        if extractor_name and get_extractor(extractor_name):
             self.logger.info(f"🎌 Usando extractor personalizado: {extractor_name}")
             return self._download_with_custom_extractor(url, extractor_name, progress_callback)
         else:
             self.logger.info("🔄 Usando extractor estándar (yt-dlp)")
             return super().download_episode(url, progress_callback, enable_subtitles)
     
-    def _download_with_custom_extractor(self, url, extractor_name, progress_callback=None):
+    def resolve_episode(self, url):
+        """
+        Resuelve un episodio sin descargarlo (primera etapa del modo pipeline)
+        
+        Args:
+            url (str): URL del episodio
+            
+        Returns:
+            dict: Episodio resuelto ('url', 'info', 'resolved_at', 'size' y 'extractor'), o None
+        """
+        extractor_name = self.can_handle_url(url)
+        extractor = get_extractor(extractor_name) if extractor_name else None
+        
+        if not extractor:
+            return super().resolve_episode(url)
+        
+        try:
+            video_info, _ = self._resolve_with_extractor(url, extractor)
+        except Exception as e:
+            self.logger.warning(f"No se pudo resolver {url} con {extractor_name}: {e}")
+            return None
+        
+        if not video_info or not video_info.get('video_urls'):
+            return None
+        
+        return {
+            'url': url,
+            'info': video_info,
+            'resolved_at': time.time(),
+            'size': self._probe_size(extractor, video_info),
+            'extractor': extractor_name,
+        }
+    
+    def describe_resolved(self, resolved):
+        """
+        Stream y calidad que se descargarían de un episodio resuelto (para --plan)
+        
+        Args:
+            resolved (dict): Resultado de resolve_episode
+            
+        Returns:
+            dict: 'stream' (URL del mirror elegido), 'quality' (ej. '720p' o None) y 'size'
+        """
+        if 'extractor' not in resolved:
+            return super().describe_resolved(resolved)
+        
+        # Mismo criterio que el extractor al descargar: el mirror que ya funcionó o el mejor candidato
+        video_info = resolved['info']
+        stream = video_info.get('mirror') or rank_candidates(video_info['video_urls'], self.quality)[0]
+        height = guess_height(stream)
+        return {
+            'stream': stream,
+            'quality': f"{height}p" if height else None,
+            'size': resolved.get('size'),
+        }
+    
+    def export_resolved(self, resolved):
+        """
+        Copia de un episodio resuelto que se puede guardar como JSON (plan del lote)
+        
+        Args:
+            resolved (dict): Resultado de resolve_episode
+            
+        Returns:
+            dict: Episodio resuelto
+        """
+        if 'extractor' not in resolved:
+            return super().export_resolved(resolved)
+        # Lo resuelto por los extractores ya es JSON (es lo que guarda la caché de streams)
+        return dict(resolved)
+    
+    def _probe_size(self, extractor, video_info):
+        """
+        Tamaño del stream que se descargaría, según su Content-Length
+        
+        Args:
+            extractor: Extractor que resolvió el episodio (aporta la sesión y cabeceras)
+            video_info (dict): Información resuelta con 'video_urls' (y 'mirror' si se conoce)
+            
+        Returns:
+            int: Tamaño en bytes, o None si no se conoce (ej. playlists HLS)
+        """
+        url = video_info.get('mirror') or video_info['video_urls'][0]
+        if '.m3u8' in urlparse(url).path.lower():
+            return None
+        
+        try:
+            response = extractor.session.head(url, allow_redirects=True, timeout=Config.SIZE_PROBE_TIMEOUT)
+            length = response.headers.get('Content-Length')
+            return int(length) if response.ok and length and length.isdigit() else None
+        except Exception as e:
+            self.logger.debug(f"No se pudo obtener el tamaño de {url}: {e}")
+            return None
+    
+    def download_resolved(self, url, resolved, progress_callback=None):
+        """
+        Descarga un episodio ya resuelto (segunda etapa del modo pipeline)
+        
+        Args:
+            url (str): URL del episodio
+            resolved (dict): Resultado de resolve_episode (o None)
+            progress_callback (callable): Función callback para progreso
+            
+        Returns:
+            bool: True si la descarga fue exitosa
+        """
+        if not resolved or 'extractor' not in resolved:
+            if self.can_handle_url(url):
+                # Resolución fallida de un sitio con extractor propio: camino completo
+                return self.download_episode(url, progress_callback)
+            return super().download_resolved(url, resolved, progress_callback)
+        
+        extractor = get_extractor(resolved['extractor'])
+        video_info = resolved['info']
+        
+        if not self._check_available_space():
+            return False
+        
+        try:
+            if extractor.download_video(video_info, str(self.output_path), progress_callback, quality=self.quality):
+                self._remember_mirror(url, video_info, progress_callback)
+                return True
+        except Exception as e:
+            self.logger.warning(f"Falló la descarga del episodio resuelto: {e}")
+        
+        # Las URLs pudieron caducar mientras esperaban en la cola: resolver de nuevo
+        if self.stream_cache:
+            self.stream_cache.invalidate(url)
+        return self._download_with_custom_extractor(url, resolved['extractor'], progress_callback, use_cache=False)
+    
+    def _resolve_with_extractor(self, url, extractor):
+        """
+        Resuelve un episodio a URLs de video, reutilizando la caché de streams
+        
+        Args:
+            url (str): URL del episodio
+            extractor: Extractor personalizado a usar
+            
+        Returns:
+            tuple: (video_info o None, True si vino de la caché)
+        """
+        if self.stream_cache:
+            video_info = self.stream_cache.get(url)
+            if video_info:
+                self.logger.info("♻️  Usando streams ya resueltos (caché)")
+                return video_info, True
+        
+        video_info = extractor.extract_video_info(url)
+        
+        if video_info and self.stream_cache:
+            self.stream_cache.put(url, video_info)
+        
+        return video_info, False
+    
+    def _download_with_custom_extractor(self, url, extractor_name, progress_callback=None, use_cache=True):
         """
         Descarga usando un extractor personalizado
         
@@ -96,12 +240,13 @@ class ExtendedAnimeDownloader(BaseDownloader):
             url (str): URL del episodio
             extractor_name (str): Nombre del extractor a usar
             progress_callback (callable): Función callback para progreso
+            use_cache (bool): Permitir reutilizar streams ya resueltos
             
         Returns:
             bool: True si la descarga fue exitosa
         """
         try:
-            extractor = self.custom_extractors[extractor_name]
+            extractor = get_extractor(extractor_name)
             self.logger.info(f"Iniciando descarga con {extractor_name}: {url}")
             
             # Verificar espacio en disco
@@ -109,7 +254,12 @@ class ExtendedAnimeDownloader(BaseDownloader):
                 return False
             
             # Extraer información del video
-            video_info = extractor.extract_video_info(url)
+            if use_cache:
+                video_info, from_cache = self._resolve_with_extractor(url, extractor)
+            else:
+                video_info, from_cache = extractor.extract_video_info(url), False
+                if video_info and self.stream_cache:
+                    self.stream_cache.put(url, video_info)
             
             if not video_info:
                 self.logger.error(f"No se pudo extraer información usando {extractor_name}")
@@ -141,10 +291,12 @@ class ExtendedAnimeDownloader(BaseDownloader):
                     success = extractor.download_video(
                         video_info, 
                         str(self.output_path), 
-                        progress_callback
+                        progress_callback,
+                        quality=self.quality
                     )
                     
                     if success:
+                        self._remember_mirror(url, video_info, progress_callback)
                         self.logger.info("✅ Descarga completada exitosamente con extractor personalizado")
                         return True
                     
@@ -153,14 +305,41 @@ class ExtendedAnimeDownloader(BaseDownloader):
                     if attempt < self.max_retries - 1:
                         continue
             
+            # Las URLs en caché pueden haber caducado antes de lo previsto: resolver de nuevo
+            if from_cache:
+                self.logger.warning("Los streams en caché fallaron, resolviendo el episodio de nuevo...")
+                self.stream_cache.invalidate(url)
+                return self._download_with_custom_extractor(url, extractor_name, progress_callback, use_cache=False)
+            
             # Si el extractor personalizado falla, intentar con yt-dlp como fallback
             self.logger.warning(f"Extractor {extractor_name} falló, intentando con yt-dlp...")
-            return self._fallback_download(video_urls, video_info, progress_callback)
+            if self._fallback_download(video_urls, video_info, progress_callback):
+                self._remember_mirror(url, video_info, progress_callback)
+                return True
+            return False
             
         except Exception as e:
             self.logger.error(f"Error con extractor personalizado {extractor_name}: {e}")
             return False
     
+    def _remember_mirror(self, url, video_info, progress_callback=None):
+        """
+        Guarda en la caché de streams el mirror con el que se descargó el
+        episodio y lo notifica al callback de progreso (status 'mirror')
+        """
+        mirror = video_info.get('mirror')
+        if not mirror:
+            return
+        
+        if self.stream_cache:
+            self.stream_cache.put(url, video_info, mirror=mirror)
+        
+        if progress_callback:
+            try:
+                progress_callback({'status': 'mirror', 'mirror': mirror})
+            except Exception as e:
+                self.logger.debug(f"Error en callback de progreso (ignorado): {e}")
+    
     def _fallback_download(self, video_urls, video_info, progress_callback=None):
         """
         Intenta descargar usando yt-dlp como fallback
@@ -175,13 +354,15 @@ class ExtendedAnimeDownloader(BaseDownloader):
         """
         self.logger.info("Intentando descarga de fallback con yt-dlp...")
         
+        video_urls = rank_candidates(video_urls, self.quality)
+        
         for i, url in enumerate(video_urls[:3]):  # Intentar máximo 3 URLs
             try:
                 self.logger.info(f"Probando URL de fallback {i+1}: {url}")
                 
                 ydl_opts = {
                     'outtmpl': str(self.output_path / f"{video_info['title']}.%(ext)s"),
-                    'format': 'best',
+                    **ydl_format_options(self.quality),
                     'ignoreerrors': True,
                     'socket_timeout': 30,
                     'retries': 2,
@@ -196,9 +377,15 @@ class ExtendedAnimeDownloader(BaseDownloader):
                     safe_hook = SafeProgressHook(progress_callback)
                     ydl_opts['progress_hooks'] = [safe_hook]
                 
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    ydl.download([url])
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl, get_governor().limit(ydl.params):
+                    retcode = ydl.download([url])
                 
+                # Con ignoreerrors yt-dlp no lanza los errores: los indica el código de salida
+                if retcode != 0:
+                    self.logger.warning(f"Fallback URL {i+1} falló: yt-dlp terminó con código {retcode}")
+                    continue
+                
+                video_info['mirror'] = url
                 self.logger.info("✅ Descarga de fallback exitosa")
                 return True
                 
@@ -222,11 +409,12 @@ class ExtendedAnimeDownloader(BaseDownloader):
         # Verificar si tenemos un extractor personalizado
         extractor_name = self.can_handle_url(url)
         
-        if extractor_name:
+        extractor = get_extractor(extractor_name) if extractor_name else None
+        
+        if extractor:
             try:
                 self.logger.info(f"Obteniendo información con extractor: {extractor_name}")
-                extractor = self.custom_extractors[extractor_name]
-                info = extractor.extract_video_info(url)
+                info, _ = self._resolve_with_extractor(url, extractor)
                 
                 if info:
                     return {
@@ -256,7 +444,7 @@ class ExtendedAnimeDownloader(BaseDownloader):
                 'youtube.com', 'youtu.be', 'vimeo.com', 
                 'dailymotion.com', 'twitch.tv', 'facebook.com'
             ],
-            'custom_extractors': list(self.custom_extractors.keys())
+            'custom_extractors': available_extractors()
         }
         
         return supported
@@ -1,26 +1,119 @@
-cat > extractors/__init__.py << 'EOF'
 """
 Extractors package - Extractores personalizados para sitios de anime
+Registro perezoso: cada extractor se importa e instancia la primera vez
+que aparece una URL de uno de sus dominios
 """
 
+import logging
+import importlib
+import threading
+from urllib.parse import urlparse
+
 __version__ = '1.0.0'
-__all__ = ['jkanime', 'animeflv']
-
-# Importar extractores disponibles
-EXTRACTORS_AVAILABLE = []
-
-try:
-    from .jkanime import JKAnimeExtractor
-    EXTRACTORS_AVAILABLE.append('jkanime')
-except ImportError as e:
-    print(f"Warning: Could not import JKAnime extractor: {e}")
-
-try:
-    from .animeflv import AnimeFLVExtractor
-    EXTRACTORS_AVAILABLE.append('animeflv')
-    print("✅ AnimeFLV extractor loaded")
-except ImportError as e:
-    print(f"Warning: Could not import AnimeFLV extractor: {e}")
-
-print(f"📋 Extractors available: {EXTRACTORS_AVAILABLE}")
-EOF
+__all__ = [
+    'EXTRACTOR_SPECS', 'register_extractor', 'find_extractor',
+    'get_extractor', 'available_extractors', 'url_hostname',
+]
+
+# nombre -> (módulo, clase, dominios que maneja)
+EXTRACTOR_SPECS = {}
+
+# dominio -> nombre del extractor
+_DOMAIN_INDEX = {}
+
+_instances = {}
+_lock = threading.Lock()
+_logger = logging.getLogger(__name__)
+
+def register_extractor(name, module, class_name, domains):
+    """
+    Declara un extractor sin importarlo
+    
+    Args:
+        name (str): Nombre del extractor
+        module (str): Módulo que lo contiene (ej. 'extractors.jkanime')
+        class_name (str): Clase del extractor
+        domains (tuple): Dominios que maneja (los subdominios también coinciden)
+    """
+    EXTRACTOR_SPECS[name] = (module, class_name, tuple(domains))
+    for domain in domains:
+        _DOMAIN_INDEX[domain.lower()] = name
+
+def url_hostname(url):
+    """
+    Obtiene el hostname de una URL en minúsculas, sin puerto ni 'www.'
+    
+    Args:
+        url (str): URL a analizar
+    
+    Returns:
+        str: Hostname o cadena vacía si la URL no es válida
+    """
+    try:
+        hostname = (urlparse(url).hostname or '').lower()
+    except ValueError:
+        return ''
+    return hostname[4:] if hostname.startswith('www.') else hostname
+
+def find_extractor(url):
+    """
+    Busca el extractor que maneja una URL por su dominio
+    
+    Prueba el hostname completo y luego cada sufijo de dominio
+    (a.b.jkanime.net -> b.jkanime.net -> jkanime.net), sin importar nada.
+    
+    Args:
+        url (str): URL a verificar
+    
+    Returns:
+        str: Nombre del extractor, o None si ninguno la maneja
+    """
+    labels = url_hostname(url).split('.')
+    for i in range(len(labels) - 1):
+        name = _DOMAIN_INDEX.get('.'.join(labels[i:]))
+        if name:
+            return name
+    return None
+
+def get_extractor(name):
+    """
+    Retorna la instancia compartida de un extractor, importándolo al primer uso
+    
+    Args:
+        name (str): Nombre del extractor
+    
+    Returns:
+        object: Instancia del extractor, o None si no está disponible
+    """
+    with _lock:
+        if name in _instances:
+            return _instances[name]
+        
+        spec = EXTRACTOR_SPECS.get(name)
+        if not spec:
+            return None
+        
+        module_name, class_name, _ = spec
+        try:
+            module = importlib.import_module(module_name)
+            extractor = getattr(module, class_name)()
+        except ImportError as e:
+            _logger.warning(f"Extractor {name} no disponible: {e}")
+            extractor = None
+        
+        _instances[name] = extractor
+        if extractor is not None:
+            _logger.info(f"✅ Extractor de {name} cargado")
+        return extractor
+
+def available_extractors():
+    """
+    Lista los extractores registrados
+    
+    Returns:
+        list: Nombres de los extractores
+    """
+    return list(EXTRACTOR_SPECS)
+
+# Extractores disponibles (AnimeFLV aún está en desarrollo)
+register_extractor('jkanime', 'extractors.jkanime', 'JKAnimeExtractor', ('jkanime.net',))
@@ -7,28 +7,278 @@ import re
 import json
 import requests
 from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import logging
-import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 from utils import clean_filename, format_bytes
+from config import Config
+from http_cache import CachedSession
+from transport import get_session
+from extractors import find_extractor
+from quality import rank_candidates, ydl_format_options
+from bandwidth import get_governor
+
+# lxml es mucho más rápido que html.parser; si no está instalado usamos el parser estándar
+# (y se desactiva el escaneo en streaming, que necesita su parser incremental)
+try:
+    from lxml import etree
+    HTML_PARSER = 'lxml'
+except ImportError:
+    etree = None
+    HTML_PARSER = 'html.parser'
+
+# Solo construimos en el árbol las etiquetas que el extractor consulta
+PAGE_STRAINER = SoupStrainer(['h1', 'title', 'div', 'meta', 'img', 'script', 'iframe', 'a'])
+
+# Patrón combinado para URLs de video dentro de scripts (una sola pasada por script)
+VIDEO_URL_PATTERN = re.compile(
+    r'"(?:file|url)":\s*"([^"]+)"'
+    r'|source:\s*"([^"]+)"'
+    r'|(https?://[^"\s]+\.(?:m3u8|mp4)[^"\s]*)',
+    re.IGNORECASE
+)
+
+# Validación de URLs de video
+INVALID_URL_PATTERN = re.compile(
+    r'javascript:|mailto:|\.css|\.js|\.png|\.jpg|\.gif'
+    r'|facebook\.com|twitter\.com|instagram\.com',
+    re.IGNORECASE
+)
+VALID_URL_PATTERN = re.compile(r'\.mp4|\.m3u8|video|stream|player|embed', re.IGNORECASE)
+VIDEO_LINK_PATTERN = re.compile(r'\.mp4|\.m3u8|video')
+PLAYER_IFRAME_PATTERN = re.compile(r'player|embed')
+THUMBNAIL_PATTERN = re.compile(r'thumb|poster|cover')
+
+# Listado de episodios de una serie
+EPISODES_PER_PAGE = 12
+ANIME_ID_PATTERN = re.compile(r'data-anime="(\d+)"|ajax/(?:pagination_episodes|last_episode)/(\d+)/')
+EPISODE_PAGE_PATTERN = re.compile(r'href="#pag(\d+)"')
+EPISODE_COUNT_PATTERN = re.compile(r'Episodios:\s*(?:</span>)?\s*(\d+)', re.IGNORECASE)
+
+
+def parse_html(content):
+    """
+    Parsea HTML con el parser más rápido disponible, limitado a las etiquetas útiles
+    
+    Args:
+        content (bytes): Contenido HTML
+        
+    Returns:
+        BeautifulSoup: Árbol parseado
+    """
+    return BeautifulSoup(content, HTML_PARSER, parse_only=PAGE_STRAINER)
+
+
+def scan_script_text(script_content):
+    """
+    Busca URLs de video en el texto de un script con una sola pasada de regex
+    
+    Args:
+        script_content (str): Contenido del script
+        
+    Yields:
+        str: URLs candidatas en orden de aparición
+    """
+    for match in VIDEO_URL_PATTERN.finditer(script_content):
+        url = match.group(match.lastindex)
+        if url:
+            yield url
+
+
+def is_valid_video_url(url):
+    """
+    Verifica si una URL es válida para video
+    
+    Args:
+        url (str): URL a verificar
+        
+    Returns:
+        bool: True si es una URL de video válida
+    """
+    if not url or len(url) < 10:
+        return False
+    
+    if INVALID_URL_PATTERN.search(url):
+        return False
+    
+    return VALID_URL_PATTERN.search(url) is not None
+
+
+def unique_urls(urls):
+    """
+    Elimina duplicados conservando el orden de aparición
+    
+    Args:
+        urls (iterable): URLs posiblemente repetidas
+        
+    Returns:
+        list: URLs únicas en su orden original
+    """
+    return list(dict.fromkeys(urls))
+
+
+def response_encoding(response):
+    """
+    Codificación declarada en el Content-Type, o UTF-8 si no se declara
+    
+    Args:
+        response (requests.Response): Respuesta HTTP
+        
+    Returns:
+        str: Nombre de la codificación
+    """
+    if 'charset=' in response.headers.get('Content-Type', '').lower():
+        return response.encoding
+    return 'utf-8'
+
+
+class StreamingPageScanner:
+    """
+    Escanea una página HTML a medida que llegan sus bytes
+    
+    Usa el parser incremental de lxml: los candidatos de video se emiten en
+    cuanto se cierra el script o aparece la etiqueta que los contiene, y el
+    texto de cada script se libera tras escanearlo.
+    """
+    
+    def __init__(self, page_url, base_url, want_title=True, encoding='utf-8'):
+        """
+        Args:
+            page_url (str): URL de la página escaneada
+            base_url (str): URL base del sitio para resolver enlaces relativos
+            want_title (bool): Si el título es necesario para terminar antes
+            encoding (str): Codificación del documento
+        """
+        self.page_url = page_url
+        self.base_url = base_url
+        self.want_title = want_title
+        self.bytes_read = 0
+        self.truncated = False
+        
+        self.title = None
+        self.description = ''
+        self._has_h1 = False
+        self._og_image = None
+        self._img_thumbnail = None
+        self._video_urls = {}
+        self._iframe_urls = {}
+        
+        self._parser = etree.HTMLPullParser(events=('start', 'end'), encoding=encoding)
+    
+    @property
+    def video_urls(self):
+        """URLs de video válidas encontradas, sin duplicados"""
+        return list(self._video_urls)
+    
+    @property
+    def iframe_urls(self):
+        """URLs de iframes de reproductores encontradas, sin duplicados"""
+        return list(self._iframe_urls)
+    
+    @property
+    def thumbnail(self):
+        """og:image si existe, si no la primera imagen con pinta de miniatura"""
+        return self._og_image or self._img_thumbnail
+    
+    @property
+    def done(self):
+        """True cuando ya se tiene el título (si hace falta) y candidatos suficientes"""
+        # El <title> del <head> llega antes, pero el <h1> tiene prioridad: hay que esperarlo
+        if self.want_title and not self._has_h1:
+            return False
+        return len(self._video_urls) >= Config.MIN_VIDEO_CANDIDATES
+    
+    def feed(self, chunk):
+        """
+        Procesa un fragmento de la respuesta
+        
+        Args:
+            chunk (bytes): Bytes recibidos
+        """
+        self.bytes_read += len(chunk)
+        self._parser.feed(chunk)
+        self._process(self._parser.read_events())
+    
+    def close(self):
+        """Termina el parseo procesando las etiquetas pendientes"""
+        try:
+            self._parser.close()
+        except etree.LxmlError:
+            pass
+        self._process(self._parser.read_events())
+    
+    def _add_video_url(self, url, base):
+        if not url.startswith('http'):
+            url = urljoin(base, url)
+        if is_valid_video_url(url):
+            self._video_urls[url] = None
+    
+    def _process(self, events):
+        for event, element in events:
+            tag = element.tag
+            if not isinstance(tag, str):  # comentarios e instrucciones
+                continue
+            
+            if event == 'start':
+                # Los atributos ya están disponibles al abrir la etiqueta
+                if tag == 'iframe':
+                    src = element.get('src')
+                    if src and PLAYER_IFRAME_PATTERN.search(src):
+                        if not src.startswith('http'):
+                            src = urljoin(self.page_url, src)
+                        self._iframe_urls[src] = None
+                elif tag == 'a':
+                    href = element.get('href')
+                    if href and VIDEO_LINK_PATTERN.search(href):
+                        self._add_video_url(href, self.base_url)
+                elif tag == 'meta':
+                    if element.get('property') == 'og:image' and not self._og_image:
+                        self._og_image = element.get('content')
+                elif tag == 'img' and not self._img_thumbnail:
+                    src = element.get('src') or element.get('data-src')
+                    if src and THUMBNAIL_PATTERN.search(src):
+                        self._img_thumbnail = src if src.startswith('http') else urljoin(self.base_url, src)
+                continue
+            
+            if tag == 'script':
+                if element.text:
+                    for url in scan_script_text(element.text):
+                        self._add_video_url(url, self.base_url)
+                # Los scripts inline pueden ocupar megas: no conservarlos en el árbol
+                element.clear()
+            elif tag == 'h1' and not self._has_h1:
+                # El <h1> tiene prioridad sobre el <title> del <head>
+                self._has_h1 = True
+                self.title = ''.join(element.itertext()).strip()
+            elif tag == 'title' and self.title is None:
+                self.title = ''.join(element.itertext()).strip()
+            elif tag == 'div':
+                classes = element.get('class', '').split()
+                # .sinopsis tiene prioridad sobre .description
+                if 'sinopsis' in classes or ('description' in classes and not self.description):
+                    self.description = ''.join(element.itertext()).strip()[:200]
+            elif tag == 'style':
+                element.clear()
+
 
 class JKAnimeExtractor:
     """Extractor para jkanime.net"""
     
-    def __init__(self):
-        """Inicializa el extractor de JKAnime"""
+    # Nombre en el registro de extractores, donde se declaran sus dominios
+    NAME = 'jkanime'
+    
+    def __init__(self, session=None):
+        """
+        Inicializa el extractor de JKAnime
+        
+        Args:
+            session (requests.Session): Sesión HTTP a usar (default: la compartida del proceso)
+        """
         self.logger = logging.getLogger(__name__)
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        })
+        self.session = session or get_session()
+        if Config.HTTP_CACHE_ENABLED:
+            self.session = CachedSession(self.session, offline=Config.HTTP_CACHE_OFFLINE)
         self.base_url = 'https://jkanime.net'
         
     def can_handle(self, url):
@@ -41,7 +291,119 @@ class JKAnimeExtractor:
         Returns:
             bool: True si puede manejar esta URL
         """
-        return 'jkanime.net' in url
+        return find_extractor(url) == self.NAME
+    
+    def is_series_url(self, url):
+        """
+        Verifica si la URL es la página de una serie (https://jkanime.net/<slug>/)
+        
+        Args:
+            url (str): URL a verificar
+            
+        Returns:
+            bool: True si es una URL de serie
+        """
+        path_parts = [part for part in urlparse(url).path.split('/') if part]
+        return self.can_handle(url) and len(path_parts) == 1
+    
+    def get_episode_list(self, series_url, min_episode=0, raise_errors=False):
+        """
+        Enumera los episodios de una serie
+        
+        Las páginas del listado paginado se descargan en paralelo. Con
+        min_episode solo se piden las páginas que pueden contener episodios
+        posteriores, así una comprobación de episodios nuevos cuesta una o
+        dos peticiones.
+        
+        Args:
+            series_url (str): URL de la serie
+            min_episode (int): Solo retornar episodios posteriores a este
+            raise_errors (bool): Propagar errores de red en lugar de retornar []
+            
+        Returns:
+            list: Tuplas (número de episodio, URL del episodio) ordenadas
+        """
+        slug = urlparse(series_url).path.strip('/').split('/')[0]
+        
+        try:
+            self.logger.info(f"Enumerando episodios de la serie: {slug}")
+            
+            response = self.session.get(series_url, timeout=Config.TIMEOUT)
+            response.raise_for_status()
+            html = response.text
+            
+            numbers = []
+            
+            # Método 1: API de paginación de episodios
+            id_match = ANIME_ID_PATTERN.search(html)
+            count_match = EPISODE_COUNT_PATTERN.search(html)
+            if id_match:
+                anime_id = id_match.group(1) or id_match.group(2)
+                pages = [int(page) for page in EPISODE_PAGE_PATTERN.findall(html)]
+                if pages:
+                    last_page = max(pages)
+                elif count_match:
+                    last_page = max(1, -(-int(count_match.group(1)) // EPISODES_PER_PAGE))
+                else:
+                    last_page = 1
+                
+                with ThreadPoolExecutor(max_workers=Config.SERIES_PAGE_WORKERS) as executor:
+                    first_page = max(1, min_episode // EPISODES_PER_PAGE + 1)
+                    page_results = executor.map(
+                        lambda page: self._fetch_episode_page(anime_id, page, raise_errors),
+                        range(min(first_page, last_page), last_page + 1)
+                    )
+                    for page_numbers in page_results:
+                        numbers.extend(page_numbers)
+            
+            # Método 2: Número total de episodios indicado en la página
+            if not numbers and count_match:
+                numbers = range(1, int(count_match.group(1)) + 1)
+            
+            # Método 3: Enlaces a episodios presentes en el HTML
+            if not numbers:
+                link_pattern = re.compile(rf'/{re.escape(slug)}/(\d+)/?["\']')
+                numbers = [int(number) for number in link_pattern.findall(html)]
+            
+            episodes = [
+                (number, f"{self.base_url}/{slug}/{number}/")
+                for number in sorted(set(numbers))
+                if number > min_episode
+            ]
+            
+            self.logger.info(f"Episodios encontrados: {len(episodes)}")
+            return episodes
+            
+        except Exception as e:
+            if raise_errors:
+                raise
+            self.logger.error(f"Error enumerando episodios de {series_url}: {e}")
+            return []
+    
+    def _fetch_episode_page(self, anime_id, page, raise_errors=False):
+        """
+        Descarga una página del listado de episodios
+        
+        Args:
+            anime_id (str): Identificador interno de la serie
+            page (int): Número de página
+            raise_errors (bool): Propagar errores en lugar de retornar []
+            
+        Returns:
+            list: Números de episodio de la página
+        """
+        try:
+            url = f"{self.base_url}/ajax/pagination_episodes/{anime_id}/{page}/"
+            response = self.session.get(url, timeout=Config.TIMEOUT)
+            response.raise_for_status()
+            
+            return [int(item['number']) for item in response.json() if str(item.get('number', '')).isdigit()]
+            
+        except Exception as e:
+            if raise_errors:
+                raise
+            self.logger.warning(f"Error obteniendo página {page} de episodios: {e}")
+            return []
     
     def extract_video_info(self, url):
         """
@@ -56,17 +418,12 @@ class JKAnimeExtractor:
         try:
             self.logger.info(f"Extrayendo información de JKAnime: {url}")
             
-            # Realizar request a la página principal
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
+            # Descargar y escanear la página principal
+            page = self._read_page(url, timeout=30)
             
             # Extraer título del anime y episodio
-            title_element = soup.find('h1') or soup.find('title')
-            if title_element:
-                title = title_element.get_text().strip()
-                title = clean_filename(title)
+            if page['title'] is not None:
+                title = clean_filename(page['title'])
             else:
                 # Extraer título de la URL como fallback
                 path_parts = urlparse(url).path.strip('/').split('/')
@@ -77,20 +434,14 @@ class JKAnimeExtractor:
                 else:
                     title = "JKAnime Episode"
             
-            # Buscar información adicional
-            description = ""
-            desc_element = soup.find('div', class_='sinopsis') or soup.find('div', class_='description')
-            if desc_element:
-                description = desc_element.get_text().strip()[:200]
-            
-            # Extraer enlaces de video
-            video_urls = self._extract_video_urls(soup, url)
+            # Extraer enlaces de video (el conjunto de visitadas es por episodio)
+            video_urls = self._extract_video_urls(page['video_urls'], page['iframe_urls'], url, visited={url})
             
             video_info = {
                 'title': title,
-                'description': description,
+                'description': page['description'],
                 'video_urls': video_urls,
-                'thumbnail': self._extract_thumbnail(soup),
+                'thumbnail': page['thumbnail'],
                 'duration': 0,  # JKAnime no siempre proporciona duración
                 'uploader': 'JKAnime',
                 'source': 'jkanime.net'
@@ -105,82 +456,205 @@ class JKAnimeExtractor:
             self.logger.error(f"Error extrayendo información de JKAnime: {e}")
             return None
     
-    def _extract_video_urls(self, soup, page_url):
+    def _read_page(self, url, timeout, want_title=True):
         """
-        Extrae URLs de video de la página de JKAnime
+        Descarga una página y extrae título, descripción, miniatura y candidatos
+        
+        Con Config.STREAMING_SCAN (y lxml disponible) la página se escanea
+        mientras se descarga y la lectura se corta en cuanto hay título y
+        candidatos suficientes, o al llegar a Config.PAGE_MAX_BYTES. Las
+        páginas leídas hasta el final se guardan en la caché HTTP; las que ya
+        están en ella se piden sin streaming para servirlas o revalidarlas.
         
         Args:
-            soup (BeautifulSoup): Contenido HTML parseado
+            url (str): URL de la página
+            timeout (int): Timeout de la request en segundos
+            want_title (bool): Si hace falta el título (no para iframes)
+            
+        Returns:
+            dict: 'title' (None si no hay), 'description', 'thumbnail',
+                  'video_urls' e 'iframe_urls'
+        """
+        if not Config.STREAMING_SCAN or etree is None:
+            response = self.session.get(url, timeout=timeout)
+            response.raise_for_status()
+            
+            soup = parse_html(response.content)
+            video_urls, iframe_urls = self._scan_page(soup, url)
+            
+            title_element = soup.find('h1') or soup.find('title')
+            desc_element = soup.find('div', class_='sinopsis') or soup.find('div', class_='description')
+            
+            return {
+                'title': title_element.get_text().strip() if title_element else None,
+                'description': desc_element.get_text().strip()[:200] if desc_element else '',
+                'thumbnail': self._extract_thumbnail(soup),
+                'video_urls': video_urls,
+                'iframe_urls': iframe_urls,
+            }
+        
+        cache = self.session.cache if isinstance(self.session, CachedSession) else None
+        stream = not (cache and cache.contains(url))
+        
+        response = self.session.get(url, timeout=timeout, stream=stream)
+        try:
+            response.raise_for_status()
+            
+            # Cuerpo leído, para guardar en caché la página si se lee completa
+            chunks = [] if cache and stream else None
+            complete = False
+            
+            scanner = StreamingPageScanner(url, self.base_url, want_title, response_encoding(response))
+            for chunk in response.iter_content(Config.PAGE_CHUNK_SIZE):
+                scanner.feed(chunk)
+                if chunks is not None:
+                    chunks.append(chunk)
+                if scanner.done:
+                    break
+                if scanner.bytes_read >= Config.PAGE_MAX_BYTES:
+                    scanner.truncated = True
+                    break
+            else:
+                complete = True
+            scanner.close()
+            
+            if complete and chunks is not None:
+                cache.store(url, response, b''.join(chunks))
+        finally:
+            # Cierra la conexión si la respuesta no se leyó completa
+            response.close()
+        
+        if scanner.truncated:
+            self.logger.debug(f"Página {url} truncada tras {format_bytes(scanner.bytes_read)}")
+        else:
+            self.logger.debug(f"Página {url} escaneada: {format_bytes(scanner.bytes_read)} leídos")
+        
+        return {
+            'title': scanner.title,
+            'description': scanner.description,
+            'thumbnail': scanner.thumbnail,
+            'video_urls': scanner.video_urls,
+            'iframe_urls': scanner.iframe_urls,
+        }
+    
+    def _extract_video_urls(self, video_urls, iframe_urls, page_url, visited=None):
+        """
+        Completa los candidatos de la página de JKAnime resolviendo sus iframes
+        
+        Args:
+            video_urls (list): URLs de video encontradas en la página
+            iframe_urls (list): URLs de iframes de reproductores de la página
             page_url (str): URL de la página principal
+            visited (set): URLs ya visitadas durante este episodio
             
         Returns:
             list: Lista de URLs de video encontradas
         """
-        video_urls = []
-        
         try:
-            # Método 1: Buscar scripts que contengan URLs de video
-            script_tags = soup.find_all('script')
-            
-            for script in script_tags:
-                if script.string:
-                    script_content = script.string
-                    
-                    # Buscar patrones comunes de URLs de video
-                    video_patterns = [
-                        r'https?://[^"\s]+\.m3u8[^"\s]*',
-                        r'https?://[^"\s]+\.mp4[^"\s]*',
-                        r'https?://[^"\s]+/playlist\.m3u8[^"\s]*',
-                        r'"file":\s*"([^"]+)"',
-                        r'"url":\s*"([^"]+)"',
-                        r'source:\s*"([^"]+)"',
-                    ]
-                    
-                    for pattern in video_patterns:
-                        matches = re.findall(pattern, script_content, re.IGNORECASE)
-                        for match in matches:
-                            # Limpiar la URL
-                            if isinstance(match, tuple):
-                                url = match[0] if match else None
-                            else:
-                                url = match
-                            
-                            if url and self._is_valid_video_url(url):
-                                if not url.startswith('http'):
-                                    url = urljoin(self.base_url, url)
-                                video_urls.append(url)
-            
-            # Método 2: Buscar iframes con reproductores
-            iframes = soup.find_all('iframe')
-            for iframe in iframes:
-                src = iframe.get('src')
-                if src and ('player' in src or 'embed' in src):
-                    if not src.startswith('http'):
-                        src = urljoin(self.base_url, src)
-                    
-                    # Intentar extraer video del iframe
-                    iframe_urls = self._extract_from_iframe(src)
-                    video_urls.extend(iframe_urls)
-            
-            # Método 3: Buscar enlaces directos en la página
-            video_links = soup.find_all('a', href=True)
-            for link in video_links:
-                href = link['href']
-                if any(ext in href for ext in ['.mp4', '.m3u8', 'video']):
-                    if not href.startswith('http'):
-                        href = urljoin(self.base_url, href)
-                    video_urls.append(href)
-            
-            # Eliminar duplicados y filtrar
-            video_urls = list(set(video_urls))
-            video_urls = [url for url in video_urls if self._is_valid_video_url(url)]
-            
-            return video_urls
+            video_urls = list(video_urls)
+            
+            # Resolver iframes solo si la página no aportó suficientes candidatos
+            if iframe_urls and len(video_urls) < Config.MIN_VIDEO_CANDIDATES:
+                visited = visited if visited is not None else {page_url}
+                video_urls.extend(self._resolve_iframes(iframe_urls, visited, len(video_urls)))
+            
+            # Eliminar duplicados (conservando el orden) y filtrar
+            return [url for url in unique_urls(video_urls) if is_valid_video_url(url)]
             
         except Exception as e:
             self.logger.error(f"Error extrayendo URLs de video: {e}")
             return []
     
+    def _scan_page(self, soup, page_url):
+        """
+        Busca candidatos de video e iframes de reproductores en una página
+        
+        Args:
+            soup (BeautifulSoup): Contenido HTML parseado
+            page_url (str): URL de la página escaneada
+            
+        Returns:
+            tuple: (URLs de video válidas, URLs de iframes de reproductores)
+        """
+        video_urls = []
+        
+        # Método 1: Buscar URLs de video en los scripts (una pasada por script)
+        for script in soup.find_all('script'):
+            if script.string:
+                for url in scan_script_text(script.string):
+                    if is_valid_video_url(url):
+                        if not url.startswith('http'):
+                            url = urljoin(self.base_url, url)
+                        video_urls.append(url)
+        
+        # Método 2: Buscar iframes con reproductores
+        iframe_urls = []
+        for iframe in soup.find_all('iframe', src=PLAYER_IFRAME_PATTERN):
+            src = iframe['src']
+            if not src.startswith('http'):
+                src = urljoin(page_url, src)
+            iframe_urls.append(src)
+        
+        # Método 3: Buscar enlaces directos en la página
+        for link in soup.find_all('a', href=VIDEO_LINK_PATTERN):
+            href = link['href']
+            if not href.startswith('http'):
+                href = urljoin(self.base_url, href)
+            if is_valid_video_url(href):
+                video_urls.append(href)
+        
+        return video_urls, unique_urls(iframe_urls)
+    
+    def _resolve_iframes(self, iframe_urls, visited, found=0):
+        """
+        Resuelve iframes de reproductores en paralelo con un pool acotado
+        
+        Los iframes anidados se encolan en cuanto se descubren, hasta
+        Config.IFRAME_MAX_DEPTH niveles. Ninguna URL se visita dos veces y
+        la resolución se detiene al reunir Config.MIN_VIDEO_CANDIDATES.
+        
+        Args:
+            iframe_urls (list): URLs de iframes de la página principal
+            visited (set): URLs ya visitadas durante este episodio
+            found (int): Candidatos ya encontrados en la página principal
+            
+        Returns:
+            list: URLs de video encontradas en los iframes
+        """
+        video_urls = []
+        pending = {}
+        executor = ThreadPoolExecutor(max_workers=Config.IFRAME_WORKERS)
+        
+        def submit(url, depth):
+            if depth > Config.IFRAME_MAX_DEPTH or url in visited:
+                return
+            visited.add(url)
+            pending[executor.submit(self._extract_from_iframe, url)] = depth
+        
+        try:
+            for url in iframe_urls:
+                submit(url, 1)
+            
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                
+                for future in done:
+                    depth = pending.pop(future)
+                    urls, nested_iframes = future.result()
+                    video_urls.extend(urls)
+                    for nested_url in nested_iframes:
+                        submit(nested_url, depth + 1)
+                
+                if found + len(unique_urls(video_urls)) >= Config.MIN_VIDEO_CANDIDATES:
+                    self.logger.debug(f"Candidatos suficientes, cancelando {len(pending)} iframe(s) pendientes")
+                    break
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+        
+        return video_urls
+    
     def _extract_from_iframe(self, iframe_url):
         """
         Extrae URLs de video desde un iframe
@@ -189,23 +663,17 @@ class JKAnimeExtractor:
             iframe_url (str): URL del iframe
             
         Returns:
-            list: URLs de video encontradas
+            tuple: (URLs de video encontradas, URLs de iframes anidados)
         """
         try:
             self.logger.debug(f"Extrayendo desde iframe: {iframe_url}")
             
-            # Pequeña pausa para evitar rate limiting
-            time.sleep(1)
-            
-            response = self.session.get(iframe_url, timeout=15)
-            response.raise_for_status()
-            
-            iframe_soup = BeautifulSoup(response.content, 'html.parser')
-            return self._extract_video_urls(iframe_soup, iframe_url)
+            page = self._read_page(iframe_url, Config.IFRAME_TIMEOUT, want_title=False)
+            return page['video_urls'], page['iframe_urls']
             
         except Exception as e:
             self.logger.debug(f"Error extrayendo desde iframe {iframe_url}: {e}")
-            return []
+            return [], []
     
     def _extract_thumbnail(self, soup):
         """
@@ -227,7 +695,7 @@ class JKAnimeExtractor:
             img_tags = soup.find_all('img')
             for img in img_tags:
                 src = img.get('src') or img.get('data-src')
-                if src and ('thumb' in src or 'poster' in src or 'cover' in src):
+                if src and THUMBNAIL_PATTERN.search(src):
                     if not src.startswith('http'):
                         src = urljoin(self.base_url, src)
                     return src
@@ -248,39 +716,9 @@ class JKAnimeExtractor:
         Returns:
             bool: True si es una URL de video válida
         """
-        if not url or len(url) < 10:
-            return False
-        
-        # Filtrar URLs no deseadas
-        invalid_patterns = [
-            'javascript:',
-            'mailto:',
-            '.css',
-            '.js',
-            '.png',
-            '.jpg',
-            '.gif',
-            'facebook.com',
-            'twitter.com',
-            'instagram.com'
-        ]
-        
-        if any(pattern in url.lower() for pattern in invalid_patterns):
-            return False
-        
-        # Verificar patrones válidos
-        valid_patterns = [
-            '.mp4',
-            '.m3u8',
-            'video',
-            'stream',
-            'player',
-            'embed'
-        ]
-        
-        return any(pattern in url.lower() for pattern in valid_patterns)
+        return is_valid_video_url(url)
     
-    def download_video(self, video_info, output_path, progress_callback=None):
+    def download_video(self, video_info, output_path, progress_callback=None, quality=None):
         """
         Descarga el video usando las URLs extraídas
         
@@ -288,6 +726,7 @@ class JKAnimeExtractor:
             video_info (dict): Información del video
             output_path (str): Ruta donde guardar el video
             progress_callback (callable): Función de callback para progreso
+            quality (str): Calidad pedida (default: Config.DEFAULT_QUALITY)
             
         Returns:
             bool: True si la descarga fue exitosa
@@ -298,6 +737,15 @@ class JKAnimeExtractor:
             self.logger.error("No se encontraron URLs de video válidas")
             return False
         
+        quality = quality or Config.DEFAULT_QUALITY
+        
+        # Probar primero los mirrors que mejor se ajustan a la calidad pedida,
+        # salvo el que ya funcionó en una descarga anterior
+        mirror = video_info.get('mirror')
+        video_urls = rank_candidates([url for url in video_urls if url != mirror], quality, self.session)
+        if mirror:
+            video_urls.insert(0, mirror)
+        
         self.logger.info(f"Intentando descargar desde {len(video_urls)} URL(s)")
         
         # Intentar cada URL hasta que una funcione
@@ -310,31 +758,28 @@ class JKAnimeExtractor:
                 
                 ydl_opts = {
                     'outtmpl': f"{output_path}/{video_info['title']}.%(ext)s",
-                    'format': 'best',
                     'ignoreerrors': True,
                     'no_warnings': False,
                     'socket_timeout': 30,
-                    'http_headers': self.session.headers,
+                    'http_headers': dict(self.session.headers),
+                    **ydl_format_options(quality),
                 }
                 
                 if progress_callback:
-                    def safe_progress_hook(data):
-                        try:
-                            if data.get('status') == 'downloading':
-                                progress_callback({
-                                    'status': 'downloading',
-                                    'percentage': data.get('_percent_str', '0%').replace('%', ''),
-                                    'speed': data.get('_speed_str', 'N/A'),
-                                    'eta': data.get('_eta_str', 'N/A'),
-                                })
-                        except:
-                            pass
-                    
-                    ydl_opts['progress_hooks'] = [safe_progress_hook]
+                    # Mismo hook que el descargador: bytes numéricos y aviso 'finished' con el archivo
+                    from downloader import SafeProgressHook
+                    ydl_opts['progress_hooks'] = [SafeProgressHook(progress_callback)]
                 
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    ydl.download([url])
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl, get_governor().limit(ydl.params):
+                    retcode = ydl.download([url])
                 
+                # Con ignoreerrors yt-dlp no lanza los errores: los indica el código de salida
+                if retcode != 0:
+                    self.logger.warning(f"Error con URL {i+1}: yt-dlp terminó con código {retcode}")
+                    continue
+                
+                # Recordar el mirror que funcionó para reintentos posteriores
+                video_info['mirror'] = url
                 self.logger.info("✅ Descarga de JKAnime completada exitosamente")
                 return True
                 
@@ -345,6 +790,7 @@ class JKAnimeExtractor:
         self.logger.error("❌ No se pudo descargar desde ninguna URL")
         return False
 
-def create_jkanime_extractor():
+
+def create_jkanime_extractor(session=None):
     """Factory function para crear extractor de JKAnime"""
-    return JKAnimeExtractor()
+    return JKAnimeExtractor(session)
@@ -31,6 +31,10 @@ class AnimeDownloaderGUI:
         self.download_thread = None
         self.is_downloading = False
         
+        # Ejecución en curso en el servicio de descargas (daemon.py), si se usa
+        self.daemon_client = None
+        self.daemon_run_id = None
+        
     def setup_window(self):
         """Configuración inicial de la ventana"""
         self.root.title("Anime Downloader v1.0.0")
@@ -57,6 +61,7 @@ class AnimeDownloaderGUI:
         self.status_var = tk.StringVar(value="Listo para descargar")
         self.download_info_var = tk.StringVar(value="")
         self.enable_subtitles_var = tk.BooleanVar(value=False)
+        self.use_daemon_var = tk.BooleanVar(value=False)
         
     def setup_widgets(self):
         """Crear y configurar todos los widgets"""
@@ -111,6 +116,13 @@ class AnimeDownloaderGUI:
         
         ttk.Button(path_frame, text="Buscar", command=self.browse_folder).grid(row=0, column=1)
         
+        # Enviar la descarga al servicio de descargas (daemon.py) en lugar de hacerla aquí
+        ttk.Checkbutton(
+            config_frame,
+            text=f"Usar el servicio de descargas ({Config.DAEMON_URL})",
+            variable=self.use_daemon_var
+        ).grid(row=2, column=0, columnspan=3, sticky=tk.W, pady=(10, 0))
+        
         # === Información del Video ===
         info_frame = ttk.LabelFrame(main_frame, text="Información del Video", padding="10")
         info_frame.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -358,6 +370,12 @@ class AnimeDownloaderGUI:
             messagebox.showwarning("Advertencia", "Ya hay una descarga en progreso")
             return
             
+        # El servicio no descarga subtítulos
+        if self.use_daemon_var.get() and self.enable_subtitles_var.get():
+            messagebox.showwarning("Advertencia", "El servicio de descargas no descarga subtítulos: "
+                                   "desactiva una de las dos opciones")
+            return
+            
         # Configurar UI para descarga
         self.is_downloading = True
         self.download_button.configure(state=tk.DISABLED)
@@ -365,6 +383,10 @@ class AnimeDownloaderGUI:
         self.progress_var.set(0)
         self.status_var.set("Iniciando descarga...")
         
+        if self.use_daemon_var.get():
+            self.start_daemon_download(url)
+            return
+        
         # Crear downloader
         self.downloader = AnimeDownloader(
             output_path=self.output_path_var.get(),
@@ -405,6 +427,73 @@ class AnimeDownloaderGUI:
         self.download_thread = threading.Thread(target=download_worker, daemon=True)
         self.download_thread.start()
         
+    def start_daemon_download(self, url):
+        """
+        Encola la descarga en el servicio de descargas y sigue su progreso
+        
+        El servicio descarga con su propio destino y calidad: si no coinciden
+        con los elegidos en la interfaz, la descarga no se envía.
+        
+        Args:
+            url (str): URL del episodio
+        """
+        output_path = Path(self.output_path_var.get()).expanduser().resolve()
+        quality = self.quality_var.get()
+        
+        def daemon_worker():
+            run_id = None
+            success = False
+            error_msg = None
+            
+            try:
+                from daemon import find_daemon
+                client = find_daemon()
+                if client is None:
+                    raise RuntimeError(f"El servicio de descargas no responde en {Config.DAEMON_URL} "
+                                       "(arráncalo con python daemon.py)")
+                
+                status = client.status()
+                if Path(status['output_path']).resolve() != output_path or status['quality'] != quality:
+                    raise RuntimeError(f"El servicio descarga en {status['output_path']} con calidad "
+                                       f"{status['quality']}; elige ese destino y calidad o desmarca el servicio")
+                
+                self.daemon_client = client
+                self.root.after(0, lambda: self.log_message(
+                    f"Descarga enviada al servicio de descargas ({client.url}, {status['output_path']}, "
+                    f"{status['quality']})", "INFO"))
+                
+                since = status['last_event']
+                run = client.enqueue(urls=[url], episodes=[None])
+                run_id = self.daemon_run_id = run['run_id']
+                success = not run['queued']
+                
+                for event in client.follow(run_id, since):
+                    # Cancelada desde la interfaz: dejar de seguirla
+                    if self.daemon_run_id != run_id:
+                        return
+                    if event['type'] == 'progress':
+                        self.progress_callback(event)
+                    elif event['type'] == 'result':
+                        success, error_msg = event['success'], event['error']
+                    elif event['type'] == 'cancelled':
+                        error_msg = 'Cancelada'
+            except Exception as e:
+                error_msg = str(e)
+            
+            def update_gui():
+                if run_id is not None and self.daemon_run_id != run_id:
+                    return
+                self.daemon_run_id = None
+                if success:
+                    self.download_complete(True)
+                else:
+                    self.download_error(error_msg or "Error desconocido")
+                    
+            self.root.after(0, update_gui)
+        
+        self.download_thread = threading.Thread(target=daemon_worker, daemon=True)
+        self.download_thread.start()
+        
     def progress_callback(self, data):
         """Callback para actualizar progreso de descarga"""
         def update_ui():
@@ -470,6 +559,14 @@ class AnimeDownloaderGUI:
     def cancel_download(self):
         """Cancelar descarga en progreso"""
         if self.is_downloading:
+            # En el servicio se cancela si aún no empezó; si ya está descargando, termina allí
+            if self.daemon_run_id:
+                run_id, self.daemon_run_id = self.daemon_run_id, None
+                try:
+                    self.daemon_client.cancel(run_id=run_id)
+                except Exception as e:
+                    self.log_message(f"No se pudo cancelar en el servicio: {e}", "ERROR")
+            
             # Nota: yt-dlp no tiene cancelación directa, esto es más bien para la UI
             self.is_downloading = False
             self.download_button.configure(state=tk.NORMAL)
@@ -0,0 +1,371 @@
+"""
+Anime Downloader - Caché HTTP en disco para los extractores
+Respeta Cache-Control, revalida con ETag/Last-Modified y comprime en disco
+"""
+
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from config import Config
+
+# Headers que no tienen sentido al servir el cuerpo ya decodificado desde caché
+SKIPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+
+def parse_cache_control(value):
+    """
+    Parsea un header Cache-Control
+    
+    Args:
+        value (str): Valor del header
+    
+    Returns:
+        dict: Directivas en minúsculas (valor None si no tienen argumento)
+    """
+    directives = {}
+    for part in (value or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, arg = part.partition('=')
+        directives[name.strip().lower()] = arg.strip().strip('"') or None
+    return directives
+
+def _parse_http_date(value):
+    """Convierte una fecha HTTP a timestamp, o None si no es válida"""
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+def freshness_lifetime(headers, default_ttl=0):
+    """
+    Calcula cuántos segundos es fresca una respuesta
+    
+    Args:
+        headers (Mapping): Headers de la respuesta
+        default_ttl (int): Frescura si el servidor no indica nada
+    
+    Returns:
+        float: Segundos de frescura, o None si no debe guardarse (no-store)
+    """
+    directives = parse_cache_control(headers.get('Cache-Control'))
+    
+    if 'no-store' in directives:
+        return None
+    if 'no-cache' in directives:
+        return 0
+    
+    age = 0
+    try:
+        age = max(0, int(headers.get('Age', 0)))
+    except (TypeError, ValueError):
+        pass
+    
+    if 'max-age' in directives:
+        try:
+            return max(0, int(directives['max-age']) - age)
+        except (TypeError, ValueError):
+            return 0
+    
+    if 'Expires' in headers:
+        expires = _parse_http_date(headers.get('Expires'))
+        date = _parse_http_date(headers.get('Date')) or time.time()
+        return max(0, expires - date) if expires else 0
+    
+    return default_ttl
+
+class HTTPCache:
+    """Almacén de respuestas HTTP en SQLite con cuerpos comprimidos y desalojo LRU"""
+    
+    def __init__(self, cache_dir=None, max_size=None, default_ttl=None):
+        """
+        Inicializa la caché
+        
+        Args:
+            cache_dir (str): Directorio de la caché
+            max_size (int): Tamaño máximo en bytes (comprimidos)
+            default_ttl (int): Frescura para respuestas sin Cache-Control/Expires
+        """
+        self.cache_dir = Path(cache_dir or Config.HTTP_CACHE_DIR).expanduser()
+        self.max_size = max_size if max_size is not None else Config.HTTP_CACHE_MAX_SIZE
+        self.default_ttl = default_ttl if default_ttl is not None else Config.HTTP_CACHE_DEFAULT_TTL
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(self.cache_dir / 'http_cache.sqlite3'),
+            timeout=30,
+            check_same_thread=False
+        )
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_access ON entries (last_access)')
+        self._conn.commit()
+    
+    def get(self, url):
+        """
+        Obtiene una entrada de la caché
+        
+        Args:
+            url (str): URL de la petición
+        
+        Returns:
+            dict: Entrada con 'status', 'headers', 'body', 'etag', 'last_modified',
+                  'expires_at' y 'fresh', o None si no existe
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT status, headers, body, etag, last_modified, expires_at '
+                'FROM entries WHERE url = ?', (url,)
+            ).fetchone()
+            if not row:
+                return None
+            now = time.time()
+            self._conn.execute('UPDATE entries SET last_access = ? WHERE url = ?', (now, url))
+            self._conn.commit()
+        
+        status, headers, body, etag, last_modified, expires_at = row
+        return {
+            'url': url,
+            'status': status,
+            'headers': json.loads(headers),
+            'body': zlib.decompress(body),
+            'etag': etag,
+            'last_modified': last_modified,
+            'expires_at': expires_at,
+            'fresh': expires_at > now,
+        }
+    
+    def contains(self, url):
+        """Indica si hay una entrada (fresca o no) para la URL"""
+        with self._lock:
+            return self._conn.execute('SELECT 1 FROM entries WHERE url = ?', (url,)).fetchone() is not None
+    
+    def store(self, url, response, body=None):
+        """
+        Guarda una respuesta 200 si sus headers lo permiten
+        
+        Args:
+            url (str): URL de la petición
+            response (requests.Response): Respuesta ya leída
+            body (bytes): Cuerpo ya leído de una respuesta en streaming (default: response.content)
+        
+        Returns:
+            bool: True si se guardó
+        """
+        if response.status_code != 200:
+            return False
+        
+        lifetime = freshness_lifetime(response.headers, self.default_ttl)
+        if lifetime is None:
+            return False
+        
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in SKIPPED_HEADERS}
+        body = zlib.compress(response.content if body is None else body, 6)
+        now = time.time()
+        
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries '
+                '(url, status, headers, body, etag, last_modified, stored_at, expires_at, size, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, response.status_code, json.dumps(headers), body,
+                 response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                 now, now + lifetime, len(body), now)
+            )
+            self._conn.commit()
+            self._evict()
+        return True
+    
+    def refresh(self, url, response):
+        """
+        Actualiza una entrada tras una revalidación 304 Not Modified
+        
+        Args:
+            url (str): URL de la petición
+            response (requests.Response): Respuesta 304 del servidor
+        """
+        entry = self.get(url)
+        if not entry:
+            return
+        
+        headers = CaseInsensitiveDict(entry['headers'])
+        for key, value in response.headers.items():
+            if key.lower() not in SKIPPED_HEADERS:
+                headers[key] = value
+        
+        lifetime = freshness_lifetime(headers, self.default_ttl) or 0
+        now = time.time()
+        
+        with self._lock:
+            self._conn.execute(
+                'UPDATE entries SET headers = ?, etag = ?, last_modified = ?, '
+                'stored_at = ?, expires_at = ? WHERE url = ?',
+                (json.dumps(dict(headers)), headers.get('ETag'), headers.get('Last-Modified'),
+                 now, now + lifetime, url)
+            )
+            self._conn.commit()
+    
+    def delete(self, url):
+        """Elimina una entrada de la caché"""
+        with self._lock:
+            self._conn.execute('DELETE FROM entries WHERE url = ?', (url,))
+            self._conn.commit()
+    
+    def clear(self):
+        """Vacía la caché completa"""
+        with self._lock:
+            self._conn.execute('DELETE FROM entries')
+            self._conn.commit()
+            self._conn.execute('VACUUM')
+    
+    def total_size(self):
+        """Retorna el tamaño total (comprimido) de la caché en bytes"""
+        with self._lock:
+            return self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+    
+    def _evict(self):
+        """Desaloja las entradas usadas hace más tiempo hasta respetar el tamaño máximo"""
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_size:
+            return
+        
+        # Liberar un 10% extra para no desalojar en cada escritura
+        target = self.max_size * 0.9
+        evicted = []
+        for url, size in self._conn.execute('SELECT url, size FROM entries ORDER BY last_access'):
+            if total <= target:
+                break
+            evicted.append((url,))
+            total -= size
+        
+        self._conn.executemany('DELETE FROM entries WHERE url = ?', evicted)
+        self._conn.commit()
+        self.logger.debug(f"Caché HTTP: {len(evicted)} entrada(s) desalojadas")
+
+class CachedSession:
+    """Envuelve una requests.Session sirviendo los GET desde la caché HTTP"""
+    
+    def __init__(self, session, cache=None, offline=False):
+        """
+        Args:
+            session (requests.Session): Sesión real usada para la red
+            cache (HTTPCache): Caché a usar (por defecto la compartida)
+            offline (bool): Servir entradas caducadas sin tocar la red
+        """
+        self.session = session
+        self.cache = cache or get_default_cache()
+        self.offline = offline
+        self.logger = logging.getLogger(__name__)
+    
+    def __getattr__(self, name):
+        # headers, cookies, post, etc. se delegan a la sesión real
+        return getattr(self.session, name)
+    
+    def get(self, url, **kwargs):
+        """
+        GET con caché: respuestas frescas sin red, caducadas revalidadas con
+        If-None-Match/If-Modified-Since
+        
+        Args:
+            url (str): URL a descargar
+            **kwargs: Argumentos de requests.Session.get
+        
+        Returns:
+            requests.Response: Respuesta (con atributo from_cache)
+        """
+        if kwargs.get('params'):
+            url = requests.Request('GET', url, params=kwargs.pop('params')).prepare().url
+        
+        entry = self.cache.get(url)
+        
+        if entry and (entry['fresh'] or self.offline):
+            self.logger.debug(f"Caché HTTP (hit): {url}")
+            return self._build_response(entry)
+        
+        if self.offline:
+            raise requests.ConnectionError(f"Modo offline: {url} no está en caché")
+        
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        
+        try:
+            response = self.session.get(url, headers=headers, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if entry:
+                self.logger.warning(f"Error de red, sirviendo copia caducada de {url}: {e}")
+                return self._build_response(entry)
+            raise
+        
+        if response.status_code == 304 and entry:
+            self.logger.debug(f"Caché HTTP (304): {url}")
+            self.cache.refresh(url, response)
+            response.close()
+            return self._build_response(entry, revalidated=True)
+        
+        response.from_cache = False
+        response.revalidated = False
+        
+        # Las respuestas en streaming no se leen completas aquí
+        if not kwargs.get('stream'):
+            self.cache.store(url, response)
+        
+        return response
+    
+    def _build_response(self, entry, revalidated=False):
+        """Construye un requests.Response a partir de una entrada de caché"""
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.reason = 'OK'
+        response.url = entry['url']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = entry['body']
+        response._content_consumed = True
+        response.from_cache = True
+        response.revalidated = revalidated
+        return response
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache():
+    """
+    Retorna la caché HTTP compartida por todo el proceso
+    
+    Returns:
+        HTTPCache: Instancia compartida
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = HTTPCache()
+        return _default_cache
@@ -0,0 +1,287 @@
+"""
+Anime Downloader - Grabación y reproducción del transporte HTTP
+Graba las peticiones de los extractores en cassettes JSON y las reproduce
+sin red, con su latencia original o a máxima velocidad
+"""
+
+import io
+import sys
+import json
+import time
+import atexit
+import base64
+import logging
+import argparse
+import threading
+from pathlib import Path
+from functools import partial
+from collections import defaultdict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse
+
+from config import Config
+from http_cache import SKIPPED_HEADERS
+from transport import set_adapter_class
+
+CASSETTE_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+class Cassette:
+    """Secuencia de interacciones HTTP grabadas, guardada como JSON"""
+    
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Ruta del archivo del cassette
+        """
+        self.path = Path(path).expanduser()
+        self.interactions = []
+        self._cursors = defaultdict(int)
+        self._lock = threading.Lock()
+        self._dirty = False
+    
+    def load(self):
+        """
+        Carga las interacciones del archivo
+        
+        Returns:
+            Cassette: El propio cassette
+        """
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        
+        if data.get('version') != CASSETTE_VERSION:
+            raise ValueError(f"Versión de cassette no soportada: {data.get('version')}")
+        
+        self.interactions = data['interactions']
+        self._cursors.clear()
+        return self
+    
+    def save(self):
+        """Guarda el cassette si tiene interacciones nuevas"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({'version': CASSETTE_VERSION, 'interactions': self.interactions}, f, indent=1)
+            self._dirty = False
+        logger.info(f"💾 Cassette guardado: {self.path} ({len(self.interactions)} peticiones)")
+    
+    def record(self, request, response, body, elapsed):
+        """
+        Añade una interacción
+        
+        Args:
+            request (requests.PreparedRequest): Petición enviada
+            response (requests.Response): Respuesta recibida
+            body (bytes): Cuerpo ya decodificado de la respuesta
+            elapsed (float): Segundos desde el envío hasta leer el cuerpo completo
+        """
+        interaction = {
+            'method': request.method,
+            'url': request.url,
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': {k: v for k, v in response.headers.items() if k.lower() not in SKIPPED_HEADERS},
+            'body': base64.b64encode(body).decode('ascii'),
+            'elapsed': round(elapsed, 4),
+        }
+        with self._lock:
+            self.interactions.append(interaction)
+            self._dirty = True
+    
+    def next_for(self, method, url):
+        """
+        Retorna la siguiente interacción grabada para una petición
+        
+        Las peticiones repetidas reciben las respuestas en el orden en que se
+        grabaron; agotadas, se repite la última.
+        
+        Args:
+            method (str): Método HTTP
+            url (str): URL completa
+        
+        Returns:
+            dict: Interacción, o None si la petición no se grabó
+        """
+        with self._lock:
+            matches = [i for i in self.interactions if i['method'] == method and i['url'] == url]
+            if not matches:
+                return None
+            key = (method, url)
+            index = min(self._cursors[key], len(matches) - 1)
+            self._cursors[key] += 1
+            return matches[index]
+
+class RecordingAdapter(HTTPAdapter):
+    """Adaptador HTTP real que además graba cada interacción en un cassette"""
+    
+    def __init__(self, cassette, **kwargs):
+        self.cassette = cassette
+        super().__init__(**kwargs)
+    
+    def send(self, request, stream=False, **kwargs):
+        start = time.monotonic()
+        response = super().send(request, stream=stream, **kwargs)
+        # Se graba el cuerpo completo aunque el llamador lo lea en streaming
+        body = response.content
+        self.cassette.record(request, response, body, time.monotonic() - start)
+        return response
+
+class ReplayAdapter(HTTPAdapter):
+    """Adaptador que responde desde un cassette sin tocar la red"""
+    
+    def __init__(self, cassette, realtime=False, **kwargs):
+        self.cassette = cassette
+        self.realtime = realtime
+        super().__init__(**kwargs)
+    
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        interaction = self.cassette.next_for(request.method, request.url)
+        if interaction is None:
+            raise requests.ConnectionError(f"Petición no grabada en el cassette: {request.method} {request.url}", request=request)
+        
+        if self.realtime:
+            time.sleep(interaction['elapsed'])
+        
+        raw = HTTPResponse(
+            body=io.BytesIO(base64.b64decode(interaction['body'])),
+            headers=interaction['headers'],
+            status=interaction['status'],
+            reason=interaction['reason'],
+            preload_content=False,
+            decode_content=False,
+        )
+        return self.build_response(request, raw)
+
+def _isolate_caches():
+    """Desactiva las cachés que evitarían pasar por el transporte"""
+    Config.HTTP_CACHE_ENABLED = False
+    Config.STREAM_CACHE_ENABLED = False
+
+def start_recording(path):
+    """
+    Graba todo el tráfico de la sesión compartida en un cassette
+    
+    El cassette se guarda al llamar a stop() o al terminar el proceso. Las
+    cachés HTTP y de streams se desactivan para que todo pase por la red;
+    llamar antes de crear downloaders o extractores.
+    
+    Args:
+        path (str): Ruta del cassette
+    
+    Returns:
+        Cassette: Cassette en grabación
+    """
+    _isolate_caches()
+    cassette = Cassette(path)
+    set_adapter_class(partial(RecordingAdapter, cassette))
+    atexit.register(cassette.save)
+    logger.info(f"🔴 Grabando tráfico HTTP en {cassette.path}")
+    return cassette
+
+def start_replay(path, realtime=False):
+    """
+    Sirve las peticiones de la sesión compartida desde un cassette
+    
+    Args:
+        path (str): Ruta del cassette
+        realtime (bool): Reproducir con la latencia grabada en vez de a máxima velocidad
+    
+    Returns:
+        Cassette: Cassette cargado
+    """
+    _isolate_caches()
+    cassette = Cassette(path).load()
+    set_adapter_class(partial(ReplayAdapter, cassette, realtime))
+    logger.info(f"▶️  Reproduciendo {len(cassette.interactions)} peticiones de {cassette.path}")
+    return cassette
+
+def stop(cassette=None):
+    """
+    Restaura el transporte normal y guarda el cassette si se estaba grabando
+    
+    Args:
+        cassette (Cassette): Cassette a guardar (opcional)
+    """
+    set_adapter_class(None)
+    if cassette:
+        cassette.save()
+
+def benchmark(cassette_path, urls, rounds=1, realtime=False):
+    """
+    Mide la extracción de episodios reproduciendo un cassette
+    
+    Args:
+        cassette_path (str): Ruta del cassette
+        urls (list): URLs de episodios grabadas en el cassette
+        rounds (int): Repeticiones de cada URL
+        realtime (bool): Reproducir con la latencia grabada
+    
+    Returns:
+        list: Resultados por URL con 'url', 'seconds' (media), 'candidates' y 'title'
+    """
+    from extractors import find_extractor, get_extractor
+    
+    start_replay(cassette_path, realtime)
+    results = []
+    
+    try:
+        for url in urls:
+            name = find_extractor(url)
+            extractor = get_extractor(name) if name else None
+            if not extractor:
+                logger.error(f"Ningún extractor maneja {url}")
+                continue
+            
+            info, start = None, time.perf_counter()
+            for _ in range(rounds):
+                info = extractor.extract_video_info(url)
+            seconds = (time.perf_counter() - start) / rounds
+            
+            results.append({
+                'url': url,
+                'seconds': seconds,
+                'candidates': len(info['video_urls']) if info else 0,
+                'title': info['title'] if info else None,
+            })
+    finally:
+        stop()
+    
+    return results
+
+def main():
+    """Graba un cassette o mide la extracción reproduciéndolo"""
+    parser = argparse.ArgumentParser(description='Graba y reproduce el tráfico HTTP de los extractores')
+    parser.add_argument('mode', choices=['record', 'bench'], help='record: grabar desde la red; bench: medir sin red')
+    parser.add_argument('cassette', help='Archivo del cassette')
+    parser.add_argument('urls', nargs='+', help='URLs de episodios')
+    parser.add_argument('--rounds', type=int, default=5, help='Repeticiones por URL en bench (default: 5)')
+    parser.add_argument('--realtime', action='store_true', help='Reproducir con la latencia grabada')
+    args = parser.parse_args()
+    
+    from utils import setup_logging
+    setup_logging()
+    
+    if args.mode == 'record':
+        from extractors import find_extractor, get_extractor
+        cassette = start_recording(args.cassette)
+        for url in args.urls:
+            name = find_extractor(url)
+            if name and get_extractor(name):
+                info = get_extractor(name).extract_video_info(url)
+                print(f"{'✅' if info else '❌'} {url}")
+        stop(cassette)
+        return 0
+    
+    results = benchmark(args.cassette, args.urls, args.rounds, args.realtime)
+    for result in results:
+        print(f"{result['seconds'] * 1000:8.1f} ms  {result['candidates']:3d} candidatos  {result['url']}")
+    return 0 if len(results) == len(args.urls) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,587 @@
+"""
+Anime Downloader - Cola persistente de trabajos de descarga
+Guarda cada episodio como un trabajo en SQLite (WAL) con estado, intentos,
+prioridad y lease, para reanudar un lote exactamente donde se quedó
+"""
+
+import os
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+
+from config import Config
+
+# Estados de un trabajo
+PENDING = 'pending'
+EXTRACTING = 'extracting'
+DOWNLOADING = 'downloading'
+POSTPROCESSING = 'postprocessing'
+DONE = 'done'
+FAILED = 'failed'
+
+STATES = (PENDING, EXTRACTING, DOWNLOADING, POSTPROCESSING, DONE, FAILED)
+ACTIVE_STATES = (EXTRACTING, DOWNLOADING, POSTPROCESSING)
+
+# Orden de los trabajos de igual prioridad según la política del lote
+# (los trabajos sin tamaño o sin número de episodio van al final)
+ORDER_CLAUSES = {
+    'fifo': 'id',
+    'shortest': 'size IS NULL, size, id',
+    'longest': 'size IS NULL, size DESC, id',
+    'episode': 'episode IS NULL, episode, id',
+}
+
+def make_owner_id():
+    """
+    Identificador de un trabajador: host:pid:sufijo aleatorio
+    
+    Returns:
+        str: Identificador único del trabajador
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def _owner_is_dead(owner):
+    """True si el dueño de un lease es un proceso de este host que ya no existe"""
+    try:
+        host, pid, _ = owner.split(':', 2)
+        pid = int(pid)
+    except (AttributeError, ValueError):
+        return False
+    
+    if host != socket.gethostname():
+        return False
+    if pid == os.getpid():
+        return False
+    
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        return False
+    return False
+
+class JobQueue:
+    """Cola de trabajos de descarga persistente (SQLite)"""
+    
+    def __init__(self, db_path=None):
+        """
+        Args:
+            db_path (str): Ruta de la base de datos (default: Config.JOB_QUEUE_PATH)
+        
+        En almacenamiento de red (NFS, SMB) SQLite no puede usar WAL: ahí
+        Config.JOB_QUEUE_JOURNAL_MODE debe ser 'DELETE' (o usar queue_server).
+        """
+        self.db_path = Path(db_path or Config.JOB_QUEUE_PATH).expanduser()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute(f'PRAGMA journal_mode={Config.JOB_QUEUE_JOURNAL_MODE}')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL UNIQUE,
+                host TEXT,
+                episode INTEGER,
+                size INTEGER,
+                priority INTEGER NOT NULL DEFAULT 0,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                run_id TEXT,
+                lease_owner TEXT,
+                lease_expires REAL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                download_seconds REAL,
+                path TEXT,
+                last_error TEXT
+            )
+        ''')
+        
+        # Colas creadas antes de planificar por host, por tamaño, con historial de velocidad y con ruta
+        columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(jobs)')}
+        if 'host' not in columns:
+            self._conn.execute('ALTER TABLE jobs ADD COLUMN host TEXT')
+        if 'size' not in columns:
+            self._conn.execute('ALTER TABLE jobs ADD COLUMN size INTEGER')
+        if 'download_seconds' not in columns:
+            self._conn.execute('ALTER TABLE jobs ADD COLUMN download_seconds REAL')
+        if 'path' not in columns:
+            self._conn.execute('ALTER TABLE jobs ADD COLUMN path TEXT')
+        
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs (run_id, state, priority DESC, id)')
+        self._conn.commit()
+    
+    @property
+    def location(self):
+        """Ruta de la base de datos (para abrir la misma cola desde otro proceso)"""
+        return str(self.db_path)
+    
+    def enqueue(self, url, episode=None, priority=0, run_id=None, host=None):
+        """
+        Añade un trabajo, o lo asigna a la ejecución actual si ya existía
+        
+        Los trabajos ya completados no se tocan (el lote los salta); los
+        fallidos vuelven a estar pendientes porque se han pedido de nuevo.
+        
+        Args:
+            url (str): URL del episodio
+            episode (int): Número de episodio (opcional)
+            priority (int): Prioridad (mayor se descarga antes)
+            run_id (str): Ejecución que procesará el trabajo
+            host (str): Host con el que se planifica el trabajo (opcional)
+        
+        Returns:
+            dict: Trabajo tal como queda en la cola
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR IGNORE INTO jobs (url, host, episode, priority, run_id, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, host, episode, priority, run_id, now, now)
+            )
+            self._conn.execute(
+                "UPDATE jobs SET run_id = ?, host = COALESCE(?, host), priority = MAX(priority, ?), "
+                "episode = COALESCE(episode, ?), "
+                "attempts = CASE WHEN state = 'failed' THEN 0 ELSE attempts END, "
+                "state = CASE WHEN state = 'failed' THEN 'pending' ELSE state END, "
+                "updated_at = ? WHERE url = ? AND state != 'done'",
+                (run_id, host, priority, episode, now, url)
+            )
+            self._conn.commit()
+            row = self._conn.execute('SELECT * FROM jobs WHERE url = ?', (url,)).fetchone()
+        return dict(row)
+    
+    def recover(self):
+        """
+        Devuelve a la cola los trabajos con lease caducado o de procesos muertos
+        
+        Los trabajos que ya agotaron Config.JOB_MAX_ATTEMPTS pasan a fallidos
+        para no repetir indefinidamente un episodio que tumba al proceso.
+        
+        Returns:
+            int: Número de trabajos recuperados
+        """
+        now = time.time()
+        placeholders = ','.join('?' * len(ACTIVE_STATES))
+        
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT id, lease_owner, lease_expires, attempts FROM jobs WHERE state IN ({placeholders})',
+                ACTIVE_STATES
+            ).fetchall()
+            
+            recovered = 0
+            for row in rows:
+                if (row['lease_expires'] or 0) > now and not _owner_is_dead(row['lease_owner']):
+                    continue
+                
+                if row['attempts'] >= Config.JOB_MAX_ATTEMPTS:
+                    state, error = FAILED, f"Abandonado tras {row['attempts']} intento(s) interrumpido(s)"
+                else:
+                    state, error = PENDING, None
+                
+                self._conn.execute(
+                    'UPDATE jobs SET state = ?, lease_owner = NULL, lease_expires = NULL, '
+                    'last_error = COALESCE(?, last_error), updated_at = ? WHERE id = ?',
+                    (state, error, now, row['id'])
+                )
+                recovered += 1
+            
+            self._conn.commit()
+        
+        if recovered:
+            self.logger.info(f"♻️  {recovered} trabajo(s) interrumpido(s) devuelto(s) a la cola")
+        return recovered
+    
+    def lease(self, owner, run_id=None, host=None, order='fifo'):
+        """
+        Toma el siguiente trabajo pendiente de mayor prioridad
+        
+        Args:
+            owner (str): Identificador del trabajador (ver make_owner_id)
+            run_id (str): Limitar a los trabajos de una ejecución (None para cualquiera)
+            host (str): Limitar a los trabajos de un host (None para cualquiera)
+            order (str): Desempate entre trabajos de igual prioridad (ver ORDER_CLAUSES)
+        
+        Returns:
+            dict: Trabajo tomado (ya en estado 'extracting'), o None si no quedan
+        """
+        now = time.time()
+        query = "SELECT id FROM jobs WHERE state = 'pending'"
+        params = []
+        if run_id is not None:
+            query += ' AND run_id = ?'
+            params.append(run_id)
+        if host is not None:
+            query += " AND COALESCE(host, '') = ?"
+            params.append(host)
+        query += f' ORDER BY priority DESC, {ORDER_CLAUSES[order]} LIMIT 1'
+        
+        with self._lock:
+            # BEGIN IMMEDIATE: otro proceso no puede tomar el mismo trabajo a la vez
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute(query, params).fetchone()
+                if not row:
+                    self._conn.commit()
+                    return None
+                
+                self._conn.execute(
+                    "UPDATE jobs SET state = 'extracting', attempts = attempts + 1, lease_owner = ?, "
+                    "lease_expires = ?, started_at = ?, updated_at = ? WHERE id = ?",
+                    (owner, now + Config.JOB_LEASE_SECONDS, now, now, row['id'])
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            
+            return dict(self._conn.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone())
+    
+    def set_size(self, job_id, size):
+        """
+        Guarda el tamaño conocido de un episodio (para ordenar por tamaño)
+        
+        Args:
+            job_id (int): ID del trabajo
+            size (int): Tamaño en bytes
+        """
+        with self._lock:
+            self._conn.execute('UPDATE jobs SET size = ? WHERE id = ?', (size, job_id))
+            self._conn.commit()
+    
+    def set_state(self, job_id, state, owner):
+        """
+        Cambia la fase de un trabajo en curso y renueva su lease
+        
+        Args:
+            job_id (int): ID del trabajo
+            state (str): 'extracting', 'downloading' o 'postprocessing'
+            owner (str): Trabajador que tiene el lease
+        
+        Returns:
+            bool: False si el lease ya no pertenece a este trabajador
+        """
+        return self._update_leased(
+            job_id, owner,
+            'state = ?, lease_expires = ?',
+            (state, time.time() + Config.JOB_LEASE_SECONDS)
+        )
+    
+    def heartbeat(self, job_id, owner):
+        """Renueva el lease de un trabajo en curso"""
+        return self._update_leased(
+            job_id, owner,
+            'lease_expires = ?',
+            (time.time() + Config.JOB_LEASE_SECONDS,)
+        )
+    
+    def renew(self, owner):
+        """
+        Renueva los leases de todos los trabajos en curso de un trabajador
+        
+        Args:
+            owner (str): Identificador del trabajador
+        
+        Returns:
+            int: Número de trabajos renovados
+        """
+        placeholders = ','.join('?' * len(ACTIVE_STATES))
+        with self._lock:
+            cursor = self._conn.execute(
+                f'UPDATE jobs SET lease_expires = ? WHERE lease_owner = ? AND state IN ({placeholders})',
+                (time.time() + Config.JOB_LEASE_SECONDS, owner, *ACTIVE_STATES)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+    
+    def complete(self, job_id, owner, size=None, seconds=None, path=None):
+        """
+        Marca un trabajo como completado
+        
+        Args:
+            job_id (int): ID del trabajo
+            owner (str): Trabajador que tiene el lease
+            size (int): Bytes descargados (opcional, para el historial de velocidad)
+            seconds (float): Duración de la descarga (opcional)
+            path (str): Archivo descargado (opcional, para saber si sigue en disco)
+        """
+        return self._update_leased(
+            job_id, owner,
+            "state = 'done', lease_owner = NULL, lease_expires = NULL, finished_at = ?, last_error = NULL, "
+            "size = COALESCE(?, size), download_seconds = ?, path = COALESCE(?, path)",
+            (time.time(), size, seconds, path)
+        )
+    
+    def fail(self, job_id, owner, error):
+        """
+        Marca un trabajo como fallido
+        
+        Args:
+            job_id (int): ID del trabajo
+            owner (str): Trabajador que tiene el lease
+            error (str): Descripción del error
+        """
+        return self._update_leased(
+            job_id, owner,
+            "state = 'failed', lease_owner = NULL, lease_expires = NULL, finished_at = ?, last_error = ?",
+            (time.time(), str(error or 'Error desconocido')[:500])
+        )
+    
+    def release(self, owner):
+        """
+        Devuelve a la cola los trabajos de un trabajador sin contar el intento
+        (por ejemplo al cancelar con Ctrl-C)
+        
+        Args:
+            owner (str): Identificador del trabajador
+        
+        Returns:
+            int: Número de trabajos devueltos
+        """
+        placeholders = ','.join('?' * len(ACTIVE_STATES))
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET state = 'pending', attempts = MAX(attempts - 1, 0), lease_owner = NULL, "
+                f"lease_expires = NULL, updated_at = ? WHERE lease_owner = ? AND state IN ({placeholders})",
+                (time.time(), owner, *ACTIVE_STATES)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+    
+    def cancel(self, job_ids=None, run_id=None):
+        """
+        Cancela trabajos pendientes marcándolos como fallidos
+        
+        Los trabajos en curso no se interrumpen. Los cancelados se pueden
+        volver a poner en cola con retry_failed.
+        
+        Args:
+            job_ids (list): IDs de los trabajos a cancelar (opcional)
+            run_id (str): Cancelar los trabajos pendientes de una ejecución (opcional)
+        
+        Returns:
+            list: IDs de los trabajos cancelados
+        
+        Raises:
+            ValueError: Si no se indican trabajos ni ejecución
+        """
+        if not job_ids and run_id is None:
+            raise ValueError("Indica los trabajos o la ejecución a cancelar")
+        
+        where = "state = 'pending'"
+        params = []
+        if job_ids:
+            where += f" AND id IN ({','.join('?' * len(job_ids))})"
+            params.extend(job_ids)
+        if run_id is not None:
+            where += ' AND run_id = ?'
+            params.append(run_id)
+        
+        now = time.time()
+        with self._lock:
+            cancelled = [row[0] for row in self._conn.execute(f'SELECT id FROM jobs WHERE {where}', params)]
+            if cancelled:
+                self._conn.execute(
+                    f"UPDATE jobs SET state = 'failed', finished_at = ?, last_error = 'Cancelado', "
+                    f"updated_at = ? WHERE {where}",
+                    (now, now, *params)
+                )
+                self._conn.commit()
+        return cancelled
+    
+    def retry_failed(self, run_id=None):
+        """
+        Vuelve a poner en cola todos los trabajos fallidos
+        
+        Args:
+            run_id (str): Ejecución a la que asignarlos
+        
+        Returns:
+            int: Número de trabajos reencolados
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET state = 'pending', attempts = 0, run_id = ?, finished_at = NULL, "
+                "updated_at = ? WHERE state = 'failed'",
+                (run_id, time.time())
+            )
+            self._conn.commit()
+        return cursor.rowcount
+    
+    def requeue(self, urls, run_id=None):
+        """
+        Vuelve a poner en cola URLs aunque ya estén completadas
+        
+        Para episodios cuyo archivo resultó dañado: los trabajos en curso no
+        se tocan y las URLs que no estaban en la cola se añaden.
+        
+        Args:
+            urls (list): URLs a descargar de nuevo
+            run_id (str): Ejecución a la que asignarlas
+        
+        Returns:
+            int: Número de trabajos reencolados
+        """
+        now = time.time()
+        requeued = 0
+        with self._lock:
+            for url in urls:
+                self._conn.execute(
+                    'INSERT OR IGNORE INTO jobs (url, run_id, created_at, updated_at) VALUES (?, ?, ?, ?)',
+                    (url, run_id, now, now)
+                )
+                requeued += self._conn.execute(
+                    f"UPDATE jobs SET state = 'pending', attempts = 0, run_id = ?, finished_at = NULL, "
+                    f"updated_at = ? WHERE url = ? AND state NOT IN ({','.join('?' * len(ACTIVE_STATES))})",
+                    (run_id, now, url, *ACTIVE_STATES)
+                ).rowcount
+            self._conn.commit()
+        return requeued
+    
+    def jobs(self, run_id=None, state=None):
+        """
+        Lista trabajos
+        
+        Args:
+            run_id (str): Filtrar por ejecución (opcional)
+            state (str): Filtrar por estado (opcional)
+        
+        Returns:
+            list: Trabajos como dicts, en orden de prioridad y llegada
+        """
+        query = 'SELECT * FROM jobs WHERE 1 = 1'
+        params = []
+        if run_id is not None:
+            query += ' AND run_id = ?'
+            params.append(run_id)
+        if state is not None:
+            query += ' AND state = ?'
+            params.append(state)
+        query += ' ORDER BY priority DESC, id'
+        
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+    
+    def pending_hosts(self, run_id=None):
+        """
+        Número de trabajos pendientes por host
+        
+        Args:
+            run_id (str): Filtrar por ejecución (opcional)
+        
+        Returns:
+            dict: host -> trabajos pendientes ('' para trabajos sin host)
+        """
+        query = "SELECT COALESCE(host, ''), COUNT(*) FROM jobs WHERE state = 'pending'"
+        params = []
+        if run_id is not None:
+            query += ' AND run_id = ?'
+            params.append(run_id)
+        query += " GROUP BY COALESCE(host, '')"
+        
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return {host: count for host, count in rows}
+    
+    def active_bytes(self, exclude=None):
+        """
+        Tamaño conocido de los trabajos en curso (de todos los procesos)
+        
+        Args:
+            exclude (int): ID de un trabajo a no contar (opcional)
+        
+        Returns:
+            int: Bytes que ocuparán las descargas en curso
+        """
+        placeholders = ', '.join('?' for _ in ACTIVE_STATES)
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT COALESCE(SUM(size), 0) FROM jobs WHERE state IN ({placeholders}) AND id != ?',
+                (*ACTIVE_STATES, exclude if exclude is not None else -1)
+            ).fetchone()
+        return row[0]
+    
+    def active_count(self, run_id=None):
+        """
+        Número de trabajos en curso (de cualquier trabajador)
+        
+        Args:
+            run_id (str): Limitar a una ejecución (opcional)
+        
+        Returns:
+            int: Trabajos con lease activo
+        """
+        placeholders = ','.join('?' * len(ACTIVE_STATES))
+        query = f'SELECT COUNT(*) FROM jobs WHERE state IN ({placeholders})'
+        params = list(ACTIVE_STATES)
+        if run_id is not None:
+            query += ' AND run_id = ?'
+            params.append(run_id)
+        
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()[0]
+    
+    def host_throughput(self, since=None):
+        """
+        Velocidad histórica de cada host, según los trabajos completados
+        
+        Args:
+            since (float): Contar solo trabajos terminados desde este timestamp (opcional)
+        
+        Returns:
+            dict: host -> {'rate': bytes/s de una descarga, 'avg_size': bytes, 'samples': trabajos}
+        """
+        query = ("SELECT COALESCE(host, ''), SUM(size), SUM(download_seconds), COUNT(*) FROM jobs "
+                 "WHERE state = 'done' AND size > 0 AND download_seconds > 0")
+        params = []
+        if since is not None:
+            query += ' AND finished_at >= ?'
+            params.append(since)
+        query += " GROUP BY COALESCE(host, '')"
+        
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return {
+            host: {'rate': size / seconds, 'avg_size': size / count, 'samples': count}
+            for host, size, seconds, count in rows
+        }
+    
+    def counts(self):
+        """
+        Número de trabajos por estado
+        
+        Returns:
+            dict: estado -> número de trabajos (todos los estados presentes)
+        """
+        with self._lock:
+            rows = self._conn.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall()
+        counts = dict.fromkeys(STATES, 0)
+        counts.update({state: count for state, count in rows})
+        return counts
+    
+    def _update_leased(self, job_id, owner, assignments, params):
+        """Actualiza un trabajo solo si el lease sigue siendo de owner"""
+        with self._lock:
+            cursor = self._conn.execute(
+                f'UPDATE jobs SET {assignments}, updated_at = ? WHERE id = ? AND lease_owner = ?',
+                (*params, time.time(), job_id, owner)
+            )
+            self._conn.commit()
+        
+        if cursor.rowcount == 0:
+            self.logger.warning(f"El trabajo {job_id} ya no pertenece a este trabajador")
+            return False
+        return True
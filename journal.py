@@ -0,0 +1,100 @@
+"""
+Anime Downloader - Diario de resultados de los lotes
+Escribe el resultado de cada episodio como una línea JSON en cuanto termina,
+para seguir el lote en vivo (tail -f) y no perder nada si el proceso cae
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+
+from config import Config
+
+class ResultJournal:
+    """
+    Archivo JSONL con una línea por episodio terminado
+    
+    El archivo se abre en modo append con buffer de línea: cada resultado
+    llega al sistema operativo al escribirse y sobrevive a la caída del
+    proceso. Para sobrevivir también a un corte de luz se hace fsync cada
+    Config.JOURNAL_FSYNC_SECONDS y al terminar cada lote. Varios procesos
+    pueden compartir el mismo archivo: cada línea se escribe de una vez.
+    """
+    
+    def __init__(self, path, fsync_interval=None):
+        """
+        Args:
+            path (str): Ruta del archivo JSONL (se crea si no existe)
+            fsync_interval (float): Segundos entre fsync (default: Config.JOURNAL_FSYNC_SECONDS)
+        """
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fsync_interval = fsync_interval if fsync_interval is not None else Config.JOURNAL_FSYNC_SECONDS
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'a', encoding='utf-8', buffering=1)
+        self._last_sync = time.time()
+    
+    def write(self, entry):
+        """
+        Añade una línea al diario
+        
+        Args:
+            entry (dict): Datos serializables a JSON
+        """
+        line = json.dumps(entry, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            self._file.write(line)
+            if time.time() - self._last_sync >= self.fsync_interval:
+                self._sync()
+    
+    def sync(self):
+        """Fuerza a disco lo escrito hasta ahora"""
+        with self._lock:
+            self._sync()
+    
+    def close(self):
+        """Sincroniza y cierra el archivo"""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._sync()
+            self._file.close()
+    
+    def _sync(self):
+        try:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError as e:
+            self.logger.warning(f"No se pudo sincronizar el diario {self.path}: {e}")
+        self._last_sync = time.time()
+
+def record_entry(record, run_id=None):
+    """
+    Línea del diario para el resultado de un episodio
+    
+    Args:
+        record (JobRecord): Resultado del episodio
+        run_id (str): Ejecución del lote
+    
+    Returns:
+        dict: Entrada lista para ResultJournal.write
+    """
+    return {
+        'finished_at': time.time(),
+        'run_id': run_id,
+        'url': record.url,
+        'episode': record.episode,
+        'success': record.success,
+        'path': record.path,
+        'bytes': record.bytes,
+        'duration': round(record.duration, 3),
+        'attempts': record.attempts,
+        'mirror': record.mirror,
+        'throughput': round(record.bytes / record.duration) if record.bytes and record.duration else None,
+        'error': record.error,
+        'error_class': record.error_class,
+    }
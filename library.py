@@ -0,0 +1,832 @@
+#!/usr/bin/env python3
+"""
+Anime Downloader - Índice de la biblioteca
+Guarda en SQLite los videos descargados (ruta, tamaño, serie, episodio, URL
+de origen y hash) y lo mantiene al día sin recorrer todo el árbol: solo se
+vuelven a listar los directorios cuya fecha de modificación cambió
+"""
+
+import os
+import re
+import sys
+import glob
+import time
+import errno
+import select
+import struct
+import sqlite3
+import logging
+import argparse
+import threading
+import ctypes
+import ctypes.util
+from pathlib import Path
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from config import Config
+from journal import ResultJournal
+from utils import is_video_file, format_bytes, format_duration, generate_file_hash
+
+# Nombres de archivo con número de episodio ("Serie - Episodio 12", "Serie - 12", "Serie S01E12")
+EPISODE_PATTERNS = (
+    re.compile(r'^(?P<series>.+?)[\s._-]+(?:episodio|episode|cap[ií]tulo|ep)[\s._-]*(?P<episode>\d{1,4})(?!\d)', re.IGNORECASE),
+    re.compile(r'^(?P<series>.+?)\s+-\s+(?P<episode>\d{1,4})(?!\d)'),
+    re.compile(r'^(?P<series>.+?)[\s._-]+S\d{1,2}E(?P<episode>\d{1,4})(?!\d)', re.IGNORECASE),
+)
+
+# Eventos de inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct('iIII')
+
+# Algoritmo de un hash guardado según su longitud en hexadecimal
+HASH_ALGORITHMS = {32: 'md5', 40: 'sha1', 64: 'sha256', 128: 'sha512'}
+
+# Resultados de la verificación que indican un archivo dañado, y cuáles se pueden volver a descargar
+DAMAGED_STATES = ('missing', 'truncated', 'size_mismatch', 'corrupt', 'unreadable')
+REDOWNLOAD_STATES = ('truncated', 'size_mismatch', 'corrupt', 'unreadable')
+
+logger = logging.getLogger(__name__)
+
+def parse_episode_filename(name):
+    """
+    Serie y número de episodio a partir del nombre de un archivo
+    
+    Args:
+        name (str): Nombre del archivo (con o sin extensión)
+    
+    Returns:
+        tuple: (serie, episodio); (None, None) si el nombre no sigue ningún patrón conocido
+    """
+    stem = Path(name).stem
+    for pattern in EPISODE_PATTERNS:
+        match = pattern.match(stem)
+        if match:
+            series = re.sub(r'[._]+', ' ', match.group('series')).strip(' -')
+            return series or None, int(match.group('episode'))
+    return None, None
+
+def resolve_output_path(path):
+    """
+    Archivo final de una descarga a partir del que avisó yt-dlp
+    
+    yt-dlp avisa 'finished' por cada pista ("Serie.f137.mp4") antes de unirlas
+    en el archivo final ("Serie.mp4" o "Serie.mkv"), que es el que queda en disco.
+    
+    Args:
+        path (str): Archivo del último aviso 'finished'
+    
+    Returns:
+        str: Archivo final si se encuentra; si no, la ruta recibida
+    """
+    if not path or os.path.exists(path):
+        return path
+    
+    base = re.sub(r'\.f[\w-]+$', '', os.path.splitext(path)[0])
+    for candidate in sorted(Path(base).parent.glob(glob.escape(Path(base).name) + '.*')):
+        if is_video_file(candidate.name):
+            return str(candidate)
+    return path
+
+class LibraryIndex:
+    """
+    Índice persistente de la biblioteca de videos (SQLite)
+    
+    Cada directorio se guarda con su fecha de modificación: un escaneo solo
+    vuelve a listar los directorios que cambiaron (se añadió, borró o
+    renombró algo dentro) y del resto solo consulta sus subdirectorios
+    conocidos. Un archivo reescrito en el sitio no cambia su directorio;
+    eso lo detecta el modo watch (inotify) o un escaneo completo (full=True).
+    """
+    
+    def __init__(self, db_path=None):
+        """
+        Args:
+            db_path (str): Ruta de la base de datos (default: Config.LIBRARY_DB_PATH)
+        """
+        self.db_path = Path(db_path or Config.LIBRARY_DB_PATH).expanduser()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                dir TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                series TEXT,
+                episode INTEGER,
+                source_url TEXT,
+                hash TEXT,
+                indexed_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY,
+                parent TEXT,
+                mtime_ns INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_files_dir ON files (dir);
+            CREATE INDEX IF NOT EXISTS idx_files_series ON files (series COLLATE NOCASE, episode);
+            CREATE INDEX IF NOT EXISTS idx_dirs_parent ON dirs (parent);
+            CREATE TABLE IF NOT EXISTS verify_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                root TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                finished_at REAL
+            );
+        ''')
+        
+        # Índices creados antes de la verificación con checkpoint
+        columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(files)')}
+        if 'verified_at' not in columns:
+            self._conn.execute('ALTER TABLE files ADD COLUMN verified_at REAL')
+        self._conn.commit()
+    
+    def scan(self, root, full=False, force_root=False):
+        """
+        Pone al día el índice de un árbol de directorios
+        
+        Args:
+            root (str): Directorio raíz
+            full (bool): Volver a listar todos los directorios aunque no hayan cambiado
+            force_root (bool): Volver a listar al menos el directorio raíz (cambios avisados por inotify)
+        
+        Returns:
+            dict: Directorios visitados y relistados, archivos añadidos, actualizados y eliminados
+        """
+        root = Path(root).expanduser().resolve()
+        stats = dict.fromkeys(('dirs', 'rescanned', 'added', 'updated', 'removed'), 0)
+        
+        stack = [str(root)]
+        while stack:
+            directory = stack.pop()
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except FileNotFoundError:
+                stats['removed'] += self._forget_tree(directory)
+                continue
+            except OSError as e:
+                self.logger.warning(f"No se pudo leer {directory}: {e}")
+                continue
+            
+            stats['dirs'] += 1
+            with self._lock:
+                row = self._conn.execute('SELECT mtime_ns FROM dirs WHERE path = ?', (directory,)).fetchone()
+            
+            if row and row['mtime_ns'] == mtime_ns and not full and not (force_root and directory == str(root)):
+                with self._lock:
+                    stack.extend(r['path'] for r in self._conn.execute('SELECT path FROM dirs WHERE parent = ?', (directory,)))
+                continue
+            
+            stats['rescanned'] += 1
+            stack.extend(self._rescan_dir(directory, mtime_ns, stats))
+        
+        return stats
+    
+    def add_file(self, path, source_url=None, series=None, episode=None):
+        """
+        Añade o actualiza un archivo recién descargado
+        
+        La serie y el episodio se toman del nombre del archivo cuando sigue un
+        patrón conocido; si no, se usan los indicados.
+        
+        Args:
+            path (str): Ruta del archivo
+            source_url (str): URL de la que se descargó (opcional)
+            series (str): Serie (opcional)
+            episode (int): Número de episodio (opcional)
+        
+        Returns:
+            bool: False si el archivo no existe
+        """
+        path = Path(path).expanduser().resolve()
+        try:
+            stat = path.stat()
+        except OSError:
+            return False
+        
+        parsed_series, parsed_episode = parse_episode_filename(path.name)
+        with self._lock:
+            self._upsert(
+                str(path), str(path.parent), stat,
+                parsed_series or series, parsed_episode if parsed_episode is not None else episode, source_url
+            )
+            self._conn.commit()
+        return True
+    
+    def set_hash(self, path, file_hash):
+        """Guarda el hash de un archivo indexado"""
+        with self._lock:
+            self._conn.execute('UPDATE files SET hash = ? WHERE path = ?', (file_hash, str(path)))
+            self._conn.commit()
+    
+    def verify(self, root=None, resume=False, processes=None, readers_per_device=None,
+               report_path=None, queue=None):
+        """
+        Comprueba los archivos indexados contra su tamaño y hash guardados
+        
+        Los hashes se calculan en un pool de procesos con lecturas secuenciales
+        grandes, y de cada disco (st_dev) solo se leen readers_per_device
+        archivos a la vez para no convertir la lectura en accesos aleatorios.
+        Cada archivo comprobado se marca en el índice al momento: una
+        verificación interrumpida continúa con resume=True donde se quedó.
+        Los archivos sin hash guardado se registran con el calculado.
+        
+        Args:
+            root (str): Solo archivos bajo este directorio (default: todo el índice)
+            resume (bool): Continuar la última verificación sin terminar de este directorio
+            processes (int): Procesos de hash (default: Config.VERIFY_PROCESSES o uno por CPU)
+            readers_per_device (int): Lecturas simultáneas por disco (default: Config.VERIFY_READERS_PER_DEVICE)
+            report_path (str): Informe JSONL de archivos dañados (default: Config.VERIFY_REPORT_PATH)
+            queue (JobQueue): Cola en la que volver a descargar los archivos dañados (opcional)
+        
+        Returns:
+            dict: Resumen con 'run_id', 'total', 'checked', 'bytes', 'seconds', 'states'
+                  (resultado -> archivos), 'requeued' y 'report'
+        """
+        root = str(Path(root).expanduser().resolve()) if root else ''
+        processes = processes or Config.VERIFY_PROCESSES or os.cpu_count() or 1
+        readers_per_device = readers_per_device or Config.VERIFY_READERS_PER_DEVICE
+        run_id, started_at, resumed = self._verify_run(root, resume)
+        
+        query = 'SELECT path, dir, size, hash, series, episode, source_url FROM files WHERE verified_at IS NULL OR verified_at < ?'
+        params = [started_at]
+        if root:
+            clause, prefix_params = self._under(Path(root), 'dir')
+            query += f' AND {clause}'
+            params.extend(prefix_params)
+        with self._lock:
+            rows = self._conn.execute(query + ' ORDER BY path', params).fetchall()
+        
+        # Archivos pendientes agrupados por disco, en orden de ruta
+        devices = {}
+        pending = defaultdict(deque)
+        for row in rows:
+            if row['dir'] not in devices:
+                try:
+                    devices[row['dir']] = os.stat(row['dir']).st_dev
+                except OSError:
+                    devices[row['dir']] = None
+            pending[devices[row['dir']]].append(row)
+        
+        summary = {'run_id': run_id, 'total': len(rows), 'checked': 0, 'bytes': 0, 'states': Counter(),
+                   'requeued': 0, 'report': None}
+        if rows:
+            self.logger.info(f"🔍 Verificando {len(rows)} archivo(s) en {len(pending)} disco(s) con {processes} proceso(s)"
+                             + (f" (continuación de la verificación {run_id})" if resumed else ""))
+        
+        journal = ResultJournal(report_path or Config.VERIFY_REPORT_PATH)
+        summary['report'] = str(journal.path)
+        start = last_log = time.time()
+        reading = Counter()
+        futures = {}
+        pool = ProcessPoolExecutor(max_workers=processes)
+        try:
+            while pending or futures:
+                for device in list(pending):
+                    files = pending[device]
+                    while files and reading[device] < readers_per_device and len(futures) < processes:
+                        row = files.popleft()
+                        future = pool.submit(check_file, row['path'], row['size'], row['hash'])
+                        futures[future] = (device, row)
+                        reading[device] += 1
+                    if not files:
+                        del pending[device]
+                
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    device, row = futures.pop(future)
+                    reading[device] -= 1
+                    self._record_verification(run_id, row, future.result(), summary, journal, queue)
+                
+                if time.time() - last_log >= 10:
+                    last_log = time.time()
+                    speed = summary['bytes'] / (last_log - start)
+                    self.logger.info(f"🔍 {summary['checked']}/{summary['total']} archivo(s), "
+                                     f"{format_bytes(summary['bytes'])} leídos ({format_bytes(speed)}/s)")
+        finally:
+            # Lecturas aún sin empezar (cancel_futures requiere Python 3.9)
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=True)
+            journal.close()
+        
+        with self._lock:
+            self._conn.execute('UPDATE verify_runs SET finished_at = ? WHERE id = ?', (time.time(), run_id))
+            self._conn.commit()
+        summary['seconds'] = time.time() - start
+        return summary
+    
+    def _verify_run(self, root, resume):
+        """
+        Verificación a continuar, o una nueva
+        
+        Returns:
+            tuple: (id de la verificación, momento de inicio, si es una continuación)
+        """
+        with self._lock:
+            if resume:
+                row = self._conn.execute(
+                    'SELECT id, started_at FROM verify_runs WHERE root = ? AND finished_at IS NULL '
+                    'ORDER BY id DESC LIMIT 1', (root,)
+                ).fetchone()
+                if row:
+                    return row['id'], row['started_at'], True
+                self.logger.info("No hay ninguna verificación sin terminar, se empieza una nueva")
+            
+            started_at = time.time()
+            cursor = self._conn.execute('INSERT INTO verify_runs (root, started_at) VALUES (?, ?)', (root, started_at))
+            self._conn.commit()
+        return cursor.lastrowid, started_at, False
+    
+    def _record_verification(self, run_id, row, result, summary, journal, queue):
+        """Guarda el resultado de un archivo: checkpoint, hash nuevo, informe y reencolado"""
+        state = result['state']
+        summary['checked'] += 1
+        summary['bytes'] += result.get('bytes', 0)
+        summary['states'][state] += 1
+        
+        with self._lock:
+            self._conn.execute(
+                'UPDATE files SET verified_at = ?, hash = COALESCE(?, hash) WHERE path = ?',
+                (time.time(), result['hash'] if state == 'hashed' else None, row['path'])
+            )
+            self._conn.commit()
+        
+        if state not in DAMAGED_STATES:
+            return
+        
+        self.logger.warning(f"❌ {row['path']}: {state}" + (f" ({result['error']})" if result.get('error') else ""))
+        requeued = False
+        if queue is not None and state in REDOWNLOAD_STATES and row['source_url']:
+            requeued = self._requeue(row, queue)
+            summary['requeued'] += requeued
+        
+        journal.write({
+            'checked_at': time.time(),
+            'run_id': run_id,
+            'path': row['path'],
+            'state': state,
+            'series': row['series'],
+            'episode': row['episode'],
+            'source_url': row['source_url'],
+            'expected_size': row['size'],
+            'size': result.get('size'),
+            'expected_hash': row['hash'],
+            'hash': result.get('hash'),
+            'error': result.get('error'),
+            'requeued': requeued,
+        })
+    
+    def _requeue(self, row, queue):
+        """
+        Vuelve a poner en cola la descarga de un archivo dañado
+        
+        El archivo se renombra a .corrupt (y sale del índice) para que la
+        descarga no lo dé por bueno; se borra a mano cuando el episodio nuevo
+        esté descargado. Solo se hace si la cola aceptó el episodio: si no,
+        el archivo sigue indexado y se puede volver a intentar.
+        """
+        try:
+            if not queue.requeue([row['source_url']]):
+                return False
+            if os.path.exists(row['path']):
+                os.replace(row['path'], row['path'] + '.corrupt')
+            with self._lock:
+                self._conn.execute('DELETE FROM files WHERE path = ?', (row['path'],))
+                self._conn.commit()
+            return True
+        except Exception as e:
+            self.logger.warning(f"No se pudo reencolar {row['source_url']}: {e}")
+            return False
+    
+    def find(self, series=None, episode=None, root=None):
+        """
+        Busca archivos en el índice
+        
+        Args:
+            series (str): Texto contenido en el nombre de la serie (sin distinguir mayúsculas)
+            episode (int): Número de episodio
+            root (str): Solo archivos bajo este directorio
+        
+        Returns:
+            list: Archivos como dicts, por serie y episodio
+        """
+        query = 'SELECT * FROM files WHERE 1 = 1'
+        params = []
+        if series:
+            query += ' AND instr(lower(series), lower(?)) > 0'
+            params.append(series)
+        if episode is not None:
+            query += ' AND episode = ?'
+            params.append(episode)
+        if root is not None:
+            clause, prefix_params = self._under(Path(root).expanduser().resolve(), 'dir')
+            query += f' AND {clause}'
+            params.extend(prefix_params)
+        query += ' ORDER BY series COLLATE NOCASE, episode, path'
+        
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+    
+    def video_files(self, directory):
+        """
+        Videos indexados bajo un directorio (sin tocar el disco)
+        
+        Args:
+            directory (str): Directorio
+        
+        Returns:
+            list: Rutas (Path) ordenadas
+        """
+        return [Path(row['path']) for row in sorted(self.find(root=directory), key=lambda row: row['path'])]
+    
+    def series(self):
+        """
+        Series del índice
+        
+        Returns:
+            list: Dicts con 'series', 'files', 'episodes' (menor y mayor) y 'size'
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT series, COUNT(*) AS files, MIN(episode) AS first_episode, MAX(episode) AS last_episode, '
+                'SUM(size) AS size FROM files GROUP BY series COLLATE NOCASE ORDER BY series COLLATE NOCASE'
+            ).fetchall()
+        return [dict(row) for row in rows]
+    
+    def watch(self, root, stop_event=None):
+        """
+        Mantiene el índice al día hasta que se active stop_event
+        
+        Con inotify (Linux) se relistan solo los directorios de los que llegan
+        avisos; sin él (u otros sistemas) se escanea cada
+        Config.LIBRARY_SCAN_INTERVAL segundos. inotify solo ve los cambios
+        hechos desde esta máquina: en un NAS compartido conviene ejecutar el
+        watch en el propio NAS o usar el escaneo periódico.
+        
+        Args:
+            root (str): Directorio raíz
+            stop_event (threading.Event): Evento para dejar de vigilar
+        """
+        root = Path(root).expanduser().resolve()
+        stop_event = stop_event or threading.Event()
+        stats = self.scan(root)
+        self.logger.info(f"📚 Biblioteca al día: {stats['dirs']} directorio(s), {stats['added']} nuevo(s)")
+        
+        try:
+            watcher = InotifyWatcher()
+        except OSError as e:
+            self.logger.info(f"inotify no disponible ({e}), escaneo cada {Config.LIBRARY_SCAN_INTERVAL}s")
+            while not stop_event.wait(Config.LIBRARY_SCAN_INTERVAL):
+                self._log_changes(self.scan(root))
+            return
+        
+        try:
+            self._watch_tree(watcher, root)
+            while not stop_event.is_set():
+                changed = watcher.read(timeout=1)
+                if not changed:
+                    continue
+                
+                # Agrupar los avisos de una ráfaga (copias, descargas que terminan)
+                time.sleep(Config.LIBRARY_WATCH_DEBOUNCE)
+                changed |= watcher.read(timeout=0)
+                
+                if None in changed:
+                    self.logger.warning("Demasiados cambios a la vez, se escanea toda la biblioteca")
+                    changed = {str(root)}
+                for directory in sorted(changed):
+                    self._log_changes(self.scan(directory, force_root=True))
+                self._watch_tree(watcher, root)
+        finally:
+            watcher.close()
+    
+    def _watch_tree(self, watcher, root):
+        """Añade un watch a los directorios indexados que aún no lo tienen"""
+        clause, params = self._under(root, 'path')
+        with self._lock:
+            directories = [row['path'] for row in self._conn.execute(f'SELECT path FROM dirs WHERE {clause}', params)]
+        for directory in directories:
+            watcher.add(directory)
+    
+    def _log_changes(self, stats):
+        if stats['added'] or stats['updated'] or stats['removed']:
+            self.logger.info(f"📚 Biblioteca: {stats['added']} nuevo(s), {stats['updated']} actualizado(s), "
+                             f"{stats['removed']} eliminado(s)")
+    
+    def _rescan_dir(self, directory, mtime_ns, stats):
+        """
+        Vuelve a listar un directorio y sincroniza sus archivos en el índice
+        
+        Returns:
+            list: Subdirectorios a visitar
+        """
+        try:
+            entries = list(os.scandir(directory))
+        except OSError as e:
+            self.logger.warning(f"No se pudo listar {directory}: {e}")
+            return []
+        
+        subdirs = []
+        files = {}
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_file() and is_video_file(entry.name):
+                    files[entry.path] = entry.stat()
+            except OSError:
+                continue
+        
+        with self._lock:
+            known = {row['path']: row for row in self._conn.execute(
+                'SELECT path, size, mtime_ns FROM files WHERE dir = ?', (directory,))}
+            known_dirs = {row['path'] for row in self._conn.execute(
+                'SELECT path FROM dirs WHERE parent = ?', (directory,))}
+            
+            for path, stat in files.items():
+                row = known.get(path)
+                if row and row['size'] == stat.st_size and row['mtime_ns'] == stat.st_mtime_ns:
+                    continue
+                series, episode = parse_episode_filename(os.path.basename(path))
+                self._upsert(path, directory, stat, series, episode)
+                stats['updated' if row else 'added'] += 1
+            
+            gone = [path for path in known if path not in files]
+            self._conn.executemany('DELETE FROM files WHERE path = ?', [(path,) for path in gone])
+            stats['removed'] += len(gone)
+            
+            self._conn.execute(
+                'INSERT INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?) '
+                'ON CONFLICT(path) DO UPDATE SET mtime_ns = excluded.mtime_ns',
+                (directory, os.path.dirname(directory), mtime_ns)
+            )
+            self._conn.commit()
+        
+        for missing in known_dirs - set(subdirs):
+            stats['removed'] += self._forget_tree(missing)
+        return subdirs
+    
+    def _upsert(self, path, directory, stat, series, episode, source_url=None):
+        """Inserta o actualiza un archivo (con el lock tomado); el hash se descarta si cambió"""
+        self._conn.execute(
+            'INSERT INTO files (path, dir, size, mtime_ns, series, episode, source_url, indexed_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(path) DO UPDATE SET '
+            'hash = CASE WHEN size = excluded.size AND mtime_ns = excluded.mtime_ns THEN hash END, '
+            'verified_at = CASE WHEN size = excluded.size AND mtime_ns = excluded.mtime_ns THEN verified_at END, '
+            'size = excluded.size, mtime_ns = excluded.mtime_ns, '
+            'series = COALESCE(excluded.series, series), episode = COALESCE(excluded.episode, episode), '
+            'source_url = COALESCE(excluded.source_url, source_url), indexed_at = excluded.indexed_at',
+            (path, directory, stat.st_size, stat.st_mtime_ns, series, episode, source_url, time.time())
+        )
+    
+    def _forget_tree(self, directory):
+        """
+        Elimina del índice un directorio que ya no existe y todo lo que tenía debajo
+        
+        Returns:
+            int: Archivos eliminados
+        """
+        clause, params = self._under(Path(directory), 'dir')
+        dir_clause, dir_params = self._under(Path(directory), 'path')
+        with self._lock:
+            cursor = self._conn.execute(f'DELETE FROM files WHERE {clause}', params)
+            self._conn.execute(f'DELETE FROM dirs WHERE {dir_clause}', dir_params)
+            self._conn.commit()
+        return cursor.rowcount
+    
+    @staticmethod
+    def _under(directory, column):
+        """Condición SQL: la columna es el directorio o está debajo (sin LIKE, las rutas pueden tener % o _)"""
+        prefix = os.path.join(str(directory), '')
+        return f'({column} = ? OR substr({column}, 1, ?) = ?)', [str(directory), len(prefix), prefix]
+
+def check_file(path, size, stored_hash=None):
+    """
+    Comprueba un archivo contra su tamaño y hash indexados (en un proceso del pool)
+    
+    Si el tamaño ya no coincide no se lee el archivo. Sin hash guardado se
+    calcula con Config.LIBRARY_HASH_ALGORITHM para registrarlo.
+    
+    Args:
+        path (str): Ruta del archivo
+        size (int): Tamaño indexado
+        stored_hash (str): Hash guardado en hexadecimal (opcional)
+    
+    Returns:
+        dict: 'state' ('ok', 'hashed' o uno de DAMAGED_STATES), 'size', 'hash', 'bytes' leídos y 'error'
+    """
+    try:
+        actual_size = os.stat(path).st_size
+    except FileNotFoundError:
+        return {'state': 'missing', 'size': None, 'hash': None}
+    except OSError as e:
+        return {'state': 'unreadable', 'size': None, 'hash': None, 'error': str(e)}
+    
+    if actual_size != size:
+        state = 'truncated' if actual_size < size else 'size_mismatch'
+        return {'state': state, 'size': actual_size, 'hash': None}
+    
+    algorithm = HASH_ALGORITHMS.get(len(stored_hash), Config.LIBRARY_HASH_ALGORITHM) if stored_hash else Config.LIBRARY_HASH_ALGORITHM
+    file_hash = generate_file_hash(path, algorithm)
+    if file_hash is None:
+        return {'state': 'unreadable', 'size': actual_size, 'hash': None, 'error': 'Error de lectura'}
+    
+    if not stored_hash:
+        state = 'hashed'
+    else:
+        state = 'ok' if file_hash == stored_hash.lower() else 'corrupt'
+    return {'state': state, 'size': actual_size, 'hash': file_hash, 'bytes': actual_size}
+
+class InotifyWatcher:
+    """Avisos de cambios en directorios con inotify (Linux), sin dependencias externas"""
+    
+    def __init__(self):
+        """
+        Raises:
+            OSError: Si inotify no está disponible en este sistema
+        """
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS, 'inotify solo existe en Linux')
+        
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+        self.paths = {}
+        self._watched = set()
+        self._limit_warned = False
+    
+    def add(self, directory):
+        """
+        Vigila un directorio (no recursivo)
+        
+        Returns:
+            bool: False si no se pudo (ej. límite de watches del sistema)
+        """
+        if directory in self._watched:
+            return True
+        
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            code = ctypes.get_errno()
+            if code == errno.ENOSPC and not self._limit_warned:
+                logger.warning("Límite de watches de inotify alcanzado; súbelo con "
+                               "sysctl fs.inotify.max_user_watches")
+                self._limit_warned = True
+            return False
+        
+        self.paths[wd] = directory
+        self._watched.add(directory)
+        return True
+    
+    def read(self, timeout=None):
+        """
+        Directorios con cambios avisados
+        
+        Args:
+            timeout (float): Segundos máximos de espera (0 para no esperar)
+        
+        Returns:
+            set: Directorios con cambios (incluye None si se perdieron avisos)
+        """
+        changed = set()
+        while select.select([self.fd], [], [], timeout)[0]:
+            data = os.read(self.fd, 64 * 1024)
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size + length
+                
+                if mask & IN_Q_OVERFLOW:
+                    changed.add(None)
+                    continue
+                
+                directory = self.paths.get(wd)
+                if mask & IN_IGNORED:
+                    self._watched.discard(self.paths.pop(wd, None))
+                    continue
+                if directory is None:
+                    continue
+                # Al borrarse el directorio hay que relistar su padre
+                changed.add(os.path.dirname(directory) if mask & IN_DELETE_SELF else directory)
+            timeout = 0
+        return changed
+    
+    def close(self):
+        os.close(self.fd)
+
+def main():
+    """Escanea, vigila o consulta el índice de la biblioteca"""
+    parser = argparse.ArgumentParser(
+        description='Índice de la biblioteca de episodios descargados',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos de uso:
+  python library.py --scan ~/Anime              # Poner al día el índice (solo lo que cambió)
+  python library.py --watch ~/Anime             # Mantenerlo al día (inotify o escaneo periódico)
+  python library.py --series dandadan           # Episodios de una serie
+  python library.py --series dandadan --episode 12
+  python library.py --list-series
+  python library.py --verify                    # Comprobar tamaños y hashes de toda la biblioteca
+  python library.py --verify ~/Anime --resume   # Continuar una verificación interrumpida
+  python library.py --verify --requeue          # Volver a descargar los archivos dañados
+        """
+    )
+    parser.add_argument('--db', default=Config.LIBRARY_DB_PATH, help=f'Base de datos del índice (default: {Config.LIBRARY_DB_PATH})')
+    parser.add_argument('--scan', metavar='DIR', help='Poner al día el índice de un directorio')
+    parser.add_argument('--full', action='store_true', help='Con --scan, volver a listar todos los directorios')
+    parser.add_argument('--watch', metavar='DIR', help='Mantener al día el índice de un directorio hasta Ctrl-C')
+    parser.add_argument('--series', help='Buscar episodios de una serie (texto contenido en el nombre)')
+    parser.add_argument('--episode', type=int, help='Buscar un número de episodio')
+    parser.add_argument('--list-series', action='store_true', help='Listar las series indexadas')
+    parser.add_argument('--verify', nargs='?', const='', metavar='DIR',
+                        help='Comprobar los archivos indexados (o solo los de DIR) contra su tamaño y hash')
+    parser.add_argument('--resume', action='store_true', help='Con --verify, continuar la última verificación sin terminar')
+    parser.add_argument('--processes', type=int, default=Config.VERIFY_PROCESSES,
+                        help='Con --verify, procesos que calculan hashes (default: uno por CPU)')
+    parser.add_argument('--readers-per-device', type=int, default=Config.VERIFY_READERS_PER_DEVICE,
+                        help=f'Con --verify, archivos leídos a la vez por disco (default: {Config.VERIFY_READERS_PER_DEVICE})')
+    parser.add_argument('--report', default=Config.VERIFY_REPORT_PATH,
+                        help=f'Con --verify, informe JSONL de archivos dañados (default: {Config.VERIFY_REPORT_PATH})')
+    parser.add_argument('--requeue', action='store_true',
+                        help='Con --verify, volver a poner en cola la descarga de los archivos dañados')
+    parser.add_argument('--queue-db', default=Config.JOB_QUEUE_PATH,
+                        help='Con --requeue, cola de descargas o URL de un servidor de cola')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Mostrar información detallada')
+    args = parser.parse_args()
+    
+    from utils import setup_logging
+    setup_logging(verbose=args.verbose)
+    
+    index = LibraryIndex(args.db)
+    
+    if args.scan:
+        start = time.time()
+        stats = index.scan(args.scan, full=args.full)
+        print(f"📚 {stats['dirs']} directorio(s) ({stats['rescanned']} relistados) en {time.time() - start:.1f}s: "
+              f"{stats['added']} nuevo(s), {stats['updated']} actualizado(s), {stats['removed']} eliminado(s)")
+    
+    if args.watch:
+        try:
+            index.watch(args.watch)
+        except KeyboardInterrupt:
+            print("\n🛑 Vigilancia detenida")
+        return 0
+    
+    if args.list_series:
+        for entry in index.series():
+            episodes = f"episodios {entry['first_episode']}-{entry['last_episode']}" if entry['first_episode'] is not None else "sin número"
+            print(f"  {entry['series'] or '(sin serie)'}: {entry['files']} archivo(s), {episodes}, {format_bytes(entry['size'] or 0)}")
+    
+    if args.series or args.episode is not None:
+        files = index.find(args.series, args.episode)
+        for entry in files:
+            episode = entry['episode'] if entry['episode'] is not None else '?'
+            print(f"  {entry['series'] or '(sin serie)'} #{episode}: {entry['path']} ({format_bytes(entry['size'])})")
+        print(f"🔎 {len(files)} archivo(s)")
+    
+    if args.verify is not None:
+        queue = None
+        if args.requeue:
+            from queue_server import open_queue
+            queue = open_queue(args.queue_db)
+        
+        try:
+            summary = index.verify(args.verify or None, resume=args.resume, processes=args.processes,
+                                   readers_per_device=args.readers_per_device, report_path=args.report, queue=queue)
+        except KeyboardInterrupt:
+            print("\n🛑 Verificación interrumpida; continúala con --resume")
+            return 1
+        
+        states = summary['states']
+        damaged = sum(states[state] for state in DAMAGED_STATES)
+        print(f"🔍 {summary['checked']} archivo(s), {format_bytes(summary['bytes'])} leídos en {format_duration(summary['seconds'])}: "
+              f"{states['ok']} correcto(s), {states['hashed']} con hash nuevo, {damaged} dañado(s)")
+        if damaged:
+            print("   " + ", ".join(f"{state}: {states[state]}" for state in DAMAGED_STATES if states[state]))
+            print(f"📄 Informe: {summary['report']}")
+        if args.requeue:
+            print(f"🔄 {summary['requeued']} episodio(s) en cola para descargar de nuevo (batch_download.py --worker)")
+        return 1 if damaged else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
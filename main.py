@@ -35,6 +35,9 @@ Ejemplos de uso:
   # Interfaz gráfica
   python main.py --gui
   
+  # Enviar la descarga al servicio de descargas (python daemon.py)
+  python main.py -u "https://jkanime.net/dandadan-2nd-season/12/" --daemon
+  
   # Listar sitios soportados
   python main.py --list-sites
         """
@@ -79,6 +82,38 @@ Ejemplos de uso:
         help='Solo obtener información del video, no descargar'
     )
     
+    parser.add_argument(
+        '--daemon',
+        nargs='?',
+        const=Config.DAEMON_URL,
+        metavar='URL',
+        help=f'Descargar a través del servicio de descargas (daemon.py) (default: {Config.DAEMON_URL})'
+    )
+    
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help='Usar solo páginas guardadas en la caché HTTP, sin tocar la red'
+    )
+    
+    parser.add_argument(
+        '--record',
+        metavar='CASSETTE',
+        help='Grabar las peticiones HTTP de los extractores en un cassette'
+    )
+    
+    parser.add_argument(
+        '--replay',
+        metavar='CASSETTE',
+        help='Responder las peticiones HTTP desde un cassette grabado, sin red'
+    )
+    
+    parser.add_argument(
+        '--replay-realtime',
+        action='store_true',
+        help='Con --replay, respetar la latencia original de cada petición'
+    )
+    
     parser.add_argument(
         '-v', '--verbose',
         action='store_true',
@@ -96,6 +131,18 @@ Ejemplos de uso:
     # Configurar logging
     setup_logging(verbose=args.verbose)
     
+    if args.offline:
+        Config.HTTP_CACHE_OFFLINE = True
+    
+    if args.record and args.replay:
+        parser.error('--record y --replay no se pueden usar a la vez')
+    if args.record:
+        from http_replay import start_recording
+        start_recording(args.record)
+    elif args.replay:
+        from http_replay import start_replay
+        start_replay(args.replay, realtime=args.replay_realtime)
+    
     # Mostrar modo
     mode_text = "🚀 MODO EXTENDIDO" if EXTENDED_MODE else "📺 MODO ESTÁNDAR"
     print(f"🎌 Anime Downloader v1.0.0 - {mode_text}")
@@ -128,6 +175,9 @@ Ejemplos de uso:
         print(f"Error: URL inválida: {args.url}")
         sys.exit(1)
     
+    if args.daemon and not args.info:
+        sys.exit(download_with_daemon(args.url, args.daemon))
+    
     # Crear directorio de descarga si no existe
     output_path = Path(args.output).expanduser().resolve()
     output_path.mkdir(parents=True, exist_ok=True)
@@ -207,15 +257,67 @@ Ejemplos de uso:
             traceback.print_exc()
         sys.exit(1)
 
+def download_with_daemon(url, daemon_url=None):
+    """
+    Encola un episodio en el servicio de descargas y muestra su progreso
+    
+    Args:
+        url (str): URL del episodio
+        daemon_url (str): URL del servicio (default: Config.DAEMON_URL)
+    
+    Returns:
+        int: Código de salida
+    """
+    from daemon import find_daemon
+    
+    client = find_daemon(daemon_url)
+    if not client:
+        print(f"❌ No hay un servicio de descargas en {daemon_url or Config.DAEMON_URL} (arráncalo con: python daemon.py)")
+        return 1
+    
+    service = client.status()
+    print(f"📥 URL: {url}")
+    print(f"🛰️  Servicio: {client.url} (calidad: {service['quality']})")
+    print(f"📂 Destino: {service['output_path']}")
+    print("-" * 50)
+    
+    run = client.enqueue(urls=[url], episodes=[None])
+    if not run['queued']:
+        print("✅ El episodio ya se había descargado.")
+        return 0
+    
+    success, error = False, None
+    try:
+        for event in client.follow(run['run_id'], service['last_event']):
+            if event['type'] == 'progress' and event['status'] == 'downloading':
+                print(f"\r⬇️  {event['percentage'] or 0:.1f}%", end='', flush=True)
+            elif event['type'] == 'result':
+                success, error = event['success'], event['error']
+            elif event['type'] == 'cancelled':
+                error = 'Cancelado'
+    except KeyboardInterrupt:
+        print(f"\n👋 La descarga sigue en el servicio; cancélala con: python daemon.py --cancel {run['run_id']}")
+        return 0
+    
+    print()
+    if success:
+        print("✅ Descarga completada exitosamente!")
+        return 0
+    print(f"❌ Error en la descarga: {error or 'Error desconocido'}")
+    return 1
+
 def list_supported_sites():
     """Lista todos los sitios web soportados"""
     print("🌐 SITIOS WEB SOPORTADOS:\n")
     
+    num_extractors = 0
+    
     if EXTENDED_MODE:
         try:
             # Crear downloader con parámetros correctos
             downloader = AnimeDownloader()
             supported = downloader.list_supported_sites()
+            num_extractors = len(supported['custom_extractors'])
             
             print("🎌 SITIOS DE ANIME ESPECÍFICOS:")
             if supported['custom_extractors']:
@@ -250,16 +352,7 @@ def list_supported_sites():
         print("   - extractors/jkanime.py")
         print("   - downloader_extended.py")
     
-    # Mostrar número de extractores de manera segura
-    if EXTENDED_MODE:
-        try:
-            downloader = AnimeDownloader()
-            num_extractors = len(getattr(downloader, 'custom_extractors', {}))
-            print(f"\n💡 Total de extractores personalizados: {num_extractors}")
-        except:
-            print(f"\n💡 Total de extractores personalizados: 0")
-    else:
-        print(f"\n💡 Total de extractores personalizados: 0")
+    print(f"\n💡 Total de extractores personalizados: {num_extractors}")
     
     print("💡 Para más sitios, revisa: https://github.com/yt-dlp/yt-dlp/blob/master/supportedsites.md")
 
@@ -0,0 +1,208 @@
+"""
+Anime Downloader - Selección de calidad para extractores personalizados
+Ordena URLs candidatas y variantes HLS por resolución y bitrate según
+Config.QUALITY_PREFERENCES
+"""
+
+import re
+import logging
+from urllib.parse import urljoin, urlparse
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Alturas habituales que aparecen en rutas y nombres de archivo (ej. /720p/, video_1080.mp4)
+KNOWN_HEIGHTS = {144, 240, 360, 480, 540, 576, 720, 1080, 1440, 2160}
+HEIGHT_IN_URL_PATTERN = re.compile(r'(?<![0-9])(\d{3,4})p?(?![0-9])', re.IGNORECASE)
+RESOLUTION_IN_URL_PATTERN = re.compile(r'(?<![0-9])\d{3,4}x(\d{3,4})(?![0-9])', re.IGNORECASE)
+
+# Atributos de #EXT-X-STREAM-INF (los valores pueden ir entre comillas y contener comas)
+HLS_ATTRIBUTE_PATTERN = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+def target_height(quality):
+    """
+    Altura máxima de video para una calidad
+    
+    Args:
+        quality (str): Calidad ('480p', '720p', '1080p', 'best')
+    
+    Returns:
+        int: Altura en píxeles
+    """
+    preference = Config.QUALITY_PREFERENCES.get(quality)
+    if preference:
+        return preference['height']
+    
+    match = re.fullmatch(r'(\d{3,4})p?', str(quality or '').strip().lower())
+    if match:
+        return int(match.group(1))
+    
+    return Config.QUALITY_PREFERENCES[Config.DEFAULT_QUALITY]['height']
+
+def guess_height(url):
+    """
+    Deduce la altura de un stream a partir de su URL
+    
+    Args:
+        url (str): URL del stream
+    
+    Returns:
+        int: Altura en píxeles, o None si la URL no la indica
+    """
+    path = urlparse(url).path
+    
+    match = RESOLUTION_IN_URL_PATTERN.search(path)
+    if match:
+        return int(match.group(1))
+    
+    for match in HEIGHT_IN_URL_PATTERN.finditer(path):
+        height = int(match.group(1))
+        if height in KNOWN_HEIGHTS:
+            return height
+    
+    return None
+
+def parse_master_playlist(text, base_url):
+    """
+    Parsea las variantes de un master playlist HLS
+    
+    Args:
+        text (str): Contenido del playlist
+        base_url (str): URL del playlist para resolver rutas relativas
+    
+    Returns:
+        list: Variantes como dicts con 'url', 'height' (o None) y 'bandwidth' (o None);
+              lista vacía si no es un master playlist
+    """
+    variants = []
+    attributes = None
+    
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('#EXT-X-STREAM-INF:'):
+            attributes = dict(HLS_ATTRIBUTE_PATTERN.findall(line.split(':', 1)[1]))
+        elif attributes is not None and line and not line.startswith('#'):
+            height = None
+            resolution = attributes.get('RESOLUTION', '')
+            if 'x' in resolution:
+                try:
+                    height = int(resolution.split('x')[1])
+                except ValueError:
+                    pass
+            
+            bandwidth = attributes.get('AVERAGE-BANDWIDTH') or attributes.get('BANDWIDTH')
+            variants.append({
+                'url': urljoin(base_url, line),
+                'height': height or guess_height(line),
+                'bandwidth': int(bandwidth) if bandwidth and bandwidth.isdigit() else None,
+            })
+            attributes = None
+    
+    return variants
+
+def _rank_key(height, bandwidth, max_height):
+    """
+    Clave de orden: primero lo que cumple la calidad pedida (la mayor altura
+    sin pasarse y, a igual altura, el menor bitrate), luego lo desconocido y
+    por último lo que la excede (lo más cercano primero)
+    """
+    bandwidth = bandwidth if bandwidth is not None else float('inf')
+    if height is None:
+        return (1, 0, bandwidth)
+    if height <= max_height:
+        return (0, -height, bandwidth)
+    return (2, height, bandwidth)
+
+def select_variant(variants, quality):
+    """
+    Elige la variante HLS de menor bitrate que cumple la calidad pedida
+    
+    Args:
+        variants (list): Variantes de parse_master_playlist
+        quality (str): Calidad pedida
+    
+    Returns:
+        dict: Variante elegida, o None si no hay variantes
+    """
+    if not variants:
+        return None
+    
+    max_height = target_height(quality)
+    return min(variants, key=lambda v: _rank_key(v['height'], v['bandwidth'], max_height))
+
+def probe_hls(session, url):
+    """
+    Descarga un playlist HLS y retorna sus variantes
+    
+    Args:
+        session (requests.Session): Sesión HTTP a usar
+        url (str): URL del playlist
+    
+    Returns:
+        list: Variantes (vacía si no es un master playlist o hubo error)
+    """
+    try:
+        response = session.get(url, timeout=Config.QUALITY_PROBE_TIMEOUT)
+        response.raise_for_status()
+        return parse_master_playlist(response.text, url)
+    except Exception as e:
+        logger.debug(f"No se pudo leer el playlist {url}: {e}")
+        return []
+
+def rank_candidates(urls, quality, session=None):
+    """
+    Ordena URLs candidatas según la calidad pedida
+    
+    Las URLs .m3u8 se valoran por la variante que se elegiría de su master
+    playlist (si se pasa una sesión y Config.QUALITY_PROBE_HLS está activo);
+    el resto por la altura que indica la propia URL. Ante un empate se
+    conserva el orden original.
+    
+    Args:
+        urls (list): URLs candidatas
+        quality (str): Calidad pedida
+        session (requests.Session): Sesión para leer playlists HLS (opcional)
+    
+    Returns:
+        list: URLs ordenadas de mejor a peor opción
+    """
+    if quality == 'best' or len(urls) < 2:
+        return list(urls)
+    
+    max_height = target_height(quality)
+    probe = session is not None and Config.QUALITY_PROBE_HLS
+    keys = {}
+    
+    for url in urls:
+        height, bandwidth = guess_height(url), None
+        if probe and '.m3u8' in urlparse(url).path.lower():
+            variant = select_variant(probe_hls(session, url), quality)
+            if variant:
+                height, bandwidth = variant['height'], variant['bandwidth']
+        keys[url] = _rank_key(height, bandwidth, max_height)
+    
+    return sorted(urls, key=keys.__getitem__)
+
+def ydl_format_options(quality):
+    """
+    Opciones de yt-dlp para elegir formato según la calidad pedida
+    
+    Entre los formatos que no superan la altura pedida se elige el más alto
+    y, a igual altura, el de menor bitrate. Si ninguno la cumple (o no se
+    conoce la altura) se usa el más cercano en lugar de fallar.
+    
+    Args:
+        quality (str): Calidad pedida
+    
+    Returns:
+        dict: Opciones 'format' y 'format_sort' para yt-dlp
+    """
+    if quality == 'best':
+        return {'format': 'best'}
+    
+    height = target_height(quality)
+    return {
+        'format': f'best[height<=?{height}]/best',
+        'format_sort': [f'res:{height}', '+tbr'],
+    }
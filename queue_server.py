@@ -0,0 +1,253 @@
+"""
+Anime Downloader - Servidor de la cola de trabajos
+Expone una cola SQLite por HTTP (JSON) para que trabajadores de varias
+máquinas tomen episodios de la misma cola sin compartir el archivo
+"""
+
+import sys
+import json
+import time
+import inspect
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from config import Config
+from job_queue import JobQueue
+
+# Operaciones de JobQueue que se pueden invocar a distancia
+REMOTE_METHODS = (
+    'enqueue', 'recover', 'lease', 'set_size', 'set_state', 'heartbeat', 'renew', 'complete',
+    'fail', 'release', 'retry_failed', 'jobs', 'pending_hosts', 'active_bytes', 'active_count', 'counts',
+    'host_throughput', 'cancel', 'requeue',
+)
+
+# Operaciones que se pueden repetir sin efectos de más (consultas y renovaciones):
+# las demás solo se reintentan si la petición no llegó a enviarse
+IDEMPOTENT_METHODS = (
+    'set_size', 'heartbeat', 'renew', 'jobs', 'pending_hosts', 'active_bytes', 'active_count', 'counts',
+    'host_throughput',
+)
+
+logger = logging.getLogger(__name__)
+
+def open_queue(location=None):
+    """
+    Abre una cola de trabajos local o remota
+    
+    Args:
+        location (str): Ruta de la base de datos SQLite o URL de un servidor de
+                        cola (http://host:puerto); default: Config.JOB_QUEUE_PATH
+    
+    Returns:
+        JobQueue o RemoteJobQueue
+    """
+    if location and str(location).startswith(('http://', 'https://')):
+        return RemoteJobQueue(location)
+    return JobQueue(location)
+
+class QueueRequestHandler(BaseHTTPRequestHandler):
+    """Atiende las llamadas JSON de los trabajadores remotos"""
+    
+    server_version = 'AnimeQueue/1.0'
+    
+    def do_POST(self):
+        if self.path != '/rpc':
+            return self._reply(404, {'error': 'Ruta no encontrada'})
+        if not self._authorized():
+            return self._reply(403, {'error': 'Token inválido'})
+        
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            call = json.loads(self.rfile.read(length) or b'{}')
+            method = call.get('method')
+            if method not in REMOTE_METHODS:
+                return self._reply(400, {'error': f'Método no permitido: {method}'})
+            
+            result = getattr(self.server.queue, method)(**call.get('params', {}))
+            self._reply(200, {'result': result})
+        except (ValueError, TypeError, KeyError) as e:
+            self._reply(400, {'error': str(e)})
+        except Exception as e:
+            logger.error(f"Error atendiendo {self.path}: {e}")
+            self._reply(500, {'error': str(e)})
+    
+    def do_GET(self):
+        if self.path != '/status':
+            return self._reply(404, {'error': 'Ruta no encontrada'})
+        if not self._authorized():
+            return self._reply(403, {'error': 'Token inválido'})
+        self._reply(200, {'result': self.server.queue.counts()})
+    
+    def _authorized(self):
+        token = self.server.token
+        return not token or self.headers.get('X-Queue-Token') == token
+    
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+class QueueServer(ThreadingHTTPServer):
+    """Servidor HTTP de una cola de trabajos"""
+    
+    daemon_threads = True
+    
+    def __init__(self, queue, host='127.0.0.1', port=None, token=None):
+        """
+        Args:
+            queue (JobQueue): Cola a servir
+            host (str): Dirección en la que escuchar
+            port (int): Puerto (default: Config.QUEUE_SERVER_PORT)
+            token (str): Token que deben enviar los clientes (default: Config.QUEUE_SERVER_TOKEN)
+        """
+        self.queue = queue
+        self.token = token if token is not None else Config.QUEUE_SERVER_TOKEN
+        super().__init__((host, port or Config.QUEUE_SERVER_PORT), QueueRequestHandler)
+    
+    def recover_periodically(self, interval=None):
+        """
+        Devuelve a la cola, en segundo plano, los trabajos de trabajadores caídos
+        
+        Args:
+            interval (float): Segundos entre comprobaciones (default: Config.JOB_HEARTBEAT_SECONDS)
+        """
+        def loop():
+            while True:
+                time.sleep(interval or Config.JOB_HEARTBEAT_SECONDS)
+                try:
+                    self.queue.recover()
+                except Exception as e:
+                    logger.warning(f"Error recuperando trabajos: {e}")
+        
+        threading.Thread(target=loop, name='queue-recover', daemon=True).start()
+
+class RemoteJobQueue:
+    """Cliente de un QueueServer con la misma interfaz que JobQueue"""
+    
+    def __init__(self, url, token=None, timeout=None):
+        """
+        Args:
+            url (str): URL del servidor (http://host:puerto)
+            token (str): Token del servidor (default: Config.QUEUE_SERVER_TOKEN)
+            timeout (float): Timeout de cada llamada (default: Config.TIMEOUT)
+        """
+        self.url = url.rstrip('/')
+        self.timeout = timeout or Config.TIMEOUT
+        self.logger = logging.getLogger(__name__)
+        self._session = requests.Session()
+        
+        token = token if token is not None else Config.QUEUE_SERVER_TOKEN
+        if token:
+            self._session.headers['X-Queue-Token'] = token
+    
+    @property
+    def location(self):
+        """URL del servidor (para abrir la misma cola desde otro proceso)"""
+        return self.url
+    
+    def __getattr__(self, method):
+        if method not in REMOTE_METHODS:
+            raise AttributeError(method)
+        return lambda *args, **kwargs: self._call(method, args, kwargs)
+    
+    def _call(self, method, args, kwargs):
+        """
+        Invoca una operación de la cola en el servidor
+        
+        Los errores de red se reintentan (en las operaciones que cambian la cola,
+        solo si no se llegó a conectar con el servidor); los errores de la propia
+        operación se propagan como RuntimeError.
+        """
+        # Los argumentos posicionales viajan con nombre, según la firma de JobQueue
+        params = inspect.signature(getattr(JobQueue, method)).bind(self, *args, **kwargs).arguments
+        params.pop('self')
+        
+        for attempt in range(Config.MAX_RETRIES):
+            try:
+                response = self._session.post(
+                    f"{self.url}/rpc",
+                    json={'method': method, 'params': params},
+                    timeout=self.timeout
+                )
+                break
+            except requests.RequestException as e:
+                # Con la petición ya enviada el servidor pudo aplicarla: repetirla la aplicaría dos veces
+                if attempt == Config.MAX_RETRIES - 1 or not (method in IDEMPOTENT_METHODS or _not_sent(e)):
+                    raise
+                wait_time = min(2 ** attempt, 10)
+                self.logger.warning(f"Servidor de cola no disponible ({e}), reintentando en {wait_time}s")
+                time.sleep(wait_time)
+        
+        payload = response.json()
+        if response.status_code != 200:
+            raise RuntimeError(f"Cola remota: {payload.get('error', response.status_code)}")
+        return payload['result']
+
+def _not_sent(error):
+    """
+    Indica si un error de red ocurrió antes de enviar la petición
+    
+    Args:
+        error (requests.RequestException): Error de la llamada
+    
+    Returns:
+        bool: True si no se pudo conectar con el servidor
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+def serve(db_path=None, host='127.0.0.1', port=None, token=None):
+    """
+    Sirve una cola de trabajos hasta que se interrumpa con Ctrl-C
+    
+    Args:
+        db_path (str): Base de datos de la cola (default: Config.JOB_QUEUE_PATH)
+        host (str): Dirección en la que escuchar ('0.0.0.0' para toda la red)
+        port (int): Puerto (default: Config.QUEUE_SERVER_PORT)
+        token (str): Token que deben enviar los clientes
+    """
+    queue = JobQueue(db_path)
+    server = QueueServer(queue, host, port, token)
+    server.recover_periodically()
+    
+    logger.info(f"🗂️  Cola {queue.location} servida en http://{host}:{server.server_address[1]}")
+    if not server.token and host not in ('127.0.0.1', 'localhost'):
+        logger.warning("Servidor accesible desde la red sin token (configura ANIME_QUEUE_TOKEN)")
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("🛑 Servidor de cola detenido")
+    finally:
+        server.server_close()
+
+def main():
+    """Sirve la cola de trabajos a los trabajadores de otras máquinas"""
+    parser = argparse.ArgumentParser(description='Servidor de la cola de descargas por lotes')
+    parser.add_argument('--db', default=Config.JOB_QUEUE_PATH, help='Base de datos de la cola')
+    parser.add_argument('--bind', default='127.0.0.1', help="Dirección en la que escuchar ('0.0.0.0' para toda la red)")
+    parser.add_argument('--port', type=int, default=Config.QUEUE_SERVER_PORT, help=f'Puerto (default: {Config.QUEUE_SERVER_PORT})')
+    parser.add_argument('--token', help='Token que deben enviar los trabajadores (default: ANIME_QUEUE_TOKEN)')
+    args = parser.parse_args()
+    
+    from utils import setup_logging
+    setup_logging()
+    
+    serve(args.db, args.bind, args.port, args.token)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
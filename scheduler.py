@@ -0,0 +1,371 @@
+"""
+Anime Downloader - Planificador de descargas por host
+Limita la concurrencia por sitio y reparte los trabajadores entre hosts con
+deficit round robin, para que un sitio lento no acapare todo el lote
+"""
+
+import time
+import heapq
+import itertools
+import threading
+from collections import defaultdict
+
+from config import Config
+from extractors import url_hostname
+
+def host_key(url):
+    """
+    Host con el que se agrupa una URL para planificar
+    
+    Args:
+        url (str): URL del episodio
+    
+    Returns:
+        str: Hostname sin 'www.' (o 'desconocido')
+    """
+    return url_hostname(url) or 'desconocido'
+
+def parse_host_limits(spec):
+    """
+    Parsea límites de concurrencia por sitio
+    
+    Args:
+        spec (str): Límites separados por comas, ej. "jkanime=2,youtube.com=4"
+    
+    Returns:
+        dict: sitio -> número máximo de trabajos simultáneos
+    
+    Raises:
+        ValueError: Si el formato no es válido
+    """
+    limits = {}
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        
+        site, sep, value = part.partition('=')
+        site = site.strip().lower()
+        if not sep or not site:
+            raise ValueError(f"Límite inválido (se espera SITIO=N): {part}")
+        
+        try:
+            limit = int(value)
+        except ValueError:
+            raise ValueError(f"Límite inválido para {site}: {value}")
+        if limit < 1:
+            raise ValueError(f"El límite de {site} debe ser al menos 1")
+        
+        limits[site] = limit
+    
+    if not limits:
+        raise ValueError("No se indicó ningún límite")
+    return limits
+
+ORDER_POLICIES = ('fifo', 'shortest', 'longest', 'episode')
+
+def order_key(order, job):
+    """
+    Clave de orden de un trabajo según la política del lote
+    
+    Mismo criterio que job_queue.ORDER_CLAUSES, para los trabajos que ya
+    están en memoria (cola de episodios resueltos del modo pipeline).
+    
+    Args:
+        order (str): Política ('fifo', 'shortest', 'longest' o 'episode')
+        job (dict): Trabajo con 'id', 'episode' y 'size'
+    
+    Returns:
+        tuple: Clave de orden (menor se sirve antes)
+    """
+    if order == 'shortest':
+        return (job.get('size') is None, job.get('size') or 0, job['id'])
+    if order == 'longest':
+        return (job.get('size') is None, -(job.get('size') or 0), job['id'])
+    if order == 'episode':
+        return (job.get('episode') is None, job.get('episode') or 0, job['id'])
+    return (job['id'],)
+
+class DeficitRoundRobin:
+    """
+    Elección de host por deficit round robin
+    
+    Cada vez que el turno llega a un host se le suma un quantum de crédito;
+    el host se sirve mientras su crédito cubra el coste del siguiente trabajo.
+    Con coste unitario equivale a un round robin estricto; con costes
+    distintos (ej. tamaño) reparte el servicio de forma proporcional.
+    """
+    
+    def __init__(self, quantum=None):
+        """
+        Args:
+            quantum (float): Crédito por turno (default: Config.SCHEDULER_QUANTUM)
+        """
+        self.quantum = quantum or Config.SCHEDULER_QUANTUM
+        self.deficit = defaultdict(float)
+        self._ring = []
+        self._pos = 0
+        self._credited = False
+    
+    def pick(self, backlogged, eligible, cost=None):
+        """
+        Elige el siguiente host a servir
+        
+        Args:
+            backlogged (iterable): Hosts con trabajos esperando
+            eligible (iterable): Hosts con trabajos esperando y hueco libre
+            cost (callable): host -> coste de su siguiente trabajo (default: 1)
+        
+        Returns:
+            str: Host elegido, o None si no hay ninguno elegible
+        """
+        eligible = set(eligible)
+        if not eligible:
+            return None
+        
+        backlogged = set(backlogged)
+        for host in sorted(backlogged - set(self._ring)):
+            self._ring.append(host)
+        
+        while True:
+            self._pos %= len(self._ring)
+            host = self._ring[self._pos]
+            
+            if host in eligible:
+                if not self._credited:
+                    self.deficit[host] += self.quantum
+                    self._credited = True
+                
+                host_cost = cost(host) if cost else 1
+                if self.deficit[host] >= host_cost:
+                    self.deficit[host] -= host_cost
+                    return host
+            elif host not in backlogged:
+                # Un host sin trabajos no acumula crédito
+                self.deficit[host] = 0
+            
+            self._pos += 1
+            self._credited = False
+
+class JobSource:
+    """
+    Trabajos pendientes de una ejecución en la cola persistente
+    
+    La fuente no se agota mientras otro trabajador (de este u otro nodo)
+    tenga trabajos de la ejecución en curso: si cae, su lease caduca y el
+    trabajo se vuelve a repartir. Tampoco mientras una entrada en streaming
+    siga encolando trabajos.
+    """
+    
+    def __init__(self, queue, owner, run_id, order='fifo', ingest_done=None):
+        """
+        Args:
+            queue (JobQueue): Cola de trabajos
+            owner (str): Trabajador que toma los leases
+            run_id (str): Ejecución cuyos trabajos se reparten
+            order (str): Política de orden dentro de cada host (ver ORDER_POLICIES)
+            ingest_done (threading.Event): Se activa al terminar de encolar la entrada (None si no hay)
+        """
+        self.queue = queue
+        self.owner = owner
+        self.run_id = run_id
+        self.order = order
+        self.ingest_done = ingest_done
+        self._last_recover = time.time()
+    
+    def pending_hosts(self):
+        return self.queue.pending_hosts(self.run_id)
+    
+    def take(self, host):
+        return self.queue.lease(self.owner, self.run_id, host=host, order=self.order)
+    
+    def exhausted(self):
+        if self.queue.pending_hosts(self.run_id):
+            return False
+        if self.ingest_done is not None and not self.ingest_done.is_set():
+            return False
+        if not self.queue.active_count(self.run_id):
+            return True
+        
+        # Recuperar de vez en cuando los trabajos de trabajadores caídos
+        if time.time() - self._last_recover >= Config.JOB_HEARTBEAT_SECONDS:
+            self._last_recover = time.time()
+            self.queue.recover()
+        return False
+
+class ReadyQueue:
+    """Episodios ya resueltos esperando descarga, agrupados por host (modo pipeline)"""
+    
+    def __init__(self, maxsize, order='fifo'):
+        """
+        Args:
+            maxsize (int): Episodios resueltos que pueden esperar a la vez
+            order (str): Política de orden dentro de cada host (ver ORDER_POLICIES)
+        """
+        self.maxsize = maxsize
+        self.order = order
+        self.scheduler = None
+        self._items = defaultdict(list)
+        self._seq = itertools.count()
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+    
+    def put(self, host, item, timeout=None):
+        """
+        Añade un episodio resuelto, esperando hueco si la cola está llena
+        
+        Args:
+            host (str): Host del episodio
+            item (tuple): (trabajo, episodio resuelto)
+            timeout (float): Segundos máximos de espera (None para esperar siempre)
+        
+        Returns:
+            bool: False si no hubo hueco en el tiempo indicado
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._size < self.maxsize, timeout):
+                return False
+            heapq.heappush(self._items[host], (order_key(self.order, item[0]), next(self._seq), item))
+            self._size += 1
+        
+        if self.scheduler:
+            self.scheduler.notify()
+        return True
+    
+    def close(self):
+        """Indica que no llegarán más episodios"""
+        with self._cond:
+            self._closed = True
+        if self.scheduler:
+            self.scheduler.notify()
+    
+    def pending_hosts(self):
+        with self._cond:
+            return {host: len(items) for host, items in self._items.items() if items}
+    
+    def take(self, host):
+        with self._cond:
+            if not self._items[host]:
+                return None
+            self._size -= 1
+            self._cond.notify_all()
+            return heapq.heappop(self._items[host])[2]
+    
+    def exhausted(self):
+        with self._cond:
+            return self._closed and self._size == 0
+
+class HostScheduler:
+    """Reparte trabajos de una fuente respetando el límite de concurrencia de cada host"""
+    
+    def __init__(self, source, limits=None, default_limit=None, share=1):
+        """
+        Args:
+            source: JobSource o ReadyQueue de donde tomar trabajos
+            limits (dict): sitio -> trabajos simultáneos (se combina con Config.HOST_CONCURRENCY)
+            default_limit (int): Límite para hosts sin entrada (default: Config.HOST_DEFAULT_CONCURRENCY)
+            share (int): Procesos entre los que se reparte cada límite (modo multiproceso)
+        """
+        self.source = source
+        self.share = share
+        self.limits = dict(Config.HOST_CONCURRENCY)
+        self.limits.update(limits or {})
+        self.default_limit = default_limit or Config.HOST_DEFAULT_CONCURRENCY
+        # Trabajos simultáneos en total (None sin tope, lo ajusta el autoajuste)
+        self.capacity = None
+        self.active = defaultdict(int)
+        self._drr = DeficitRoundRobin()
+        self._cond = threading.Condition()
+        
+        if isinstance(source, ReadyQueue):
+            source.scheduler = self
+    
+    def limit_for(self, host):
+        """
+        Límite de concurrencia de un host
+        
+        Busca el host exacto, luego sus dominios padre (a.youtube.com ->
+        youtube.com) y por último el nombre del sitio sin TLD ('youtube').
+        Con varios procesos cada uno recibe su parte (al menos 1).
+        
+        Args:
+            host (str): Hostname
+        
+        Returns:
+            int: Trabajos simultáneos permitidos
+        """
+        labels = host.split('.')
+        site = labels[-2] if len(labels) >= 2 else labels[0]
+        
+        limit = None
+        for i in range(len(labels)):
+            limit = self.limits.get('.'.join(labels[i:]))
+            if limit:
+                break
+        limit = limit or self.limits.get(site, self.default_limit)
+        
+        return max(1, limit // self.share)
+    
+    def acquire(self, stop_event=None):
+        """
+        Toma el siguiente trabajo, esperando si todos los hosts con trabajo están al límite
+        
+        Args:
+            stop_event (threading.Event): Evento para dejar de esperar
+        
+        Returns:
+            tuple: (host, trabajo), o None si no quedan trabajos o se pidió parar
+        """
+        with self._cond:
+            while not (stop_event and stop_event.is_set()):
+                backlog = self.source.pending_hosts()
+                if not backlog:
+                    if self.source.exhausted():
+                        return None
+                    self._cond.wait(timeout=0.5)
+                    continue
+                
+                if self.capacity and sum(self.active.values()) >= self.capacity:
+                    self._cond.wait(timeout=0.5)
+                    continue
+                
+                eligible = [host for host in backlog if self.active[host] < self.limit_for(host)]
+                host = self._drr.pick(backlog, eligible)
+                if host is None:
+                    self._cond.wait(timeout=0.5)
+                    continue
+                
+                item = self.source.take(host)
+                if item is None:
+                    # Otro proceso se adelantó con el trabajo de este host
+                    continue
+                
+                self.active[host] += 1
+                return host, item
+        return None
+    
+    def release(self, host):
+        """Libera el hueco de un host al terminar su trabajo"""
+        with self._cond:
+            self.active[host] -= 1
+            self._cond.notify_all()
+    
+    def set_capacity(self, capacity):
+        """
+        Cambia el número total de trabajos simultáneos
+        
+        Los trabajos en curso no se interrumpen: al bajar la capacidad, los
+        trabajadores sobrantes esperan a que terminen.
+        
+        Args:
+            capacity (int): Trabajos simultáneos (None sin tope)
+        """
+        with self._cond:
+            self.capacity = capacity
+            self._cond.notify_all()
+    
+    def notify(self):
+        """Despierta a los trabajadores que esperan trabajo"""
+        with self._cond:
+            self._cond.notify_all()
@@ -0,0 +1,270 @@
+"""
+Anime Downloader - Sincronización incremental de series
+Guarda el último episodio visto de cada serie y solo descarga los nuevos
+"""
+
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+
+from config import Config
+from utils import validate_url
+
+class SyncState:
+    """Estado persistente de las series sincronizadas (SQLite)"""
+    
+    def __init__(self, db_path=None):
+        """
+        Args:
+            db_path (str): Ruta de la base de datos (default: Config.SYNC_DB_PATH)
+        """
+        self.db_path = Path(db_path or Config.SYNC_DB_PATH).expanduser()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS series (
+                url TEXT PRIMARY KEY,
+                last_episode INTEGER NOT NULL DEFAULT 0,
+                last_checked REAL,
+                next_check REAL NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT
+            )
+        ''')
+        self._conn.commit()
+    
+    def get(self, url):
+        """
+        Obtiene el estado de una serie
+        
+        Args:
+            url (str): URL de la serie
+        
+        Returns:
+            dict: Estado de la serie o None si no está registrada
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM series WHERE url = ?', (url,)).fetchone()
+        return dict(row) if row else None
+    
+    def ensure(self, url, last_episode=0):
+        """Registra una serie si aún no existe"""
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR IGNORE INTO series (url, last_episode) VALUES (?, ?)',
+                (url, last_episode)
+            )
+            self._conn.commit()
+    
+    def record_check(self, url, last_episode=None):
+        """
+        Registra una comprobación correcta y reinicia el backoff
+        
+        Args:
+            url (str): URL de la serie
+            last_episode (int): Nuevo último episodio descargado (None para no cambiarlo)
+        """
+        now = time.time()
+        with self._lock:
+            if last_episode is None:
+                self._conn.execute(
+                    'UPDATE series SET last_checked = ?, next_check = 0, failures = 0, '
+                    'last_error = NULL WHERE url = ?', (now, url)
+                )
+            else:
+                self._conn.execute(
+                    'UPDATE series SET last_episode = MAX(last_episode, ?), last_checked = ?, '
+                    'next_check = 0, failures = 0, last_error = NULL WHERE url = ?',
+                    (last_episode, now, url)
+                )
+            self._conn.commit()
+    
+    def record_failure(self, url, error):
+        """
+        Registra un fallo y aplaza la siguiente comprobación con backoff exponencial
+        
+        Args:
+            url (str): URL de la serie
+            error (str): Descripción del error
+        
+        Returns:
+            float: Segundos hasta la siguiente comprobación
+        """
+        state = self.get(url) or {'failures': 0}
+        failures = state['failures'] + 1
+        delay = min(Config.SYNC_BACKOFF_BASE * 2 ** (failures - 1), Config.SYNC_BACKOFF_MAX)
+        now = time.time()
+        
+        with self._lock:
+            self._conn.execute(
+                'UPDATE series SET last_checked = ?, next_check = ?, failures = ?, '
+                'last_error = ? WHERE url = ?',
+                (now, now + delay, failures, str(error)[:500], url)
+            )
+            self._conn.commit()
+        return delay
+    
+    def list_series(self):
+        """Retorna el estado de todas las series registradas"""
+        with self._lock:
+            rows = self._conn.execute('SELECT * FROM series ORDER BY url').fetchall()
+        return [dict(row) for row in rows]
+
+class SeriesSync:
+    """Comprueba series y encola solo los episodios nuevos en el BatchDownloader"""
+    
+    def __init__(self, batch_downloader, state=None):
+        """
+        Args:
+            batch_downloader (BatchDownloader): Motor de descargas por lotes
+            state (SyncState): Estado persistente (default: Config.SYNC_DB_PATH)
+        """
+        self.batch_downloader = batch_downloader
+        self.state = state or SyncState()
+        self.logger = logging.getLogger(__name__)
+        self._extractor = None
+    
+    @property
+    def extractor(self):
+        """Extractor de JKAnime, creado al primer uso"""
+        if self._extractor is None:
+            from extractors import get_extractor
+            self._extractor = get_extractor('jkanime')
+        return self._extractor
+    
+    def load_series_file(self, file_path):
+        """
+        Carga la lista de series a sincronizar
+        
+        Cada línea contiene la URL de una serie y, opcionalmente, el último
+        episodio que ya se tiene (ej. "https://jkanime.net/serie/ 12").
+        
+        Args:
+            file_path (str): Ruta del archivo
+        
+        Returns:
+            list: Tuplas (URL de la serie, último episodio inicial)
+        """
+        series = []
+        
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line_num, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                
+                parts = line.split()
+                url = parts[0]
+                initial = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+                
+                if validate_url(url) and self.extractor.is_series_url(url):
+                    series.append((url, initial))
+                else:
+                    self.logger.warning(f"URL de serie inválida en línea {line_num}: {url}")
+        
+        return series
+    
+    def check_series(self, url):
+        """
+        Busca episodios posteriores al último visto de una serie
+        
+        Args:
+            url (str): URL de la serie
+        
+        Returns:
+            list: Tuplas (número de episodio, URL) de los episodios nuevos,
+                  o None si la serie está en backoff o falló la comprobación
+        """
+        state = self.state.get(url)
+        
+        if state['next_check'] > time.time():
+            wait = state['next_check'] - time.time()
+            self.logger.info(f"⏳ {url} en backoff ({wait/60:.0f} min restantes)")
+            return None
+        
+        try:
+            new_episodes = self.extractor.get_episode_list(
+                url, min_episode=state['last_episode'], raise_errors=True
+            )
+            if not new_episodes and state['last_episode'] == 0:
+                raise ValueError("No se encontró ningún episodio en la serie")
+        except Exception as e:
+            delay = self.state.record_failure(url, e)
+            self.logger.warning(f"❌ Error comprobando {url}: {e} (reintento en {delay/60:.0f} min)")
+            return None
+        
+        if not new_episodes:
+            self.state.record_check(url)
+            self.logger.info(f"✔️  Sin episodios nuevos: {url} (último: {state['last_episode']})")
+        else:
+            self.logger.info(f"🆕 {len(new_episodes)} episodio(s) nuevo(s) en {url}")
+        
+        return new_episodes
+    
+    def run_once(self, series, progress_callback=None):
+        """
+        Realiza una pasada de sincronización
+        
+        Args:
+            series (list): Tuplas (URL de la serie, último episodio inicial)
+            progress_callback (callable): Callback de progreso del BatchDownloader
+        
+        Returns:
+            dict: Resumen del BatchDownloader, o None si no hubo episodios nuevos
+        """
+        urls = []
+        episode_numbers = []
+        planned = {}
+        
+        for series_url, initial in series:
+            self.state.ensure(series_url, initial)
+            new_episodes = self.check_series(series_url)
+            if not new_episodes:
+                continue
+            
+            planned[series_url] = new_episodes
+            for number, episode_url in new_episodes:
+                urls.append(episode_url)
+                episode_numbers.append(number)
+        
+        if not urls:
+            return None
+        
+        summary = self.batch_downloader.download_batch(urls, progress_callback, episode_numbers)
+        failed_urls = {result.url for result in summary['failed_downloads']}
+        
+        # Avanzar solo hasta el último episodio sin huecos, para reintentar los fallidos
+        for series_url, new_episodes in planned.items():
+            last_episode = None
+            for number, episode_url in new_episodes:
+                if episode_url in failed_urls:
+                    break
+                last_episode = number
+            
+            self.state.record_check(series_url, last_episode)
+        
+        return summary
+    
+    def watch(self, series_file, interval_minutes, progress_callback=None):
+        """
+        Sincroniza indefinidamente cada interval_minutes
+        
+        Args:
+            series_file (str): Archivo con las series
+            interval_minutes (float): Minutos entre pasadas
+            progress_callback (callable): Callback de progreso del BatchDownloader
+        """
+        while True:
+            # Releer el archivo en cada pasada para aceptar series nuevas sin reiniciar
+            summary = self.run_once(self.load_series_file(series_file), progress_callback)
+            if summary:
+                self.batch_downloader.print_summary(summary)
+            
+            self.logger.info(f"Próxima comprobación en {interval_minutes} minuto(s)")
+            time.sleep(interval_minutes * 60)
@@ -47,6 +47,20 @@ setup(
         'utils',
         'batch_download',
         'downloader_extended',
+        'http_cache',
+        'series_sync',
+        'transport',
+        'stream_cache',
+        'quality',
+        'http_replay',
+        'job_queue',
+        'scheduler',
+        'bandwidth',
+        'queue_server',
+        'journal',
+        'autotune',
+        'daemon',
+        'library',
     ],
     classifiers=[
         "Development Status :: 4 - Beta",
@@ -0,0 +1,226 @@
+"""
+Anime Downloader - Caché de streams resueltos
+Guarda episodio -> URLs de video ya resueltas y el mirror que funcionó,
+con una caducidad deducida de las URLs firmadas
+"""
+
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime, timezone
+from urllib.parse import urlparse, parse_qsl
+
+from config import Config
+
+# Parámetros de query con un timestamp absoluto de caducidad
+EXPIRY_PARAMS = {'expires', 'expire', 'expiry', 'expiration', 'exp', 'e', 'validto', 'valid_to', 'deadline'}
+
+# Tokens tipo Akamai: hdnts=exp=1700000000~acl=...
+TOKEN_EXPIRY_PATTERN = re.compile(r'(?:^|[~&])exp=(\d{9,13})')
+
+def _to_timestamp(value):
+    """Convierte un timestamp en segundos o milisegundos a segundos, o None"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if value > 1e12:  # milisegundos
+        value /= 1000
+    # Solo aceptar valores con pinta de fecha (2001 - 2286)
+    return value if value > 1e9 else None
+
+def infer_expiry(url):
+    """
+    Deduce cuándo caduca una URL de media firmada
+    
+    Reconoce parámetros tipo expires=/expire=/exp=/e= con timestamp, firmas
+    AWS (X-Amz-Date + X-Amz-Expires) y tokens exp=...~acl=...
+    
+    Args:
+        url (str): URL del stream
+    
+    Returns:
+        float: Timestamp de caducidad, o None si no se puede deducir
+    """
+    candidates = []
+    
+    try:
+        params = parse_qsl(urlparse(url).query, keep_blank_values=True)
+    except ValueError:
+        params = []
+    
+    lowered = {key.lower(): value for key, value in params}
+    
+    for key, value in lowered.items():
+        if key in EXPIRY_PARAMS:
+            timestamp = _to_timestamp(value)
+            if timestamp:
+                candidates.append(timestamp)
+        else:
+            match = TOKEN_EXPIRY_PATTERN.search(value)
+            if match:
+                timestamp = _to_timestamp(match.group(1))
+                if timestamp:
+                    candidates.append(timestamp)
+    
+    if 'x-amz-date' in lowered and 'x-amz-expires' in lowered:
+        try:
+            signed_at = datetime.strptime(lowered['x-amz-date'], '%Y%m%dT%H%M%SZ')
+            signed_at = signed_at.replace(tzinfo=timezone.utc).timestamp()
+            candidates.append(signed_at + int(lowered['x-amz-expires']))
+        except ValueError:
+            pass
+    
+    return min(candidates) if candidates else None
+
+def infer_ttl(urls):
+    """
+    Calcula cuántos segundos se pueden reutilizar unas URLs resueltas
+    
+    Usa la caducidad más próxima entre las URLs menos un margen de seguridad,
+    o Config.STREAM_CACHE_DEFAULT_TTL si ninguna indica caducidad.
+    
+    Args:
+        urls (list): URLs de video resueltas
+    
+    Returns:
+        float: Segundos de validez (0 si ya caducaron)
+    """
+    now = time.time()
+    expiries = [expiry for expiry in (infer_expiry(url) for url in urls) if expiry]
+    
+    if not expiries:
+        return Config.STREAM_CACHE_DEFAULT_TTL
+    
+    ttl = min(expiries) - now - Config.STREAM_CACHE_SAFETY_MARGIN
+    return max(0, min(ttl, Config.STREAM_CACHE_MAX_TTL))
+
+class ResolvedStreamCache:
+    """Caché persistente de episodios ya resueltos a URLs reproducibles"""
+    
+    def __init__(self, db_path=None):
+        """
+        Args:
+            db_path (str): Ruta de la base de datos (default: Config.STREAM_CACHE_PATH)
+        """
+        self.db_path = Path(db_path or Config.STREAM_CACHE_PATH).expanduser()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS streams (
+                episode_url TEXT PRIMARY KEY,
+                video_info TEXT NOT NULL,
+                mirror TEXT,
+                resolved_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        self._conn.commit()
+    
+    def get(self, episode_url):
+        """
+        Obtiene la resolución guardada de un episodio si sigue vigente
+        
+        Args:
+            episode_url (str): URL del episodio
+        
+        Returns:
+            dict: video_info con 'video_urls' (el mirror elegido primero) y
+                  'mirror', o None si no hay entrada vigente
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT video_info, mirror, expires_at FROM streams WHERE episode_url = ?',
+                (episode_url,)
+            ).fetchone()
+        
+        if not row:
+            return None
+        
+        video_info, mirror, expires_at = row
+        if expires_at <= time.time():
+            self.invalidate(episode_url)
+            return None
+        
+        video_info = json.loads(video_info)
+        video_info['mirror'] = mirror
+        if mirror in video_info.get('video_urls', []):
+            video_info['video_urls'].remove(mirror)
+            video_info['video_urls'].insert(0, mirror)
+        return video_info
+    
+    def put(self, episode_url, video_info, mirror=None):
+        """
+        Guarda la resolución de un episodio
+        
+        Args:
+            episode_url (str): URL del episodio
+            video_info (dict): Información retornada por el extractor
+            mirror (str): URL que se usó con éxito (opcional)
+        
+        Returns:
+            float: Segundos de validez asignados
+        """
+        video_urls = video_info.get('video_urls') or []
+        if not video_urls:
+            return 0
+        
+        ttl = infer_ttl([mirror] if mirror else video_urls)
+        if ttl <= 0:
+            return 0
+        
+        now = time.time()
+        stored = {key: value for key, value in video_info.items() if key != 'mirror'}
+        
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO streams (episode_url, video_info, mirror, resolved_at, expires_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (episode_url, json.dumps(stored), mirror, now, now + ttl)
+            )
+            self._conn.commit()
+        
+        self.logger.debug(f"Streams de {episode_url} guardados en caché por {ttl:.0f}s")
+        return ttl
+    
+    def invalidate(self, episode_url):
+        """Elimina la resolución guardada de un episodio"""
+        with self._lock:
+            self._conn.execute('DELETE FROM streams WHERE episode_url = ?', (episode_url,))
+            self._conn.commit()
+    
+    def purge_expired(self):
+        """
+        Elimina las entradas caducadas
+        
+        Returns:
+            int: Número de entradas eliminadas
+        """
+        with self._lock:
+            cursor = self._conn.execute('DELETE FROM streams WHERE expires_at <= ?', (time.time(),))
+            self._conn.commit()
+        return cursor.rowcount
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_stream_cache():
+    """
+    Retorna la caché de streams compartida por todo el proceso
+    
+    Returns:
+        ResolvedStreamCache: Instancia compartida
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResolvedStreamCache()
+        return _default_cache
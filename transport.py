@@ -0,0 +1,119 @@
+"""
+Anime Downloader - Transporte HTTP compartido
+Una única sesión por proceso, con pools de conexiones persistentes por host,
+que usan todos los extractores y downloaders
+"""
+
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+
+_session = None
+_session_workers = None
+_adapter_class = HTTPAdapter
+_session_lock = threading.Lock()
+_logger = logging.getLogger(__name__)
+
+# Respuestas con las que un servidor pide bajar el ritmo (para el autoajuste de los lotes)
+THROTTLE_STATUS_CODES = (429, 503)
+_throttled = 0
+_throttled_lock = threading.Lock()
+
+def _count_throttling(response, *args, **kwargs):
+    """Hook de respuesta que cuenta las respuestas 429/503"""
+    global _throttled
+    if response.status_code in THROTTLE_STATUS_CODES:
+        with _throttled_lock:
+            _throttled += 1
+
+def throttled_responses():
+    """
+    Respuestas 429/503 recibidas por la sesión compartida desde que arrancó el proceso
+    
+    Returns:
+        int: Contador acumulado (comparar dos lecturas para obtener las de un intervalo)
+    """
+    return _throttled
+
+def _build_adapter(max_workers):
+    """
+    Crea un adaptador con pools dimensionados según el número de trabajadores
+    
+    Args:
+        max_workers (int): Descargas simultáneas del proceso
+    
+    Returns:
+        HTTPAdapter: Adaptador configurado
+    """
+    # Cada trabajador puede resolver varios iframes a la vez, pero nunca se
+    # abren más de HTTP_MAX_CONNECTIONS_PER_HOST conexiones al mismo host:
+    # con pool_block las peticiones extra esperan una conexión libre
+    per_host = min(Config.HTTP_MAX_CONNECTIONS_PER_HOST, max(1, max_workers) * Config.IFRAME_WORKERS)
+    
+    return _adapter_class(
+        pool_connections=Config.HTTP_POOL_HOSTS,
+        pool_maxsize=per_host,
+        pool_block=True
+    )
+
+def _mount_adapters(session, max_workers):
+    """Monta los adaptadores HTTP y HTTPS en la sesión"""
+    global _session_workers
+    adapter = _build_adapter(max_workers)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    _session_workers = max_workers
+
+def get_session():
+    """
+    Retorna la sesión HTTP compartida por todo el proceso
+    
+    Las conexiones (y por tanto las sesiones TLS ya negociadas) se mantienen
+    vivas entre episodios consecutivos del mismo host.
+    
+    Returns:
+        requests.Session: Sesión compartida
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers.update(Config.HEADERS)
+            _session.hooks['response'].append(_count_throttling)
+            _mount_adapters(_session, Config.CONCURRENT_DOWNLOADS)
+        return _session
+
+def set_adapter_class(adapter_class=None):
+    """
+    Cambia la clase de adaptador montada en la sesión compartida
+    
+    Permite interponer adaptadores de grabación/reproducción (ver http_replay)
+    sin tocar los extractores. None restaura el adaptador HTTP normal.
+    
+    Args:
+        adapter_class (callable): Subclase de HTTPAdapter (o factoría con sus argumentos)
+    """
+    global _adapter_class
+    session = get_session()
+    with _session_lock:
+        _adapter_class = adapter_class or HTTPAdapter
+        _mount_adapters(session, _session_workers)
+
+def configure_transport(max_workers):
+    """
+    Redimensiona los pools de conexiones para un número de trabajadores
+    
+    Args:
+        max_workers (int): Descargas simultáneas previstas
+    """
+    session = get_session()
+    with _session_lock:
+        if max_workers == _session_workers:
+            return
+        # Los pools anteriores se descartan: llamar antes de empezar a descargar
+        _mount_adapters(session, max_workers)
+    _logger.debug(f"Transporte HTTP configurado para {max_workers} trabajador(es)")
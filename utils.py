@@ -7,12 +7,16 @@ import os
 import re
 import shutil
 import logging
+import argparse
 from pathlib import Path
 from urllib.parse import urlparse, parse_qs
 from urllib.request import urlopen
 import time
 import hashlib
 
+# Bytes por lectura al calcular hashes (bloques grandes: lectura secuencial en discos y NAS)
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
 def clean_filename(filename, max_length=200):
     """
     Limpia un nombre de archivo eliminando caracteres inválidos
@@ -63,6 +67,65 @@ def validate_url(url):
     except:
         return False
 
+def parse_episode_ranges(spec):
+    """
+    Parsea una especificación de episodios como "1-24,30"
+    
+    Args:
+        spec (str): Rangos separados por comas
+        
+    Returns:
+        set: Números de episodio incluidos
+        
+    Raises:
+        ValueError: Si la especificación no es válida
+    """
+    episodes = set()
+    
+    for part in str(spec).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        
+        start, sep, end = part.partition('-')
+        try:
+            start = int(start)
+            end = int(end) if sep else start
+        except ValueError:
+            raise ValueError(f"Rango de episodios inválido: {part}")
+        
+        if start < 0 or end < start:
+            raise ValueError(f"Rango de episodios inválido: {part}")
+        
+        episodes.update(range(start, end + 1))
+    
+    if not episodes:
+        raise ValueError(f"Especificación de episodios vacía: {spec}")
+    
+    return episodes
+
+def argparse_type(parse):
+    """
+    Adapta una función de parseo para usarla como type= de argparse
+    
+    argparse sustituye el mensaje de un ValueError por uno genérico ("invalid
+    ... value"); con ArgumentTypeError muestra el mensaje real.
+    
+    Args:
+        parse (callable): Función que lanza ValueError si el valor no es válido
+    
+    Returns:
+        callable: Función equivalente que lanza argparse.ArgumentTypeError
+    """
+    def convert(value):
+        try:
+            return parse(value)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+    
+    convert.__name__ = parse.__name__
+    return convert
+
 def extract_video_info(html_content):
     """
     Extrae información de video desde contenido HTML
@@ -228,23 +291,34 @@ def setup_logging(verbose=False, log_file=None):
         file_handler.setFormatter(file_formatter)
         logging.getLogger().addHandler(file_handler)
 
-def generate_file_hash(file_path, algorithm='md5'):
+def generate_file_hash(file_path, algorithm='md5', chunk_size=HASH_CHUNK_SIZE):
     """
     Genera hash de un archivo
     
+    Lee en bloques grandes sobre un único buffer reutilizado y avisa al
+    sistema de que la lectura es secuencial (más read-ahead en discos y NAS).
+    
     Args:
         file_path (str): Ruta del archivo
         algorithm (str): Algoritmo de hash (md5, sha1, sha256)
+        chunk_size (int): Bytes por lectura
         
     Returns:
         str: Hash del archivo
     """
     hash_obj = hashlib.new(algorithm)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
     
     try:
-        with open(file_path, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_obj.update(chunk)
+        with open(file_path, 'rb', buffering=0) as f:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            while True:
+                read = f.readinto(buffer)
+                if not read:
+                    break
+                hash_obj.update(view[:read])
         return hash_obj.hexdigest()
     except Exception as e:
         logging.error(f"Error generando hash del archivo {file_path}: {e}")
@@ -411,16 +485,30 @@ def is_video_file(file_path):
     video_extensions = {'.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm', '.m4v'}
     return Path(file_path).suffix.lower() in video_extensions
 
-def get_video_files_in_directory(directory):
+def get_video_files_in_directory(directory, use_index=True):
     """
     Obtiene todos los archivos de video en un directorio
     
+    Con el índice de la biblioteca (library.py) solo se vuelven a listar los
+    directorios que cambiaron desde la consulta anterior; sin él se recorre
+    todo el árbol.
+    
     Args:
         directory (str): Ruta del directorio
+        use_index (bool): Consultar el índice de la biblioteca
         
     Returns:
         list: Lista de archivos de video encontrados
     """
+    if use_index:
+        try:
+            from library import LibraryIndex
+            index = LibraryIndex()
+            index.scan(directory)
+            return index.video_files(directory)
+        except Exception as e:
+            logging.warning(f"Índice de la biblioteca no disponible, se recorre {directory}: {e}")
+    
     video_files = []
     try:
         for file_path in Path(directory).rglob('*'):